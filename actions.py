@@ -0,0 +1,157 @@
+from typing import Dict, List, Set, Tuple
+
+from lux.constants import Constants
+from lux.game import Game
+from lux.game_map import Position
+from lux.game_objects import CityTile, Unit
+
+DIRECTIONS = Constants.DIRECTIONS
+
+# kinds of the action records
+MOVE = 0
+BUILD_CITY = 1
+PILLAGE = 2
+RESEARCH = 3
+BUILD_WORKER = 4
+BUILD_CART = 5
+ANNOTATION = 6
+# annotation of a move, only written with the move
+MOVE_ANNOTATION = 7
+
+UNIT_ACTIONS = (MOVE, BUILD_CITY, PILLAGE)
+
+
+class ActionBuffer:
+    """
+    The actions of one turn as compact records, at most one per unit and per city tile (the first one wins,
+    like in the engine) and every annotation once. `serialize` checks all records against the state of the turn
+    and writes only the commands the engine accepts, in the order they were made. Annotations of a move are only
+    written if that move is.
+    """
+
+    def __init__(self) -> None:
+        # (kind, key) in the order the actions were made, the key is the unit id, tile position or annotation
+        self.records: List[Tuple[int, object]] = []
+        self.units: Dict[str, Tuple[Unit, int, str]] = {}
+        self.city_tiles: Dict[Tuple[int, int], Tuple[CityTile, int]] = {}
+        self.annotations: Set[object] = set()
+        # actions that were replaced by an earlier one or did not pass the checks
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _unit_action(self, unit: Unit, kind: int, direction: str = DIRECTIONS.CENTER) -> bool:
+        if unit.id in self.units:
+            self.dropped += 1
+            return False
+        self.units[unit.id] = (unit, kind, direction)
+        self.records.append((kind, unit.id))
+        return True
+
+    def _city_tile_action(self, city_tile: CityTile, kind: int) -> bool:
+        key = (city_tile.pos.x, city_tile.pos.y)
+        if key in self.city_tiles:
+            self.dropped += 1
+            return False
+        self.city_tiles[key] = (city_tile, kind)
+        self.records.append((kind, key))
+        return True
+
+    def move(self, unit: Unit, direction: str) -> bool:
+        return self._unit_action(unit, MOVE, direction)
+
+    def build_city(self, unit: Unit) -> bool:
+        return self._unit_action(unit, BUILD_CITY)
+
+    def pillage(self, unit: Unit) -> bool:
+        return self._unit_action(unit, PILLAGE)
+
+    def research(self, city_tile: CityTile) -> bool:
+        return self._city_tile_action(city_tile, RESEARCH)
+
+    def build_worker(self, city_tile: CityTile) -> bool:
+        return self._city_tile_action(city_tile, BUILD_WORKER)
+
+    def build_cart(self, city_tile: CityTile) -> bool:
+        return self._city_tile_action(city_tile, BUILD_CART)
+
+    def annotate(self, annotation: str) -> None:
+        """
+        Add an annotation made with `lux.annotate`, repeated annotations are written once
+        """
+        if annotation not in self.annotations:
+            self.annotations.add(annotation)
+            self.records.append((ANNOTATION, annotation))
+
+    def annotate_move(self, unit: Unit, direction: str, annotation: str) -> None:
+        """
+        Add an annotation that belongs to moving `unit` in `direction`, it is dropped with the move
+        """
+        key = (annotation, unit.id, direction)
+        if key not in self.annotations:
+            self.annotations.add(key)
+            self.records.append((MOVE_ANNOTATION, key))
+
+    def _valid_unit_action(self, game_state: Game, team: int, unit: Unit, kind: int, direction: str) -> bool:
+        if unit.team != team or not unit.can_act():
+            return False
+        if kind == MOVE:
+            if direction == DIRECTIONS.CENTER:
+                # staying put needs no command
+                return False
+            target = Position.translate(unit.pos, direction, 1)
+            if not (0 <= target.x < game_state.map_width and 0 <= target.y < game_state.map_height):
+                return False
+            city_tile = game_state.map.get_cell(target.x, target.y).citytile
+            return city_tile is None or city_tile.team == unit.team
+        if kind == BUILD_CITY:
+            return unit.is_worker() and unit.can_build(game_state.map) and game_state.map.get_cell_by_pos(unit.pos).citytile is None
+        return unit.is_worker() and game_state.map.get_cell_by_pos(unit.pos).citytile is None
+
+    def serialize(self, game_state: Game, team: int) -> List[str]:
+        """
+        Commands of all valid actions and the annotations
+        """
+        player = game_state.players[team]
+        # every city tile supports one unit, built units count from this turn on
+        unit_room = player.city_tile_count - len(player.units)
+        valid = {
+            unit_id: self._valid_unit_action(game_state, team, unit, kind, direction)
+            for unit_id, (unit, kind, direction) in self.units.items()
+        }
+        written = set()
+        commands = []
+        for kind, key in self.records:
+            if kind == ANNOTATION or kind == MOVE_ANNOTATION:
+                if kind == MOVE_ANNOTATION:
+                    annotation, unit_id, direction = key
+                    action = self.units.get(unit_id)
+                    if action is None or action[1:] != (MOVE, direction) or not valid[unit_id]:
+                        continue
+                    key = annotation
+                if key not in written:
+                    written.add(key)
+                    commands.append(key)
+            elif kind in UNIT_ACTIONS:
+                unit, _, direction = self.units[key]
+                if not valid[key]:
+                    self.dropped += 1
+                elif kind == MOVE:
+                    commands.append(unit.move(direction))
+                elif kind == BUILD_CITY:
+                    commands.append(unit.build_city())
+                else:
+                    commands.append(unit.pillage())
+            else:
+                city_tile, _ = self.city_tiles[key]
+                if not city_tile.can_act() or city_tile.team != team:
+                    self.dropped += 1
+                elif kind == RESEARCH:
+                    commands.append(city_tile.research())
+                elif unit_room <= 0:
+                    self.dropped += 1
+                else:
+                    unit_room -= 1
+                    commands.append(city_tile.build_worker() if kind == BUILD_WORKER else city_tile.build_cart())
+        return commands
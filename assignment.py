@@ -0,0 +1,122 @@
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from lux.game_map import Position
+
+# cost of pairs that must never be matched
+FORBIDDEN = 1e9
+# only the cheapest tasks of every worker are considered, keeps the matrix small on big maps
+CANDIDATES_PER_WORKER = 8
+
+
+def distance_matrix(sources: Sequence[Position], targets: Sequence[Position]) -> np.ndarray:
+    """
+    Manhattan distance between every source and every target, shape (len(sources), len(targets))
+    """
+    source = np.array([(pos.x, pos.y) for pos in sources], dtype=np.float64).reshape(-1, 2)
+    target = np.array([(pos.x, pos.y) for pos in targets], dtype=np.float64).reshape(-1, 2)
+    return np.abs(source[:, None, :] - target[None, :, :]).sum(axis=2)
+
+
+def prune_candidates(cost: np.ndarray, candidates: int = CANDIDATES_PER_WORKER) -> np.ndarray:
+    """
+    Returns the indices of the columns that are among the `candidates` cheapest of at least one row
+    """
+    if cost.shape[1] <= candidates:
+        return np.arange(cost.shape[1])
+    cheapest = np.argpartition(cost, candidates - 1, axis=1)[:, :candidates]
+    return np.unique(cheapest)
+
+
+def _greedy(cost: np.ndarray, rows: List[int], taken: np.ndarray, result: np.ndarray) -> None:
+    for row in rows:
+        masked = np.where(taken, np.inf, cost[row])
+        column = int(masked.argmin())
+        if masked[column] < FORBIDDEN:
+            result[row] = column
+            taken[column] = True
+
+
+def _hungarian(cost: np.ndarray, deadline: float) -> np.ndarray:
+    """
+    Shortest augmenting path hungarian algorithm for n rows <= m columns, rows are added one by one
+    so the partial result is optimal for the rows added so far. Once `deadline` is reached the
+    remaining rows are matched greedily.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    # p[j] is the (1 based) row matched to column j, column 0 is the virtual start column
+    p = np.zeros(m + 1, dtype=np.int64)
+    way = np.zeros(m + 1, dtype=np.int64)
+    result = np.full(n, -1, dtype=np.int64)
+    for i in range(1, n + 1):
+        if time.perf_counter() > deadline:
+            taken = np.zeros(m, dtype=bool)
+            taken[p[1:] > 0] = True
+            for column in np.nonzero(p[1:])[0]:
+                result[p[column + 1] - 1] = column
+            _greedy(cost, list(range(i - 1, n)), taken, result)
+            return result
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            current = cost[i0 - 1] - u[i0] - v[1:]
+            update = ~used[1:] & (current < minv[1:])
+            minv[1:][update] = current[update]
+            way[1:][update] = j0
+            free = np.where(used[1:], np.inf, minv[1:])
+            j1 = int(free.argmin()) + 1
+            delta = free[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    for column in np.nonzero(p[1:])[0]:
+        result[p[column + 1] - 1] = column
+    return result
+
+
+def solve_assignment(cost: np.ndarray, time_limit: float) -> np.ndarray:
+    """
+    Minimum cost matching of rows to columns, every column is used at most once.
+
+    Returns for every row the matched column or -1 if the row has no allowed column left.
+    Stops searching after `time_limit` seconds and matches the remaining rows greedily.
+    """
+    deadline = time.perf_counter() + time_limit
+    rows, columns = cost.shape
+    if rows == 0 or columns == 0:
+        return np.full(rows, -1, dtype=np.int64)
+    if rows <= columns:
+        result = _hungarian(cost, deadline)
+    else:
+        transposed = _hungarian(cost.T, deadline)
+        result = np.full(rows, -1, dtype=np.int64)
+        matched = transposed >= 0
+        result[transposed[matched]] = np.nonzero(matched)[0]
+    allowed = result >= 0
+    allowed[allowed] = cost[np.nonzero(allowed)[0], result[allowed]] < FORBIDDEN
+    return np.where(allowed, result, -1)
+
+
+def assign(cost: np.ndarray, time_limit: float) -> List[Optional[int]]:
+    """
+    Prune the columns of `cost` to the relevant candidates and solve the assignment,
+    returns the original column index (or None) for every row
+    """
+    candidates = prune_candidates(cost)
+    result = solve_assignment(cost[:, candidates], time_limit)
+    return [int(candidates[column]) if column >= 0 else None for column in result]
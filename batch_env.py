@@ -0,0 +1,673 @@
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import sampling_profile
+from classes import Observation
+from lux.constants import Constants
+from lux.game import Game
+from lux.game_constants import GAME_CONSTANTS
+
+INPUT_CONSTANTS = Constants.INPUT_CONSTANTS
+PARAMETERS = GAME_CONSTANTS["PARAMETERS"]
+
+# resource type codes used in the resource plane, 0 means no resource
+RESOURCE_NAMES = ["", Constants.RESOURCE_TYPES.WOOD, Constants.RESOURCE_TYPES.COAL, Constants.RESOURCE_TYPES.URANIUM]
+RESOURCE_CODES = {name: code for code, name in enumerate(RESOURCE_NAMES) if name}
+COLLECTION_RATE = np.array(
+    [0] + [PARAMETERS["WORKER_COLLECTION_RATE"][name.upper()] for name in RESOURCE_NAMES[1:]], dtype=np.float64
+)
+FUEL_RATE = np.array(
+    [0] + [PARAMETERS["RESOURCE_TO_FUEL_RATE"][name.upper()] for name in RESOURCE_NAMES[1:]], dtype=np.float64
+)
+
+WORKER = Constants.UNIT_TYPES.WORKER
+CART = Constants.UNIT_TYPES.CART
+UNIT_CAPACITY = np.array([PARAMETERS["RESOURCE_CAPACITY"]["WORKER"], PARAMETERS["RESOURCE_CAPACITY"]["CART"]])
+UNIT_COOLDOWN = np.array([PARAMETERS["UNIT_ACTION_COOLDOWN"]["WORKER"], PARAMETERS["UNIT_ACTION_COOLDOWN"]["CART"]])
+UNIT_UPKEEP = np.array([PARAMETERS["LIGHT_UPKEEP"]["WORKER"], PARAMETERS["LIGHT_UPKEEP"]["CART"]])
+CITY_UPKEEP = PARAMETERS["LIGHT_UPKEEP"]["CITY"]
+CITY_ADJACENCY_BONUS = PARAMETERS["CITY_ADJACENCY_BONUS"]
+CITY_BUILD_COST = PARAMETERS["CITY_BUILD_COST"]
+CITY_ACTION_COOLDOWN = PARAMETERS["CITY_ACTION_COOLDOWN"]
+DAY_LENGTH = PARAMETERS["DAY_LENGTH"]
+CYCLE_LENGTH = PARAMETERS["DAY_LENGTH"] + PARAMETERS["NIGHT_LENGTH"]
+MAX_DAYS = PARAMETERS["MAX_DAYS"]
+MAX_ROAD = PARAMETERS["MAX_ROAD"]
+
+# unit actions
+NONE = 0
+MOVE_NORTH = 1
+MOVE_EAST = 2
+MOVE_SOUTH = 3
+MOVE_WEST = 4
+BUILD_CITY = 5
+PILLAGE = 6
+TRANSFER = 7
+MOVE_CODES = {
+    Constants.DIRECTIONS.CENTER: NONE,
+    Constants.DIRECTIONS.NORTH: MOVE_NORTH,
+    Constants.DIRECTIONS.EAST: MOVE_EAST,
+    Constants.DIRECTIONS.SOUTH: MOVE_SOUTH,
+    Constants.DIRECTIONS.WEST: MOVE_WEST,
+}
+MOVE_DX = np.array([0, 0, 1, 0, -1, 0, 0, 0])
+MOVE_DY = np.array([0, -1, 0, 1, 0, 0, 0, 0])
+
+# city tile actions
+RESEARCH = 1
+BUILD_WORKER = 2
+BUILD_CART = 3
+
+# offsets a worker collects from, its own tile first
+COLLECTION_OFFSETS = [(0, 0), (0, -1), (1, 0), (0, 1), (-1, 0)]
+ANNOTATIONS = {"dc", "dx", "dl", "dt", "dst"}
+
+
+class BatchEnv:
+    """
+    Runs `batch_size` games of the same map size in lockstep. The whole state lives in NumPy arrays
+    with a leading batch dimension, only parsing of the command strings is done per game.
+
+    Follows the rules of `lux/game_constants.json`, with two simplifications: roads only lower the
+    cooldown set by an action and resources are collected in a single pass over the collection offsets.
+    """
+
+    def __init__(self, batch_size: int, width: int, height: int, max_units: int = 512) -> None:
+        self.batch_size = batch_size
+        self.width = width
+        self.height = height
+        self.max_units = max_units
+        self.max_cities = width * height
+        shape = (batch_size, height, width)
+        self.resource_type = np.zeros(shape, dtype=np.int8)
+        self.resource_amount = np.zeros(shape, dtype=np.float64)
+        self.road = np.zeros(shape, dtype=np.float64)
+        # index into the city table of the city on every tile, -1 if none
+        self.city_index = np.full(shape, -1, dtype=np.int32)
+        self.city_tile_cooldown = np.zeros(shape, dtype=np.float64)
+
+        self.city_alive = np.zeros((batch_size, self.max_cities), dtype=bool)
+        self.city_team = np.zeros((batch_size, self.max_cities), dtype=np.int8)
+        self.city_fuel = np.zeros((batch_size, self.max_cities), dtype=np.float64)
+        self.city_number = np.zeros((batch_size, self.max_cities), dtype=np.int32)
+
+        self.unit_alive = np.zeros((batch_size, max_units), dtype=bool)
+        self.unit_team = np.zeros((batch_size, max_units), dtype=np.int8)
+        self.unit_type = np.zeros((batch_size, max_units), dtype=np.int8)
+        self.unit_x = np.zeros((batch_size, max_units), dtype=np.int32)
+        self.unit_y = np.zeros((batch_size, max_units), dtype=np.int32)
+        self.unit_cooldown = np.zeros((batch_size, max_units), dtype=np.float64)
+        # cargo columns are ordered like the resource codes, wood, coal, uranium
+        self.unit_cargo = np.zeros((batch_size, max_units, 3), dtype=np.float64)
+        self.unit_number = np.zeros((batch_size, max_units), dtype=np.int32)
+
+        self.research_points = np.zeros((batch_size, 2), dtype=np.float64)
+        self.turn = np.zeros(batch_size, dtype=np.int32)
+        self.done = np.zeros(batch_size, dtype=bool)
+        self.invalid_commands = np.zeros((batch_size, 2), dtype=np.int64)
+        self._next_unit_number = np.ones(batch_size, dtype=np.int32)
+        self._next_city_number = np.ones(batch_size, dtype=np.int32)
+        self._unit_slots: List[Dict[str, int]] = [{} for _ in range(batch_size)]
+
+    # ------------------------------------------------------------------ setup
+
+    def _clear(self) -> None:
+        """
+        Empty every game in place, the arrays are kept
+        """
+        for array in (
+            self.resource_type, self.resource_amount, self.road, self.city_tile_cooldown,
+            self.city_alive, self.city_team, self.city_fuel, self.city_number,
+            self.unit_alive, self.unit_team, self.unit_type, self.unit_x, self.unit_y, self.unit_cooldown,
+            self.unit_cargo, self.unit_number, self.research_points, self.turn, self.done, self.invalid_commands,
+        ):
+            array.fill(0)
+        self.city_index.fill(-1)
+        self._next_unit_number.fill(1)
+        self._next_city_number.fill(1)
+        self._unit_slots = [{} for _ in range(self.batch_size)]
+
+    def reset(self, initial_updates: Sequence[Sequence[str]]) -> None:
+        """
+        Reset every game from the update lines of its first turn, in the same format the engine sends them
+        """
+        if len(initial_updates) != self.batch_size:
+            raise ValueError(f"Expected {self.batch_size} initial states, got {len(initial_updates)}")
+        self._clear()
+        for game, updates in enumerate(initial_updates):
+            for update in updates:
+                if update == INPUT_CONSTANTS.DONE:
+                    break
+                self._load_update(game, update.split(" "))
+        self._refresh_city_roads()
+
+    def _load_update(self, game: int, strs: List[str]) -> None:
+        identifier = strs[0]
+        if identifier == INPUT_CONSTANTS.RESEARCH_POINTS:
+            self.research_points[game, int(strs[1])] = float(strs[2])
+        elif identifier == INPUT_CONSTANTS.RESOURCES:
+            x, y = int(strs[2]), int(strs[3])
+            self.resource_type[game, y, x] = RESOURCE_CODES[strs[1]]
+            self.resource_amount[game, y, x] = float(strs[4])
+        elif identifier == INPUT_CONSTANTS.UNITS:
+            slot = self._spawn_unit(game, int(strs[2]), int(strs[1]), int(strs[4]), int(strs[5]), strs[3])
+            self.unit_cooldown[game, slot] = float(strs[6])
+            self.unit_cargo[game, slot] = [float(strs[7]), float(strs[8]), float(strs[9])]
+        elif identifier == INPUT_CONSTANTS.CITY:
+            index = self._new_city(game, int(strs[1]), strs[2])
+            self.city_fuel[game, index] = float(strs[3])
+        elif identifier == INPUT_CONSTANTS.CITY_TILES:
+            number = int(strs[2].split("_")[1])
+            index = int(np.nonzero(self.city_alive[game] & (self.city_number[game] == number))[0][0])
+            x, y = int(strs[3]), int(strs[4])
+            self.city_index[game, y, x] = index
+            self.city_tile_cooldown[game, y, x] = float(strs[5])
+        elif identifier == INPUT_CONSTANTS.ROADS:
+            self.road[game, int(strs[2]), int(strs[1])] = float(strs[3])
+
+    def _spawn_unit(self, game: int, team: int, unit_type: int, x: int, y: int, unit_id: Optional[str] = None) -> int:
+        slot = int(self.unit_alive[game].argmin())
+        if self.unit_alive[game, slot]:
+            raise RuntimeError(f"Game {game} has more than {self.max_units} units")
+        if unit_id is None:
+            number = int(self._next_unit_number[game])
+            unit_id = f"u_{number}"
+        else:
+            number = int(unit_id.split("_")[1])
+        self._next_unit_number[game] = max(self._next_unit_number[game], number + 1)
+        self.unit_alive[game, slot] = True
+        self.unit_team[game, slot] = team
+        self.unit_type[game, slot] = unit_type
+        self.unit_x[game, slot] = x
+        self.unit_y[game, slot] = y
+        self.unit_cooldown[game, slot] = 0
+        self.unit_cargo[game, slot] = 0
+        self.unit_number[game, slot] = number
+        self._unit_slots[game][unit_id] = slot
+        return slot
+
+    def _new_city(self, game: int, team: int, city_id: Optional[str] = None) -> int:
+        index = int(self.city_alive[game].argmin())
+        if city_id is None:
+            number = int(self._next_city_number[game])
+        else:
+            number = int(city_id.split("_")[1])
+        self._next_city_number[game] = max(self._next_city_number[game], number + 1)
+        self.city_alive[game, index] = True
+        self.city_team[game, index] = team
+        self.city_fuel[game, index] = 0
+        self.city_number[game, index] = number
+        return index
+
+    def _refresh_city_roads(self) -> None:
+        self.road[self.city_index >= 0] = MAX_ROAD
+
+    # ------------------------------------------------------------------ observations
+
+    def updates(self, game: int, team: int) -> List[str]:
+        """
+        Update lines of `game` for `team`, in the same format the engine sends them to the agents.
+        On the first turn the player id and map size lines are prepended.
+        """
+        lines = []
+        if self.turn[game] == 0:
+            lines += [str(team), f"{self.width} {self.height}"]
+        for other in range(2):
+            lines.append(f"rp {other} {int(self.research_points[game, other])}")
+        for y, x in zip(*np.nonzero(self.resource_type[game])):
+            lines.append(
+                f"r {RESOURCE_NAMES[self.resource_type[game, y, x]]} {x} {y} {int(self.resource_amount[game, y, x])}"
+            )
+        for slot in np.nonzero(self.unit_alive[game])[0]:
+            wood, coal, uranium = self.unit_cargo[game, slot].astype(int)
+            lines.append(
+                f"u {self.unit_type[game, slot]} {self.unit_team[game, slot]} u_{self.unit_number[game, slot]} "
+                f"{self.unit_x[game, slot]} {self.unit_y[game, slot]} {self.unit_cooldown[game, slot]:g} "
+                f"{wood} {coal} {uranium}"
+            )
+        upkeep = self.city_upkeep()
+        for index in np.nonzero(self.city_alive[game])[0]:
+            lines.append(
+                f"c {self.city_team[game, index]} c_{self.city_number[game, index]} "
+                f"{self.city_fuel[game, index]:g} {upkeep[game, index]:g}"
+            )
+        for y, x in zip(*np.nonzero(self.city_index[game] >= 0)):
+            index = self.city_index[game, y, x]
+            lines.append(
+                f"ct {self.city_team[game, index]} c_{self.city_number[game, index]} {x} {y} "
+                f"{self.city_tile_cooldown[game, y, x]:g}"
+            )
+        for y, x in zip(*np.nonzero(self.road[game] > 0)):
+            lines.append(f"ccd {x} {y} {self.road[game, y, x]:g}")
+        lines.append(INPUT_CONSTANTS.DONE)
+        return lines
+
+    def game(self, game: int, team: int) -> Game:
+        """
+        Build the `Game` object `team` sees in `game` this turn
+        """
+        game_state = Game()
+        game_state._initialize([str(team), f"{self.width} {self.height}"])
+        game_state._update(self.updates(game, team)[2 if self.turn[game] == 0 else 0 :])
+        game_state.turn = int(self.turn[game])
+        game_state.id = team
+        return game_state
+
+    def city_upkeep(self) -> np.ndarray:
+        """
+        Light upkeep of every city, each tile costs `CITY_UPKEEP` minus the adjacency bonus for every neighbour of the same city
+        """
+        padded = np.pad(self.city_index, ((0, 0), (1, 1), (1, 1)), constant_values=-1)
+        centre = padded[:, 1:-1, 1:-1]
+        neighbours = np.zeros(self.city_index.shape, dtype=np.int32)
+        for shifted in (padded[:, :-2, 1:-1], padded[:, 2:, 1:-1], padded[:, 1:-1, :-2], padded[:, 1:-1, 2:]):
+            neighbours += (shifted == centre) & (centre >= 0)
+        tile_upkeep = CITY_UPKEEP - CITY_ADJACENCY_BONUS * neighbours
+        upkeep = np.zeros((self.batch_size, self.max_cities), dtype=np.float64)
+        game, y, x = np.nonzero(self.city_index >= 0)
+        np.add.at(upkeep, (game, self.city_index[game, y, x]), tile_upkeep[game, y, x])
+        return upkeep
+
+    def city_tile_count(self) -> np.ndarray:
+        """
+        Number of city tiles of each team, shape (batch_size, 2)
+        """
+        game, y, x = np.nonzero(self.city_index >= 0)
+        team = self.city_team[game, self.city_index[game, y, x]]
+        return np.bincount(game * 2 + team, minlength=self.batch_size * 2).reshape(self.batch_size, 2)
+
+    def unit_count(self) -> np.ndarray:
+        """
+        Number of units of each team, shape (batch_size, 2)
+        """
+        game, slot = np.nonzero(self.unit_alive)
+        team = self.unit_team[game, slot]
+        return np.bincount(game * 2 + team, minlength=self.batch_size * 2).reshape(self.batch_size, 2)
+
+    def winner(self) -> np.ndarray:
+        """
+        Team with more city tiles, then more units, -1 on a tie
+        """
+        score = self.city_tile_count() * 10000 + self.unit_count()
+        return np.where(score[:, 0] > score[:, 1], 0, np.where(score[:, 1] > score[:, 0], 1, -1))
+
+    # ------------------------------------------------------------------ stepping
+
+    def _city_team_at(self, game: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Team of the city tile at the given positions, -1 if there is none
+        """
+        index = self.city_index[game, y, x]
+        return np.where(index >= 0, self.city_team[game, np.maximum(index, 0)], -1)
+
+    def _parse_actions(self, actions: Sequence[Tuple[Sequence[str], Sequence[str]]]):
+        unit_action = np.zeros((self.batch_size, self.max_units), dtype=np.int8)
+        transfer = np.zeros((self.batch_size, self.max_units, 3), dtype=np.int64)
+        city_action = np.zeros((self.batch_size, self.height, self.width), dtype=np.int8)
+        for game in np.nonzero(~self.done)[0]:
+            slots = self._unit_slots[game]
+            for team in range(2):
+                for command in actions[game][team]:
+                    strs = command.split(" ")
+                    if strs[0] in ANNOTATIONS:
+                        continue
+                    if not self._parse_command(game, team, strs, slots, unit_action, transfer, city_action):
+                        self.invalid_commands[game, team] += 1
+        return unit_action, transfer, city_action
+
+    def _parse_command(self, game, team, strs, slots, unit_action, transfer, city_action) -> bool:
+        try:
+            if strs[0] in ("r", "bw", "bc"):
+                x, y = int(strs[1]), int(strs[2])
+                if not (0 <= x < self.width and 0 <= y < self.height):
+                    return False
+                index = self.city_index[game, y, x]
+                if (
+                    index < 0
+                    or self.city_team[game, index] != team
+                    or self.city_tile_cooldown[game, y, x] >= 1
+                    or city_action[game, y, x] != NONE
+                ):
+                    return False
+                city_action[game, y, x] = {"r": RESEARCH, "bw": BUILD_WORKER, "bc": BUILD_CART}[strs[0]]
+                return True
+            slot = slots.get(strs[1])
+            if (
+                slot is None
+                or self.unit_team[game, slot] != team
+                or self.unit_cooldown[game, slot] >= 1
+                or unit_action[game, slot] != NONE
+            ):
+                return False
+            if strs[0] == "m":
+                unit_action[game, slot] = MOVE_CODES[strs[2]]
+            elif strs[0] == "bcity":
+                unit_action[game, slot] = BUILD_CITY
+            elif strs[0] == "p":
+                unit_action[game, slot] = PILLAGE
+            elif strs[0] == "t":
+                target = slots.get(strs[2])
+                if target is None:
+                    return False
+                unit_action[game, slot] = TRANSFER
+                transfer[game, slot] = [target, RESOURCE_CODES[strs[3]] - 1, int(strs[4])]
+            else:
+                return False
+            return True
+        except (IndexError, KeyError, ValueError):
+            return False
+
+    def step(self, actions: Sequence[Tuple[Sequence[str], Sequence[str]]]) -> np.ndarray:
+        """
+        Advance every running game by one turn, `actions` holds the command lists of team 0 and 1 of every game.
+        Returns the done flags.
+        """
+        active = ~self.done
+        unit_action, transfer, city_action = self._parse_actions(actions)
+        self._city_actions(city_action)
+        self._build_cities(unit_action)
+        self._pillage(unit_action)
+        self._transfer(unit_action, transfer)
+        # the actions of finished games are never parsed, the phases of every unit are masked
+        self._move(unit_action, active)
+        self._collect(active)
+        self._deposit(active)
+        night = (self.turn % CYCLE_LENGTH) >= DAY_LENGTH
+        self._night(night & active)
+        self._regrow_wood(active)
+        self._cool_down(active)
+        self.turn[active] += 1
+        self._check_done()
+        return self.done
+
+    def _city_actions(self, city_action: np.ndarray) -> None:
+        game, y, x = np.nonzero(city_action)
+        team = self.city_team[game, self.city_index[game, y, x]]
+        research = city_action[game, y, x] == RESEARCH
+        np.add.at(self.research_points, (game[research], team[research]), 1)
+        self.city_tile_cooldown[game[research], y[research], x[research]] = CITY_ACTION_COOLDOWN
+
+        build = ~research
+        if not build.any():
+            return
+        # a team can only have as many units as city tiles, requests are accepted in order
+        room = self.city_tile_count() - self.unit_count()
+        game, y, x, team = game[build], y[build], x[build], team[build]
+        requested = np.zeros((self.batch_size, 2), dtype=np.int64)
+        for i in range(len(game)):
+            if requested[game[i], team[i]] >= room[game[i], team[i]]:
+                continue
+            requested[game[i], team[i]] += 1
+            unit_type = WORKER if city_action[game[i], y[i], x[i]] == BUILD_WORKER else CART
+            self._spawn_unit(int(game[i]), int(team[i]), unit_type, int(x[i]), int(y[i]))
+            self.city_tile_cooldown[game[i], y[i], x[i]] = CITY_ACTION_COOLDOWN
+
+    def _build_cities(self, unit_action: np.ndarray) -> None:
+        game, slot = np.nonzero((unit_action == BUILD_CITY) & (self.unit_type == WORKER))
+        x, y = self.unit_x[game, slot], self.unit_y[game, slot]
+        buildable = (
+            (self.unit_cargo[game, slot].sum(axis=1) >= CITY_BUILD_COST)
+            & (self.resource_type[game, y, x] == 0)
+            & (self.city_index[game, y, x] < 0)
+        )
+        for game, slot, x, y in zip(game[buildable], slot[buildable], x[buildable], y[buildable]):
+            team = self.unit_team[game, slot]
+            self._add_city_tile(game, team, x, y)
+            # pay with wood first, then coal and uranium
+            cost = CITY_BUILD_COST
+            for resource in range(3):
+                paid = min(cost, self.unit_cargo[game, slot, resource])
+                self.unit_cargo[game, slot, resource] -= paid
+                cost -= paid
+            self.unit_cooldown[game, slot] = UNIT_COOLDOWN[WORKER]
+            self.road[game, y, x] = MAX_ROAD
+
+    def _add_city_tile(self, game: int, team: int, x: int, y: int) -> None:
+        """
+        Add a city tile, joining (and merging) all neighbouring cities of the same team
+        """
+        joined = []
+        for dx, dy in COLLECTION_OFFSETS[1:]:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                index = self.city_index[game, ny, nx]
+                if index >= 0 and self.city_team[game, index] == team and index not in joined:
+                    joined.append(index)
+        if len(joined) == 0:
+            index = self._new_city(game, team)
+        else:
+            index = joined[0]
+            for other in joined[1:]:
+                self.city_fuel[game, index] += self.city_fuel[game, other]
+                self.city_alive[game, other] = False
+                self.city_index[game][self.city_index[game] == other] = index
+        self.city_index[game, y, x] = index
+        self.city_tile_cooldown[game, y, x] = 0
+
+    def _pillage(self, unit_action: np.ndarray) -> None:
+        game, slot = np.nonzero((unit_action == PILLAGE) & (self.unit_type == WORKER))
+        x, y = self.unit_x[game, slot], self.unit_y[game, slot]
+        on_city = self.city_index[game, y, x] >= 0
+        game, x, y = game[~on_city], x[~on_city], y[~on_city]
+        self.road[game, y, x] = np.maximum(self.road[game, y, x] - PARAMETERS["PILLAGE_RATE"], PARAMETERS["MIN_ROAD"])
+        self.unit_cooldown[game, slot[~on_city]] = UNIT_COOLDOWN[WORKER]
+
+    def _transfer(self, unit_action: np.ndarray, transfer: np.ndarray) -> None:
+        game, slot = np.nonzero(unit_action == TRANSFER)
+        target, resource, amount = transfer[game, slot].T
+        valid = (
+            self.unit_alive[game, target]
+            & (self.unit_team[game, target] == self.unit_team[game, slot])
+            & (np.abs(self.unit_x[game, slot] - self.unit_x[game, target]) + np.abs(self.unit_y[game, slot] - self.unit_y[game, target]) == 1)
+        )
+        game, slot, target, resource, amount = game[valid], slot[valid], target[valid], resource[valid], amount[valid]
+        space = UNIT_CAPACITY[self.unit_type[game, target]] - self.unit_cargo[game, target].sum(axis=1)
+        amount = np.minimum(np.minimum(amount, self.unit_cargo[game, slot, resource]), np.maximum(space, 0))
+        np.add.at(self.unit_cargo, (game, slot, resource), -amount)
+        np.add.at(self.unit_cargo, (game, target, resource), amount)
+        self.unit_cooldown[game, slot] = UNIT_COOLDOWN[self.unit_type[game, slot]]
+
+    def _move(self, unit_action: np.ndarray, active: np.ndarray) -> None:
+        game, slot = np.nonzero(self.unit_alive & active[:, None])
+        action = unit_action[game, slot]
+        team = self.unit_team[game, slot]
+        x, y = self.unit_x[game, slot], self.unit_y[game, slot]
+        moving = (action >= MOVE_NORTH) & (action <= MOVE_WEST)
+        target_x = x + MOVE_DX[action]
+        target_y = y + MOVE_DY[action]
+        moving &= (target_x >= 0) & (target_y >= 0) & (target_x < self.width) & (target_y < self.height)
+        target_x = np.where(moving, target_x, x)
+        target_y = np.where(moving, target_y, y)
+        city_team = self._city_team_at(game, target_x, target_y)
+        # units can never enter enemy cities but can stack on their own
+        moving &= (city_team < 0) | (city_team == team)
+        own_city = city_team == team
+        while True:
+            target_x = np.where(moving, target_x, x)
+            target_y = np.where(moving, target_y, y)
+            key = (game * self.height + target_y) * self.width + target_x
+            occupants = np.bincount(key, minlength=self.batch_size * self.height * self.width)
+            collision = moving & (occupants[key] > 1) & ~own_city
+            if not collision.any():
+                break
+            moving &= ~collision
+        self.unit_x[game, slot] = target_x
+        self.unit_y[game, slot] = target_y
+        game, slot = game[moving], slot[moving]
+        road = self.road[game, target_y[moving], target_x[moving]]
+        self.unit_cooldown[game, slot] = np.maximum(UNIT_COOLDOWN[self.unit_type[game, slot]] - road, 1)
+
+    def _collect(self, active: np.ndarray) -> None:
+        researched = np.stack(
+            [
+                np.ones((self.batch_size, 2), dtype=bool),
+                np.ones((self.batch_size, 2), dtype=bool),
+                self.research_points >= PARAMETERS["RESEARCH_REQUIREMENTS"]["COAL"],
+                self.research_points >= PARAMETERS["RESEARCH_REQUIREMENTS"]["URANIUM"],
+            ],
+            axis=2,
+        )
+        game, slot = np.nonzero(self.unit_alive & (self.unit_type == WORKER) & active[:, None])
+        team = self.unit_team[game, slot]
+        space = UNIT_CAPACITY[WORKER] - self.unit_cargo[game, slot].sum(axis=1)
+        amount = self.resource_amount.reshape(-1)
+        for dx, dy in COLLECTION_OFFSETS:
+            x = self.unit_x[game, slot] + dx
+            y = self.unit_y[game, slot] + dy
+            inside = (x >= 0) & (y >= 0) & (x < self.width) & (y < self.height)
+            x, y = np.clip(x, 0, self.width - 1), np.clip(y, 0, self.height - 1)
+            resource = self.resource_type[game, y, x]
+            demand = np.where(inside & researched[game, team, resource], COLLECTION_RATE[resource], 0)
+            demand = np.minimum(demand, space)
+            key = (game * self.height + y) * self.width + x
+            total = np.bincount(key, weights=demand, minlength=amount.size)
+            # split evenly when the tile can not serve all of its collectors
+            share = np.minimum(1, amount[key] / np.maximum(total[key], 1))
+            given = np.floor(demand * share)
+            amount -= np.bincount(key, weights=given, minlength=amount.size)
+            collecting = given > 0
+            self.unit_cargo[game[collecting], slot[collecting], resource[collecting] - 1] += given[collecting]
+            space = space - given
+        self.resource_type[self.resource_amount <= 0] = 0
+        self.resource_amount[self.resource_type == 0] = 0
+
+    def _deposit(self, active: np.ndarray) -> None:
+        game, slot = np.nonzero(self.unit_alive & active[:, None])
+        x, y = self.unit_x[game, slot], self.unit_y[game, slot]
+        on_city = self._city_team_at(game, x, y) == self.unit_team[game, slot]
+        game, slot, x, y = game[on_city], slot[on_city], x[on_city], y[on_city]
+        fuel = self.unit_cargo[game, slot] @ FUEL_RATE[1:]
+        np.add.at(self.city_fuel, (game, self.city_index[game, y, x]), fuel)
+        self.unit_cargo[game, slot] = 0
+
+    def _night(self, night: np.ndarray) -> None:
+        if not night.any():
+            return
+        # cities burn their upkeep or go dark with all of their tiles
+        upkeep = self.city_upkeep()
+        burning = self.city_alive & night[:, None]
+        dark = burning & (self.city_fuel < upkeep)
+        # in place, views of the state arrays stay valid between turns
+        np.subtract(self.city_fuel, upkeep, out=self.city_fuel, where=burning)
+        if dark.any():
+            self.city_alive &= ~dark
+            game = np.broadcast_to(np.arange(self.batch_size)[:, None, None], self.city_index.shape)
+            lost = (self.city_index >= 0) & dark[game, np.maximum(self.city_index, 0)]
+            self.city_index[lost] = -1
+            self.city_tile_cooldown[lost] = 0
+
+        # units outside of cities burn their cargo, wood first
+        game, slot = np.nonzero(self.unit_alive & night[:, None])
+        outside = self._city_team_at(game, self.unit_x[game, slot], self.unit_y[game, slot]) != self.unit_team[game, slot]
+        game, slot = game[outside], slot[outside]
+        need = UNIT_UPKEEP[self.unit_type[game, slot]].astype(np.float64)
+        for resource in range(3):
+            used = np.minimum(self.unit_cargo[game, slot, resource], np.ceil(need / FUEL_RATE[resource + 1]))
+            self.unit_cargo[game, slot, resource] -= used
+            need = np.maximum(need - used * FUEL_RATE[resource + 1], 0)
+        starving = need > 0
+        for game, slot in zip(game[starving], slot[starving]):
+            del self._unit_slots[game][f"u_{self.unit_number[game, slot]}"]
+            self.unit_alive[game, slot] = False
+
+    def _regrow_wood(self, active: np.ndarray) -> None:
+        wood = (
+            (self.resource_type == RESOURCE_CODES[Constants.RESOURCE_TYPES.WOOD])
+            & (self.resource_amount < PARAMETERS["MAX_WOOD_AMOUNT"])
+            & active[:, None, None]
+        )
+        self.resource_amount[wood] = np.ceil(
+            np.minimum(self.resource_amount[wood] * PARAMETERS["WOOD_GROWTH_RATE"], PARAMETERS["MAX_WOOD_AMOUNT"])
+        )
+
+    def _cool_down(self, active: np.ndarray) -> None:
+        game, slot = np.nonzero(self.unit_alive & active[:, None])
+        self.unit_cooldown[game, slot] = np.maximum(self.unit_cooldown[game, slot] - 1, 0)
+        np.maximum(self.city_tile_cooldown - 1, 0, out=self.city_tile_cooldown, where=active[:, None, None])
+        carts = self.unit_type[game, slot] == CART
+        game, slot = game[carts], slot[carts]
+        x, y = self.unit_x[game, slot], self.unit_y[game, slot]
+        self.road[game, y, x] = np.minimum(self.road[game, y, x] + PARAMETERS["CART_ROAD_DEVELOPMENT_RATE"], MAX_ROAD)
+
+    def _check_done(self) -> None:
+        alive = (self.city_tile_count() + self.unit_count()) > 0
+        self.done |= (self.turn >= MAX_DAYS) | ~alive.all(axis=1)
+
+
+def starting_updates(width: int, height: int, rng: np.random.Generator) -> List[str]:
+    """
+    A mirrored map with scattered resources and one city tile with a worker for each team
+    """
+    lines = ["rp 0 0", "rp 1 0"]
+    for _ in range(width * height // 10):
+        x, y = int(rng.integers(0, width // 2)), int(rng.integers(0, height))
+        r_type = rng.choice(["wood", "wood", "wood", "coal", "uranium"])
+        amount = {"wood": 500, "coal": 350, "uranium": 300}[r_type]
+        for mirrored in (x, width - 1 - x):
+            lines.append(f"r {r_type} {mirrored} {y} {amount}")
+    city_y = height // 2
+    for team, city_x in enumerate((width // 4, width - 1 - width // 4)):
+        lines += [f"u 0 {team} u_{team + 1} {city_x} {city_y} 0 0 0 0", f"c {team} c_{team + 1} 0 23", f"ct {team} c_{team + 1} {city_x} {city_y} 0"]
+    return [line for line in dict.fromkeys(lines)] + [INPUT_CONSTANTS.DONE]
+
+
+def play(env: BatchEnv, agents: Sequence[Tuple[object, object]], initial_updates: Sequence[List[str]]) -> np.ndarray:
+    """
+    Play every game of `env` to the end with one pair of agent objects (with `reset()` and `step()`) per game,
+    the agents are reset first so the same instances can play many games. Returns the winner of every game.
+    """
+    env.reset(initial_updates)
+    for pair in agents:
+        for agent in pair:
+            agent.reset()
+    # when sampling is enabled (`sampling_profile.enable_from_environment` at startup), one game per call
+    with sampling_profile.game():
+        while not env.done.all():
+            actions = []
+            with sampling_profile.turn(int(env.turn.max())):
+                for game, pair in enumerate(agents):
+                    commands = ([], [])
+                    if not env.done[game]:
+                        for team, agent in enumerate(pair):
+                            observation = Observation(team)
+                            observation["step"] = int(env.turn[game])
+                            observation["updates"] = env.updates(game, team)
+                            commands[team].extend(agent.step(observation))
+                    actions.append(commands)
+            env.step(actions)
+    return env.winner()
+
+
+def benchmark(batch_sizes: Sequence[int] = (1, 4, 16, 64), width: int = 32, height: int = 32, turns: int = 360) -> None:
+    """
+    Play games with random commands and print the games per second for every batch size.
+    Only the time spent in `BatchEnv.step` is counted, finished games count with the turns they played.
+    """
+    rng = np.random.default_rng(0)
+    directions = list(MOVE_CODES)
+    for batch_size in batch_sizes:
+        env = BatchEnv(batch_size, width, height)
+        env.reset([starting_updates(width, height, rng) for _ in range(batch_size)])
+        elapsed = 0.0
+        played = 0
+        for _ in range(turns):
+            actions = []
+            for game in range(batch_size):
+                commands = ([], [])
+                for unit_id, slot in env._unit_slots[game].items():
+                    commands[env.unit_team[game, slot]].append(f"m {unit_id} {directions[rng.integers(0, 5)]}")
+                for y, x in zip(*np.nonzero(env.city_index[game] >= 0)):
+                    commands[env.city_team[game, env.city_index[game, y, x]]].append(f"bw {x} {y}")
+                actions.append(commands)
+            played += int((~env.done).sum())
+            start = time.perf_counter()
+            done = env.step(actions)
+            elapsed += time.perf_counter() - start
+            if done.all():
+                break
+        print(f"batch {batch_size:4d}: {played / MAX_DAYS / elapsed:8.2f} games/s")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,152 @@
+import time
+from typing import List, Sequence
+
+import numpy as np
+
+from classes import GameBoard
+from lux.game_map import Position
+from lux.game_objects import Player
+
+# default factors of the score terms, the same as in `Agent.should_build_city`
+FUEL_LEVEL_WEIGHT = 100
+DISTANCE_WEIGHT = 100
+NIGHT_PENALTY = 10000
+# distance to the nearest city when no city needs fuel
+NO_CITY_DISTANCE = 10000
+
+
+class BoardSummary:
+    """
+    Arrays of the own city tiles, resource tiles and empty tiles of one turn, the build score of any number of
+    workers is computed from these without touching the board again
+    """
+
+    def __init__(self, gameboard: GameBoard, player: Player, night_moves_left: int, is_night: bool) -> None:
+        self.radius = gameboard.width // 4
+        self.night_moves_left = night_moves_left
+        self.is_night = is_night
+
+        cities = [gameboard.own_cities.get(tile.citytile.cityid) for tile in gameboard.own_city_tiles]
+        city_tiles = [tile for tile, city in zip(gameboard.own_city_tiles, cities) if city is not None]
+        cities = [city for city in cities if city is not None]
+        self.city_pos = np.array([(tile.pos.x, tile.pos.y) for tile in city_tiles], dtype=np.int64).reshape(-1, 2)
+        # every city tile counts with the fuel and upkeep of its whole city
+        self.city_fuel = np.array([city.fuel for city in cities], dtype=np.float64)
+        self.city_upkeep = np.array([city.get_light_upkeep() for city in cities], dtype=np.float64)
+        self.city_needs_fuel = ~(self.city_upkeep * night_moves_left < self.city_fuel)
+
+        resource_tiles = gameboard.resource_tiles
+        self.resource_pos = np.array([(tile.pos.x, tile.pos.y) for tile in resource_tiles], dtype=np.int64).reshape(-1, 2)
+        self.resource_amount = np.array([tile.resource.amount for tile in resource_tiles], dtype=np.float64)
+        accessible = {"wood": True, "coal": player.researched_coal(), "uranium": player.researched_uranium()}
+        self.resource_accessible = np.array([accessible[tile.resource.type] for tile in resource_tiles], dtype=bool)
+
+        empty_tiles = [tile for tile in gameboard.tiles if not tile.has_city() and not tile.has_resource()]
+        self.empty_pos = np.array([(tile.pos.x, tile.pos.y) for tile in empty_tiles], dtype=np.int64).reshape(-1, 2)
+
+
+def _offsets(workers: np.ndarray, targets: np.ndarray):
+    dx = np.abs(workers[:, None, 0] - targets[None, :, 0])
+    dy = np.abs(workers[:, None, 1] - targets[None, :, 1])
+    return dx, dy
+
+
+def build_scores(
+    summary: BoardSummary,
+    positions: Sequence[Position],
+    fuel_level_weight: float = FUEL_LEVEL_WEIGHT,
+    distance_weight: float = DISTANCE_WEIGHT,
+    night_penalty: float = NIGHT_PENALTY,
+) -> np.ndarray:
+    """
+    The score of `Agent.should_build_city` for a full worker at every position, a city should be built where it is > 0
+    """
+    workers = np.array([(pos.x, pos.y) for pos in positions], dtype=np.int64).reshape(-1, 2)
+
+    dx, dy = _offsets(workers, summary.city_pos)
+    in_window = np.maximum(dx, dy) <= summary.radius
+    # first check if cities in vicinites have enough fuel
+    fuel_amount = (in_window * summary.city_fuel).sum(axis=1)
+    fuel_needed = (in_window * (summary.city_upkeep * 5) / (1 + dx + dy)).sum(axis=1)
+    score = -fuel_level_weight * fuel_needed / (fuel_amount + 1)
+
+    # second check if not enough fuel to support city
+    fuel_needed = (in_window * summary.city_upkeep * summary.night_moves_left).sum(axis=1)
+    resource_dx, resource_dy = _offsets(workers, summary.resource_pos)
+    resource_in_window = np.maximum(resource_dx, resource_dy) <= summary.radius
+    all_fuel_amount = (resource_in_window * summary.resource_amount).sum(axis=1)
+    fuel_amount = (resource_in_window * (summary.resource_amount * summary.resource_accessible)).sum(axis=1)
+    score += (all_fuel_amount - fuel_needed + fuel_amount - fuel_needed) / 2
+
+    # third check how long to an empty tile
+    empty_dx, empty_dy = _offsets(workers, summary.empty_pos)
+    score -= distance_weight * np.min(empty_dx + empty_dy, axis=1, initial=np.iinfo(np.int64).max)
+
+    # fourth check long to next city
+    distance = np.where(summary.city_needs_fuel, dx + dy, NO_CITY_DISTANCE)
+    score += distance_weight * np.min(distance, axis=1, initial=NO_CITY_DISTANCE)
+
+    # fifth check if it is night
+    score -= night_penalty if summary.is_night else 0
+    return score
+
+
+def benchmark(worker_counts: Sequence[int] = (1, 4, 16, 64), size: int = 32, repeat: int = 20) -> None:
+    """
+    Compare the time per turn of `Agent.should_build_city` for every worker with `build_scores`
+    for all workers at once, and check both make the same decisions
+    """
+    from agent import Agent
+    from batch_env import BatchEnv, starting_updates
+    from lux.game import Game
+    from world import World
+
+    rng = np.random.default_rng(0)
+    env = BatchEnv(1, size, size)
+    env.reset([starting_updates(size, size, rng)])
+    updates = env.updates(0, 0)[:-1]
+    for index in range(12):
+        x, y = (int(value) for value in rng.integers(0, size, 2))
+        updates += [f"c 0 c_b{index} {int(rng.integers(0, 400))} 23", f"ct 0 c_b{index} {x} {y} 0"]
+    for worker_count in worker_counts:
+        workers: List[str] = []
+        for index in range(worker_count):
+            x, y = (int(value) for value in rng.integers(0, size, 2))
+            workers.append(f"u 0 0 u_b{index} {x} {y} 0 100 0 0")
+        agent = Agent()
+        game_state = Game()
+        game_state._initialize(updates)
+        game_state._update(updates[2:] + workers + ["D_DONE"])
+        player = game_state.players[0]
+
+        # late turns need more fuel per city and night turns never build, so the decisions differ between them
+        same = True
+        builds = 0
+        for move_count in (20, 35, 200, 330):
+            agent.world = World(game_state, 0, move_count)
+            pawns = [pawn for pawn in agent.gameboard.own_pawns if pawn.pawn_id.startswith("u_b")]
+            expected = [agent.should_build_city(player, pawn) for pawn in pawns]
+            summary = BoardSummary(agent.gameboard, player, agent.world.night_moves_left, agent.world.is_night)
+            decisions = list(build_scores(summary, [pawn.pos for pawn in pawns]) > 0)
+            same = same and decisions == expected
+            builds += sum(decisions)
+
+        # a fresh world every time, the world caches the fuel windows of every position
+        start = time.perf_counter()
+        for _ in range(repeat):
+            agent.world = World(game_state, 0, 330)
+            [agent.should_build_city(player, pawn) for pawn in pawns]
+        scalar = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            agent.world = World(game_state, 0, 330)
+            summary = BoardSummary(agent.gameboard, player, agent.world.night_moves_left, agent.world.is_night)
+            build_scores(summary, [pawn.pos for pawn in pawns]) > 0
+        batched = (time.perf_counter() - start) / repeat
+        print(
+            f"{worker_count:4d} workers: per worker {scalar * 1000:8.2f}ms, batched {batched * 1000:6.2f}ms, "
+            f"{builds}/{4 * worker_count} build, {'same' if same else 'DIFFERENT'} decisions"
+        )
+
+if __name__ == "__main__":
+    benchmark()
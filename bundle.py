@@ -0,0 +1,166 @@
+import argparse
+import modulefinder
+import os
+import py_compile
+import shutil
+import statistics
+import tarfile
+import tempfile
+import zipfile
+from typing import Dict, List
+
+import startup
+import tables
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_NAME = "submission.pyz"
+# development tools, the baseline agent and the profilers and capture that are only imported when their
+# environment variable is set. They are never imported during a game of the submission.
+EXCLUDED_MODULES = [
+    "agent2",
+    "batch_env",
+    "capture",
+    "golden",
+    "mapgen",
+    "memory_profile",
+    "replay_analytics",
+    "sampling_profile",
+    "search",
+]
+# modules whose source is replaced in the bundle, with their tables written out as literals
+FROZEN_SOURCES = {"tables.py": tables.frozen_source}
+
+
+def launcher(fast_start: bool = False) -> str:
+    """
+    Source of the `main.py` that runs the driver of the bundle, the only file of the submission outside of it.
+    With `fast_start` it skips the pause of the agent before the first turn, see `startup.FAST_START`.
+    """
+    lines = ["import os", "import runpy", "import sys", ""]
+    if fast_start:
+        lines.append(f'os.environ.setdefault("{startup.ENVIRONMENT_VARIABLE}", "1")')
+    lines += [
+        f'sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "{BUNDLE_NAME}"))',
+        'runpy.run_module("main", run_name="__main__")',
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def submission_files(main: str = "main.py") -> List[str]:
+    """
+    Paths relative to the repository of all modules of the repository `main` imports, including `main` itself
+    """
+    finder = modulefinder.ModuleFinder(path=[ROOT], excludes=EXCLUDED_MODULES)
+    finder.run_script(os.path.join(ROOT, main))
+    files = set()
+    for module in finder.modules.values():
+        if module.__file__ is not None and module.__file__.startswith(ROOT + os.sep):
+            files.add(os.path.relpath(module.__file__, ROOT))
+    files.add(main)
+    # package markers are needed even when modulefinder only reports the submodules
+    for path in list(files):
+        package = os.path.dirname(path)
+        if package:
+            files.add(os.path.join(package, "__init__.py"))
+    return sorted(files)
+
+
+def stage(files: List[str], directory: str) -> None:
+    """
+    Copy `files` into `directory`, with the frozen version of every module in `FROZEN_SOURCES`
+    """
+    for path in files:
+        target = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if path in FROZEN_SOURCES:
+            with open(target, "w") as f:
+                f.write(FROZEN_SOURCES[path]())
+        else:
+            shutil.copyfile(os.path.join(ROOT, path), target)
+
+
+def build_bundle(files: List[str], path: str) -> None:
+    """
+    Write the zipapp `path` with the source and the byte-compiled module next to it for every file.
+    The bytecode does not depend on the modification time, zipimport falls back to the source
+    when it was compiled by another python version.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        stage(files, directory)
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as bundle:
+            for file in files:
+                source = os.path.join(directory, file)
+                py_compile.compile(
+                    source,
+                    cfile=source + "c",
+                    doraise=True,
+                    invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+                )
+                bundle.write(source, file)
+                bundle.write(source + "c", file + "c")
+            bundle.writestr("__main__.py", 'import runpy\n\nrunpy.run_module("main", run_name="__main__")\n')
+
+
+def build_submission(path: str, main: str = "main.py", fast_start: bool = False) -> None:
+    """
+    The submission archive: the bundle and the launcher that runs it as `main.py`
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        build_bundle(submission_files(main), os.path.join(directory, BUNDLE_NAME))
+        with open(os.path.join(directory, "main.py"), "w") as f:
+            f.write(launcher(fast_start))
+        with tarfile.open(path, "w:gz") as archive:
+            archive.add(os.path.join(directory, BUNDLE_NAME), BUNDLE_NAME)
+            archive.add(os.path.join(directory, "main.py"), "main.py")
+
+
+def build_source_tarball(path: str, main: str = "main.py") -> None:
+    """
+    The same modules as plain sources, like the submission was uploaded before
+    """
+    with tarfile.open(path, "w:gz") as archive:
+        for file in submission_files(main):
+            archive.add(os.path.join(ROOT, file), file)
+
+
+def compare(main: str = "main.py", repeat: int = 5) -> Dict[str, List[float]]:
+    """
+    Unpack the source tarball and the submission into fresh directories, as the grading environment does,
+    and measure the time until the first action of both
+    """
+    timings: Dict[str, List[float]] = {"sources": [], "bundle": []}
+    with tempfile.TemporaryDirectory() as directory:
+        archives = {"sources": os.path.join(directory, "sources.tar.gz"), "bundle": os.path.join(directory, "bundle.tar.gz")}
+        build_source_tarball(archives["sources"], main)
+        build_submission(archives["bundle"], main)
+        for run in range(repeat):
+            for name, archive in archives.items():
+                unpacked = os.path.join(directory, f"{name}_{run}")
+                with tarfile.open(archive) as f:
+                    f.extractall(unpacked)
+                timings[name].append(startup.first_action_time(os.path.join(unpacked, "main.py")))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the submission as one byte-compiled bundle")
+    parser.add_argument("--out", default="submission.tar.gz", help="submission archive to write")
+    parser.add_argument("--main", default="main.py", help="driver of the submission")
+    parser.add_argument("--compare", type=int, default=0, help="compare the startup against the source tarball this often")
+    parser.add_argument(
+        "--fast-start", action="store_true", help="skip the pause of the agent before the first turn, changes the timing of the game"
+    )
+    args = parser.parse_args()
+
+    build_submission(args.out, args.main, args.fast_start)
+    print(f"{args.out}: {', '.join(submission_files(args.main))}")
+    if args.compare > 0:
+        for name, timings in compare(args.main, args.compare).items():
+            print(
+                f"{name:8s} first action: median {statistics.median(timings) * 1000:.1f}ms, "
+                f"min {min(timings) * 1000:.1f}ms, max {max(timings) * 1000:.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
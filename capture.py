@@ -0,0 +1,168 @@
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+from classes import Observation
+from lux.game import Game
+
+# set to a file path to capture the raw updates of every turn, "{player}" is replaced with the player id
+ENVIRONMENT_VARIABLE = "LUX_CAPTURE"
+# turn, player, offset and length of every record in the data file
+INDEX_ENTRY = struct.Struct("<iiQI")
+
+
+class CaptureWriter:
+    """
+    Appends the update lines of every turn to `path`, with a fixed size index entry per turn in `path.idx`
+    """
+
+    def __init__(self, path: str) -> None:
+        self.data = open(path, "ab")
+        self.index = open(path + ".idx", "ab")
+
+    def write(self, turn: int, player: int, updates: List[str]) -> None:
+        record = "\n".join(updates).encode()
+        offset = self.data.tell()
+        self.data.write(record)
+        self.data.flush()
+        # the index entry is written last, so a crash never leaves an entry pointing to a partial record
+        self.index.write(INDEX_ENTRY.pack(turn, player, offset, len(record)))
+        self.index.flush()
+
+    def close(self) -> None:
+        self.data.close()
+        self.index.close()
+
+
+class CaptureReader:
+    """
+    Records of one player by turn. Both players may write to the same file, `player` picks one of them
+    (by default the lowest player id in the file). A file appended to by several games keeps the last game.
+    """
+
+    def __init__(self, path: str, player: Optional[int] = None) -> None:
+        self.path = path
+        with open(path + ".idx", "rb") as f:
+            index = f.read()
+        complete = len(index) - len(index) % INDEX_ENTRY.size
+        # player -> turn -> offset and length, of the last game of every player
+        records: Dict[int, Dict[int, Tuple[int, int]]] = {}
+        for offset in range(0, complete, INDEX_ENTRY.size):
+            turn, entry_player, data_offset, length = INDEX_ENTRY.unpack_from(index, offset)
+            if turn == 0 or entry_player not in records:
+                records[entry_player] = {}
+            records[entry_player][turn] = (data_offset, length)
+        self.players = sorted(records)
+        if player is None:
+            player = self.players[0] if len(self.players) > 0 else 0
+        self.player = player
+        self.entries = records.get(player, {})
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def updates(self, turn: int) -> List[str]:
+        if turn not in self.entries:
+            raise KeyError(f"{self.path} has no updates of turn {turn} for player {self.player}")
+        offset, length = self.entries[turn]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(length).decode().split("\n")
+
+    def observation(self, turn: int) -> Observation:
+        observation = Observation(self.player)
+        observation["step"] = turn
+        observation["updates"] = self.updates(turn)
+        return observation
+
+    def game_before(self, turn: int) -> Game:
+        """
+        The `Game` of the agent right before it parses the updates of `turn`
+        """
+        game_state = Game()
+        game_state._initialize(self.updates(0))
+        game_state.id = self.player
+        game_state.turn = turn - 1
+        return game_state
+
+
+_writer: Optional[CaptureWriter] = None
+_path: Optional[str] = os.environ.get(ENVIRONMENT_VARIABLE)
+
+
+def capture(turn: int, player: int, updates: List[str]) -> None:
+    """
+    Capture the updates of this turn, does nothing unless capturing is enabled
+    """
+    global _writer
+    if _path is None:
+        return
+    if _writer is None:
+        _writer = CaptureWriter(_path.format(player=player))
+    _writer.write(turn, player, updates)
+
+
+def prepare(agent, reader: CaptureReader, turn: int, warmup: bool = False) -> None:
+    """
+    Rebuild the state `agent` has before `turn`. Without `warmup` only the game state is rebuilt,
+    with `warmup` all previous turns are played, so state carried between turns is rebuilt exactly too.
+    """
+    agent.reset()
+    if warmup:
+        for previous in range(turn):
+            agent.step(reader.observation(previous))
+    elif turn > 0:
+        agent.game_state = reader.game_before(turn)
+        agent.move_count = turn
+
+
+def run_turns(agent, reader: CaptureReader, first: int, last: int) -> List[float]:
+    """
+    Feed turns `first` to `last` into `agent` and return the time of every turn
+    """
+    timings = []
+    for turn in range(first, last + 1):
+        observation = reader.observation(turn)
+        start = time.perf_counter()
+        agent.step(observation)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> None:
+    import argparse
+    import cProfile
+    import importlib
+    import pstats
+
+    parser = argparse.ArgumentParser(description="Replay captured turns into an agent")
+    parser.add_argument("capture", help="capture file written with LUX_CAPTURE")
+    parser.add_argument("--turn", type=int, default=0, help="first turn to replay")
+    parser.add_argument("--to", type=int, default=None, help="last turn to replay, defaults to --turn")
+    parser.add_argument("--player", type=int, default=None, help="player to replay, if both players wrote to the capture")
+    parser.add_argument("--agent", default="agent", help="module of the Agent to replay into")
+    parser.add_argument("--repeat", type=int, default=1, help="how often the turns are replayed")
+    parser.add_argument("--warmup", action="store_true", help="play all previous turns first")
+    parser.add_argument("--profile", default=None, help="write cProfile stats of the replayed turns to this file")
+    args = parser.parse_args()
+
+    reader = CaptureReader(args.capture, args.player)
+    last = args.turn if args.to is None else args.to
+    agent = importlib.import_module(args.agent).Agent()
+    profiler = cProfile.Profile() if args.profile else None
+    for _ in range(args.repeat):
+        prepare(agent, reader, args.turn, args.warmup)
+        if profiler is not None:
+            profiler.enable()
+        timings = run_turns(agent, reader, args.turn, last)
+        if profiler is not None:
+            profiler.disable()
+        print(" ".join(f"{turn}:{timing * 1000:.1f}ms" for turn, timing in zip(range(args.turn, last + 1), timings)))
+    if profiler is not None:
+        profiler.dump_stats(args.profile)
+        pstats.Stats(args.profile).sort_stats("cumulative").print_stats(20)
+
+
+if __name__ == "__main__":
+    main()
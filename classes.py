@@ -1,23 +1,54 @@
 from typing import Callable, List, Optional
 from lux.game import Game
 from lux.game_objects import City, CityTile, Unit
-from lux.game_map import DIRECTIONS, Cell, GameMap, Position
+from lux.game_map import DIRECTIONS, Cell, GameMap, OccupancyGrid, Position
+
+
+class Observation(dict):
+    """
+    Observation as the driver loop passes it to the agents, with the `updates` and `step` keys
+    """
+
+    def __init__(self, player=0) -> None:
+        self.player = player
 
 
 class Pawn:
-    def __init__(self, unit: Unit):
+    def __init__(self, unit: Unit, planned: Optional[OccupancyGrid] = None, index: int = -1):
         self.unit = unit
-        self.next_move: Position = Position(self.unit.pos.x, self.unit.pos.y)
-        self.team = self.unit.team
-        self.pos = Position(self.unit.pos.x, self.unit.pos.y)
-        self.pawn_id = self.unit.id
+        # None while the pawn stays on its position
+        self._next_move: Optional[Position] = None
+        # grid of the next moves of all pawns, kept up to date when `next_move` changes
+        self.planned = planned
+        self.index = index
+        if planned is not None:
+            table, row = unit.table, unit.row
+            planned.add(table.x[row], table.y[row], index, table.type[row], table.cooldown[row])
+
+    @property
+    def pos(self) -> Position:
+        return self.unit.pos
+
+    @property
+    def team(self) -> int:
+        return self.unit.team
+
+    @property
+    def pawn_id(self) -> str:
+        return self.unit.id
 
     @property
     def next_move(self) -> Position:
-        return self._next_move
+        return self.unit.pos if self._next_move is None else self._next_move
 
     @next_move.setter
     def next_move(self, pos: Position) -> None:
+        if self.planned is not None:
+            current = self.next_move
+            if self.planned.in_bounds(current.x, current.y):
+                self.planned.remove(current.x, current.y, self.index)
+            if self.planned.in_bounds(pos.x, pos.y):
+                self.planned.add(pos.x, pos.y, self.index, self.unit.type, self.unit.cooldown)
         self._next_move = pos
 
     def is_worker(self) -> bool:
@@ -67,7 +98,14 @@ class GameBoard:
         self.city_tiles = list(filter(lambda tile: tile.has_city(), self.tiles))
         self.own_city_tiles = list(filter(lambda city_tile: city_tile.team == observation.player, self.city_tiles))
         self.enemy_city_tiles = list(filter(lambda city_tile: city_tile.team != observation.player, self.city_tiles))
-        self.pawns = [Pawn(unit) for unit in [*game_state.players[0].units, *game_state.players[1].units]]
+        self.own_occupancy = game_state.occupancy[observation.player]
+        self.enemy_occupancy = game_state.occupancy[(observation.player + 1) % 2]
+        # next moves of all pawns of both teams, indexed like `pawns`
+        self.planned = OccupancyGrid(self.width, self.height)
+        self.pawns = [
+            Pawn(unit, self.planned, index)
+            for index, unit in enumerate([*game_state.players[0].units, *game_state.players[1].units])
+        ]
         self.own_pawns = list(filter(lambda pawn: pawn.team == observation.player, self.pawns))
         self.enemy_pawns = list(filter(lambda pawn: pawn.team != observation.player, self.pawns))
         self.own_cities = game_state.players[observation.player].cities
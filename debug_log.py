@@ -0,0 +1,21 @@
+class DebugLog:
+    """
+    Writes info messages to `filename`. The logging module is only imported and the file only opened
+    when the first message is written, so importing an agent costs neither.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.logger = None
+
+    def info(self, message: str) -> None:
+        if self.logger is None:
+            import logging
+
+            self.logger = logging.getLogger(self.filename)
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+            handler = logging.FileHandler(self.filename, mode="w")
+            handler.setFormatter(logging.Formatter("%(levelname)s:%(message)s"))
+            self.logger.addHandler(handler)
+        self.logger.info(message)
@@ -0,0 +1,214 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from forecast import resource_planes
+from lux.game import Game
+from lux.game_constants import GAME_CONSTANTS
+
+WORKER_CAPACITY = GAME_CONSTANTS["PARAMETERS"]["RESOURCE_CAPACITY"]["WORKER"]
+
+# turns of positions and cargo kept per unit
+HISTORY = 8
+# rows of the unit tables, grown when more units are alive at once
+INITIAL_CAPACITY = 64
+# a unit that moved within this many turns is expected to keep moving, workers move every other turn
+MOVE_MEMORY = GAME_CONSTANTS["PARAMETERS"]["UNIT_ACTION_COOLDOWN"]["WORKER"]
+# chance that a unit which can act ends up on its predicted cell
+PREDICTED_CHANCE = 0.6
+# targets in the direction the unit is heading count as this many tiles closer
+HEADING_BONUS = 2.0
+# stay, north, east, south, west as (dx, dy)
+STEPS = np.array([(0, 0), (0, -1), (1, 0), (0, 1), (-1, 0)])
+STEP_STAY, STEP_NORTH, STEP_EAST, STEP_SOUTH, STEP_WEST = range(5)
+
+
+class EnemyTracker:
+    """
+    Positions and cargo of the enemy units over the last `history` turns, kept by unit id across turns.
+
+    Every unit has a row in fixed size tables with a ring buffer of `history` turns, the column of a turn is
+    `turn % history`, so one turn is written with a single array assignment for all units. Rows of units that
+    are gone are reused.
+    """
+
+    def __init__(self, history: int = HISTORY) -> None:
+        self.history = history
+        self.slots: Dict[str, int] = {}
+        self.free: List[int] = []
+        self.positions = np.full((INITIAL_CAPACITY, history, 2), -1, dtype=np.int16)
+        self.cargo = np.zeros((INITIAL_CAPACITY, history), dtype=np.int16)
+        # turn a row was first and last written, -1 for free rows
+        self.first_seen = np.full(INITIAL_CAPACITY, -1, dtype=np.int64)
+        self.last_seen = np.full(INITIAL_CAPACITY, -1, dtype=np.int64)
+        self.turn = -1
+        self.width = 0
+        self.height = 0
+        # rows, positions, cargo and whether the unit can act of the units alive this turn
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.current = np.zeros((0, 2), dtype=np.int64)
+        self.current_cargo = np.zeros(0, dtype=np.int64)
+        self.can_act = np.zeros(0, dtype=bool)
+        self.team = -1
+        self.game_state: Optional[Game] = None
+        self._targets: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._occupancy: Optional[np.ndarray] = None
+
+    def _grow(self) -> None:
+        capacity = len(self.last_seen)
+        self.positions = np.concatenate([self.positions, np.full_like(self.positions, -1)])
+        self.cargo = np.concatenate([self.cargo, np.zeros_like(self.cargo)])
+        self.first_seen = np.concatenate([self.first_seen, np.full(capacity, -1, dtype=np.int64)])
+        self.last_seen = np.concatenate([self.last_seen, np.full(capacity, -1, dtype=np.int64)])
+        self.free += range(capacity, 2 * capacity)
+
+    def _slot(self, unit_id: str) -> int:
+        slot = self.slots.get(unit_id)
+        if slot is None:
+            if len(self.free) == 0:
+                self._grow()
+            slot = self.slots[unit_id] = self.free.pop()
+            self.positions[slot] = -1
+            self.cargo[slot] = 0
+            self.first_seen[slot] = self.turn
+        return slot
+
+    def update(self, game_state: Game, team: int) -> None:
+        """
+        Record the units of `team` in this turn, once per turn right after parsing the updates
+        """
+        self.turn = game_state.turn
+        self.team = team
+        self.game_state = game_state
+        self.width = game_state.map_width
+        self.height = game_state.map_height
+        units = game_state.players[team].units
+        ids = units.table.ids
+        self.rows = np.array([self._slot(ids[row]) for row in units.rows], dtype=np.int64)
+        columns = units.columns()
+        self.current = np.stack([columns["x"], columns["y"]], axis=1)
+        self.current_cargo = units.cargo()
+        self.can_act = units.can_act()
+        column = self.turn % self.history
+        self.positions[self.rows, column] = self.current
+        self.cargo[self.rows, column] = self.current_cargo
+        self.last_seen[self.rows] = self.turn
+
+        # units that were not seen this turn are gone
+        gone = [unit_id for unit_id, slot in self.slots.items() if self.last_seen[slot] != self.turn]
+        for unit_id in gone:
+            slot = self.slots.pop(unit_id)
+            self.last_seen[slot] = -1
+            self.first_seen[slot] = -1
+            self.free.append(slot)
+        self._targets = None
+        self._occupancy = None
+
+    def trail(self, unit_id: str) -> List[Tuple[int, int, int]]:
+        """
+        The recorded (turn, x, y) of a unit, oldest first
+        """
+        slot = self.slots[unit_id]
+        first = max(self.first_seen[slot], self.turn - self.history + 1)
+        return [
+            (turn, *(int(value) for value in self.positions[slot, turn % self.history]))
+            for turn in range(first, self.turn + 1)
+        ]
+
+    def moved_recently(self) -> np.ndarray:
+        """
+        Whether every current unit moved within the last `MOVE_MEMORY` turns, units that can act again then
+        usually keep moving
+        """
+        moved = np.zeros(len(self.rows), dtype=bool)
+        for back in range(1, MOVE_MEMORY + 1):
+            # the older column is only valid if the unit was already seen in that turn
+            valid = self.first_seen[self.rows] <= self.turn - back
+            newer = self.positions[self.rows, (self.turn - back + 1) % self.history]
+            older = self.positions[self.rows, (self.turn - back) % self.history]
+            moved |= valid & (newer != older).any(axis=1)
+        return moved
+
+    def heading(self) -> np.ndarray:
+        """
+        Mean displacement per turn of every current unit over its history, (dx, dy)
+        """
+        first = np.maximum(self.first_seen[self.rows], self.turn - self.history + 1)
+        oldest = self.positions[self.rows, first % self.history].astype(np.float64)
+        turns = np.maximum(self.turn - first, 1)[:, None]
+        return (self.current - oldest) / turns
+
+    def predicted_steps(self) -> np.ndarray:
+        """
+        Index into `STEPS` of the most likely move of every current unit next turn: units that can act and moved
+        recently step towards their target along the longer axis, all others stay
+        """
+        targets, _ = self.targets()
+        offsets = targets - self.current
+        along_x = np.abs(offsets[:, 0]) >= np.abs(offsets[:, 1])
+        steps = np.select(
+            [along_x & (offsets[:, 0] > 0), along_x & (offsets[:, 0] < 0), ~along_x & (offsets[:, 1] > 0), ~along_x & (offsets[:, 1] < 0)],
+            [STEP_EAST, STEP_WEST, STEP_SOUTH, STEP_NORTH],
+            STEP_STAY,
+        )
+        return np.where(self.can_act & self.moved_recently(), steps, STEP_STAY)
+
+    def predicted_cells(self) -> np.ndarray:
+        """
+        Most likely position (x, y) of every current unit next turn
+        """
+        return self.current + STEPS[self.predicted_steps()]
+
+    def occupancy(self) -> np.ndarray:
+        """
+        Expected number of enemy units on every tile next turn, indexed [y, x]. Units that can act are on their
+        predicted cell with `PREDICTED_CHANCE` and spread the rest over all steps on the map, the others stay.
+        """
+        if self._occupancy is not None:
+            return self._occupancy
+        occupancy = np.zeros((self.height, self.width), dtype=np.float64)
+        count = len(self.rows)
+        if count > 0:
+            cells = self.current[:, None, :] + STEPS[None, :, :]
+            inside = (cells[..., 0] >= 0) & (cells[..., 0] < self.width) & (cells[..., 1] >= 0) & (cells[..., 1] < self.height)
+            weights = (1 - PREDICTED_CHANCE) * inside / inside.sum(axis=1, keepdims=True)
+            weights[np.arange(count), self.predicted_steps()] += PREDICTED_CHANCE
+            # units on cooldown stay where they are
+            weights[~self.can_act] = 0
+            weights[~self.can_act, STEP_STAY] = 1
+            np.add.at(occupancy, (np.clip(cells[..., 1], 0, self.height - 1), np.clip(cells[..., 0], 0, self.width - 1)), weights)
+        self._occupancy = occupancy
+        return occupancy
+
+    def targets(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Likely target tile (x, y) of every current unit and its distance: the nearest resource tile for units
+        with cargo space, the nearest city tile of their team for full ones. Tiles in the direction the unit
+        is heading count as closer. Units without any candidate get their own position.
+        """
+        if self._targets is not None:
+            return self._targets
+        resource_types, _ = resource_planes(self.game_state)
+        ys, xs = np.nonzero(resource_types)
+        resources = list(zip(xs.tolist(), ys.tolist()))
+        city_tiles = [
+            (city_tile.pos.x, city_tile.pos.y)
+            for city in self.game_state.players[self.team].cities.values()
+            for city_tile in city.citytiles
+        ]
+        targets = self.current.copy()
+        distances = np.zeros(len(self.rows), dtype=np.int64)
+        full = self.current_cargo >= WORKER_CAPACITY
+        heading = self.heading()
+        for candidates, units in ((resources, ~full), (city_tiles, full)):
+            if len(candidates) == 0 or not units.any():
+                continue
+            candidates = np.array(candidates, dtype=np.int64)
+            offsets = candidates[None, :, :] - self.current[units, None, :]
+            distance = np.abs(offsets).sum(axis=2)
+            alignment = (offsets * heading[units, None, :]).sum(axis=2) / np.maximum(distance, 1)
+            best = (distance - HEADING_BONUS * alignment).argmin(axis=1)
+            targets[units] = candidates[best]
+            distances[units] = distance[np.arange(len(best)), best]
+        self._targets = (targets, distances)
+        return self._targets
@@ -0,0 +1,109 @@
+import math
+from typing import Tuple
+
+import numpy as np
+
+from lux.constants import Constants
+from lux.game import Game
+from lux.game_constants import GAME_CONSTANTS
+
+RESOURCE_TYPES = Constants.RESOURCE_TYPES
+PARAMETERS = GAME_CONSTANTS["PARAMETERS"]
+
+# index of each resource type in the type plane, 0 means no resource
+RESOURCE_INDEX = {RESOURCE_TYPES.WOOD: 1, RESOURCE_TYPES.COAL: 2, RESOURCE_TYPES.URANIUM: 3}
+COLLECTION_RATE = np.array(
+    [
+        0,
+        PARAMETERS["WORKER_COLLECTION_RATE"]["WOOD"],
+        PARAMETERS["WORKER_COLLECTION_RATE"]["COAL"],
+        PARAMETERS["WORKER_COLLECTION_RATE"]["URANIUM"],
+    ],
+    dtype=np.float64,
+)
+WOOD_GROWTH_RATE = PARAMETERS["WOOD_GROWTH_RATE"]
+MAX_WOOD_AMOUNT = PARAMETERS["MAX_WOOD_AMOUNT"]
+
+NEVER = np.iinfo(np.int32).max
+
+
+def resource_planes(game_state: Game) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the resource type plane (see `RESOURCE_INDEX`) and the resource amount plane, both indexed [y, x]
+    """
+    game_map = game_state.map
+    types = np.zeros((game_map.height, game_map.width), dtype=np.int8)
+    amounts = np.zeros((game_map.height, game_map.width), dtype=np.float64)
+    for y in range(game_map.height):
+        for x in range(game_map.width):
+            resource = game_map.get_cell(x, y).resource
+            if resource is not None and resource.amount > 0:
+                types[y, x] = RESOURCE_INDEX[resource.type]
+                amounts[y, x] = resource.amount
+    return types, amounts
+
+
+def neighbourhood_sum(plane: np.ndarray) -> np.ndarray:
+    """
+    Sum of every tile and its 4 orthogonal neighbours, tiles outside of the map count as 0
+    """
+    padded = np.pad(plane, 1)
+    return padded[1:-1, 1:-1] + padded[:-2, 1:-1] + padded[2:, 1:-1] + padded[1:-1, :-2] + padded[1:-1, 2:]
+
+
+def collection_pressure(game_state: Game, types: np.ndarray) -> np.ndarray:
+    """
+    Amount that gets mined from every resource tile per turn by the workers currently on or next to it.
+    Only workers with cargo space left and the research for the resource type are counted.
+    """
+    pressure = np.zeros(types.shape, dtype=np.float64)
+    for player in game_state.players:
+        units = player.units
+        columns = units.columns()
+        collecting = units.is_worker() & (units.cargo_space_left() > 0)
+        cells = columns["y"][collecting] * types.shape[1] + columns["x"][collecting]
+        workers = np.bincount(cells, minlength=types.size).reshape(types.shape).astype(np.float64)
+        accessible = np.array(
+            [False, True, player.researched_coal(), player.researched_uranium()],
+            dtype=bool,
+        )
+        pressure += neighbourhood_sum(workers) * COLLECTION_RATE[types] * accessible[types]
+    return pressure
+
+
+def forecast_resources(game_state: Game, turns: int) -> np.ndarray:
+    """
+    Forecast the resource amount of every tile for the next `turns` turns, assuming the
+    collection pressure of the current turn stays the same.
+
+    Returns an array of shape (turns + 1, height, width), index 0 is the current turn.
+    """
+    types, amounts = resource_planes(game_state)
+    pressure = collection_pressure(game_state, types)
+    wood = types == RESOURCE_INDEX[RESOURCE_TYPES.WOOD]
+    forecast = np.empty((turns + 1, *types.shape), dtype=np.float64)
+    forecast[0] = amounts
+    for turn in range(1, turns + 1):
+        amounts = np.maximum(amounts - pressure, 0)
+        # wood regrows on tiles that are not yet depleted, same as the engine
+        growing = wood & (amounts > 0) & (amounts < MAX_WOOD_AMOUNT)
+        amounts[growing] = np.ceil(np.minimum(amounts[growing] * WOOD_GROWTH_RATE, MAX_WOOD_AMOUNT))
+        forecast[turn] = amounts
+    return forecast
+
+
+def turns_until_depleted(forecast: np.ndarray) -> np.ndarray:
+    """
+    Returns for every tile the first forecasted turn the tile is empty, `NEVER` if it stays
+    non-empty for the whole forecast. Tiles without any resource are 0.
+    """
+    empty = forecast <= 0
+    depleted = empty.any(axis=0)
+    return np.where(depleted, empty.argmax(axis=0), NEVER).astype(np.int32)
+
+
+def depleted_before(depletion: np.ndarray, x: int, y: int, turns: float) -> bool:
+    """
+    Check if the tile at `x`, `y` will be empty before a unit `turns` away arrives
+    """
+    return depletion[y, x] <= math.ceil(turns)
@@ -0,0 +1,171 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+import time
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# directory of the recorded games, one gzipped JSON lines file per game
+CORPUS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+# full length of a game
+MAX_TURNS = 360
+# agent module, map size, seed and recorded turns of the games in the corpus. A turn of the larger maps costs
+# several times more, only the 12x12 games are played to the end so a check stays within seconds
+CASES = [
+    ("agent", 12, 0, MAX_TURNS),
+    ("agent", 16, 1, 80),
+    ("agent", 24, 2, 50),
+    ("agent", 32, 3, 40),
+    ("agent2", 12, 0, MAX_TURNS),
+    ("agent2", 16, 1, 160),
+    ("agent2", 24, 2, 120),
+    ("agent2", 32, 3, 80),
+]
+# diffs printed per game
+REPORT_DIFFS = 10
+
+# (turn, team, unit id or city tile, expected commands, actual commands)
+Diff = Tuple[int, int, str, List[str], List[str]]
+
+
+def make_agent(module: str):
+    """
+    The agent exactly as it is submitted, its decisions do not depend on timing as long as the planner and the
+    assignment finish before their time caps
+    """
+    import importlib
+
+    return importlib.import_module(module).Agent()
+
+
+def case_path(module: str, size: int, seed: int, directory: str = CORPUS_DIRECTORY) -> str:
+    return os.path.join(directory, f"{module}-{size}-{seed}.jsonl.gz")
+
+
+def record(module: str, size: int, seed: int, turns: int = MAX_TURNS, directory: str = CORPUS_DIRECTORY) -> str:
+    """
+    Play the first `turns` turns of a game of the agent against itself on the local rules and write the updates
+    and actions of both teams for every turn
+    """
+    from batch_env import BatchEnv, starting_updates
+    from classes import Observation
+
+    agents = (make_agent(module), make_agent(module))
+    env = BatchEnv(1, size, size)
+    env.reset([starting_updates(size, size, np.random.default_rng(seed))])
+    os.makedirs(directory, exist_ok=True)
+    path = case_path(module, size, seed, directory)
+    # no timestamp in the gzip header, a recording that did not change stays byte identical
+    with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+        f.write((json.dumps({"agent": module, "size": size, "seed": seed, "turns": turns}) + "\n").encode())
+        while not env.done[0] and env.turn[0] < turns:
+            updates = [env.updates(0, team) for team in range(2)]
+            actions = []
+            for team, agent in enumerate(agents):
+                observation = Observation(team)
+                observation["step"] = int(env.turn[0])
+                observation["updates"] = updates[team]
+                actions.append(agent.step(observation))
+            f.write((json.dumps({"turn": int(env.turn[0]), "updates": updates, "actions": actions}) + "\n").encode())
+            env.step([tuple(actions)])
+    return path
+
+
+def read_case(path: str) -> Tuple[Dict, List[Dict]]:
+    with gzip.open(path, "rt") as f:
+        header = json.loads(f.readline())
+        return header, [json.loads(line) for line in f if line.strip()]
+
+
+def command_key(command: str) -> str:
+    """
+    The unit id or city tile of a command, annotations are grouped together
+    """
+    parts = command.split(" ")
+    if parts[0] in ("m", "bcity", "p", "t"):
+        return parts[1]
+    if parts[0] in ("r", "bw", "bc"):
+        return f"city tile {parts[1]} {parts[2]}"
+    return "annotations"
+
+
+def diff_actions(turn: int, team: int, expected: Sequence[str], actual: Sequence[str]) -> List[Diff]:
+    grouped: Dict[str, Tuple[List[str], List[str]]] = {}
+    for index, commands in enumerate((expected, actual)):
+        for command in commands:
+            grouped.setdefault(command_key(command), ([], []))[index].append(command)
+    return [(turn, team, key, old, new) for key, (old, new) in grouped.items() if old != new]
+
+
+def replay(path: str) -> Tuple[str, int, List[Diff], float]:
+    """
+    Feed the recorded updates of every turn into fresh agents and compare their actions with the recorded ones.
+    The agents always see the recorded game, so one changed decision does not hide the ones after it.
+    Returns the path, the number of turns, the diffs and the time the agents took.
+    """
+    from classes import Observation
+
+    header, turns = read_case(path)
+    agents = (make_agent(header["agent"]), make_agent(header["agent"]))
+    diffs = []
+    elapsed = 0.0
+    for record in turns:
+        for team, agent in enumerate(agents):
+            observation = Observation(team)
+            observation["step"] = record["turn"]
+            observation["updates"] = record["updates"][team]
+            start = time.perf_counter()
+            actions = agent.step(observation)
+            elapsed += time.perf_counter() - start
+            diffs += diff_actions(record["turn"], team, record["actions"][team], actions)
+    return path, len(turns), diffs, elapsed
+
+
+def check(paths: Sequence[str], workers: Optional[int] = None) -> int:
+    """
+    Replay all games in parallel and print every game with changed actions, returns the number of changed turns
+    """
+    start = time.perf_counter()
+    changed = 0
+    # the largest games take longest, starting them first keeps all workers busy until the end
+    paths = sorted(paths, key=os.path.getsize, reverse=True)
+    with Pool(workers) as pool:
+        for path, turns, diffs, elapsed in pool.imap_unordered(replay, paths):
+            name = os.path.basename(path)
+            changed_turns = len({(turn, team) for turn, team, _, _, _ in diffs})
+            changed += changed_turns
+            print(f"{name}: {turns} turns in {elapsed:.2f}s, {changed_turns} changed", flush=True)
+            for turn, team, key, expected, actual in diffs[:REPORT_DIFFS]:
+                print(f"  turn {turn} team {team} {key}: expected {expected}, got {actual}")
+            if len(diffs) > REPORT_DIFFS:
+                print(f"  ... {len(diffs) - REPORT_DIFFS} more")
+    print(f"{len(paths)} games in {time.perf_counter() - start:.2f}s, {changed} changed turns")
+    return changed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record the golden actions of the agents or check the agents against them")
+    parser.add_argument("command", choices=["check", "record"])
+    parser.add_argument("--directory", default=CORPUS_DIRECTORY, help="directory of the corpus")
+    parser.add_argument("--agent", default=None, help="only games of this agent module")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of processes")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        for module, size, seed, turns in CASES:
+            if args.agent is None or module == args.agent:
+                print(record(module, size, seed, turns, args.directory), flush=True)
+        return
+    paths = sorted(glob.glob(os.path.join(args.directory, f"{args.agent or '*'}-*.jsonl.gz")))
+    if len(paths) == 0:
+        raise SystemExit(f"No recorded games in {args.directory}, record them with `python golden.py record`")
+    if check(paths, args.workers) > 0:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batch_env import (
+    BUILD_CART,
+    BUILD_CITY,
+    BUILD_WORKER,
+    CYCLE_LENGTH,
+    DAY_LENGTH,
+    MOVE_CODES,
+    MOVE_EAST,
+    MOVE_NORTH,
+    MOVE_SOUTH,
+    MOVE_WEST,
+    NONE,
+    PILLAGE,
+    RESEARCH,
+    BatchEnv,
+    starting_updates,
+)
+from classes import Observation
+from lux.game_objects import CityTile, Unit
+
+# command direction of every move code
+MOVE_DIRECTIONS = {code: direction for direction, code in MOVE_CODES.items()}
+# number of the unit and city tile action codes, transfers need a target and are not part of the action space
+UNIT_ACTIONS = PILLAGE + 1
+CITY_ACTIONS = BUILD_CART + 1
+SCALARS = ["turn", "day phase", "night", "own research points", "enemy research points"]
+
+
+class LuxEnv:
+    """
+    One game of the local rules of `BatchEnv` from the view of `team`, the other team is played by a scripted
+    agent (anything with `reset()` and `step(observation)`). `reset` and `step` follow the gym interface.
+
+    Observations are dicts of fixed shape arrays, maps are indexed [y, x] and units by their slot in the unit table:
+
+    - `resource_type`, `resource_amount`, `road`, `city_tile_cooldown` and the `unit_*` tables are views of the
+      state of the environment, they change with every step
+    - `own_units`, `enemy_units`, `city`, `city_fuel`, `units`, `cargo` and `scalars` are buffers of the environment
+      that are filled in place every step
+
+    Copy what has to outlive a step. Actions are a dict with a unit action code for every unit slot (`units`) and
+    a city tile action code for every tile (`cities`), see `decode`.
+    """
+
+    def __init__(self, width: int = 16, height: int = 16, opponent=None, team: int = 0, seed: Optional[int] = None) -> None:
+        if opponent is None:
+            from agent2 import Agent
+
+            opponent = Agent()
+        self.width = width
+        self.height = height
+        self.opponent = opponent
+        self.team = team
+        self.rng = np.random.default_rng(seed)
+        self.env = BatchEnv(1, width, height)
+        max_units = self.env.max_units
+        self.own_units = np.zeros(max_units, dtype=bool)
+        self.enemy_units = np.zeros(max_units, dtype=bool)
+        # own first, then enemy
+        self.city = np.zeros((2, height, width), dtype=np.float32)
+        self.city_fuel = np.zeros((height, width), dtype=np.float64)
+        # team, then worker and cart
+        self.units = np.zeros((2, 2, height, width), dtype=np.float32)
+        self.cargo = np.zeros((2, height, width), dtype=np.float64)
+        self.scalars = np.zeros(len(SCALARS), dtype=np.float64)
+
+    @property
+    def enemy(self) -> int:
+        return (self.team + 1) % 2
+
+    def reset(self, initial_updates: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Start a new game from the update lines of its first turn, a random mirrored map by default
+        """
+        if initial_updates is None:
+            initial_updates = starting_updates(self.width, self.height, self.rng)
+        self.env.reset([initial_updates])
+        self.opponent.reset()
+        return self.observation()
+
+    def step(self, action: Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], float, bool, Dict]:
+        """
+        Play one turn, the reward is 1 for a won and -1 for a lost game on its last turn and 0 otherwise
+        """
+        observation = Observation(self.enemy)
+        observation["step"] = int(self.env.turn[0])
+        observation["updates"] = self.env.updates(0, self.enemy)
+        commands: List[List[str]] = [[], []]
+        commands[self.team] = self.decode(action)
+        commands[self.enemy] = self.opponent.step(observation)
+        done = bool(self.env.step([tuple(commands)])[0])
+        reward = 0.0
+        if done:
+            winner = self.env.winner()[0]
+            reward = 0.0 if winner < 0 else (1.0 if winner == self.team else -1.0)
+        info = {
+            "city_tiles": int(self.env.city_tile_count()[0, self.team]),
+            "units": int(self.env.unit_count()[0, self.team]),
+            "invalid_commands": int(self.env.invalid_commands[0, self.team]),
+        }
+        return self.observation(), reward, done, info
+
+    def observation(self) -> Dict[str, np.ndarray]:
+        env = self.env
+        np.logical_and(env.unit_alive[0], env.unit_team[0] == self.team, out=self.own_units)
+        np.logical_and(env.unit_alive[0], env.unit_team[0] != self.team, out=self.enemy_units)
+
+        city_index = env.city_index[0]
+        has_city = city_index >= 0
+        tile_city = np.maximum(city_index, 0)
+        tile_team = env.city_team[0][tile_city]
+        np.logical_and(has_city, tile_team == self.team, out=self.city[0], casting="unsafe")
+        np.logical_and(has_city, tile_team != self.team, out=self.city[1], casting="unsafe")
+        np.multiply(env.city_fuel[0][tile_city], has_city, out=self.city_fuel)
+
+        self.units.fill(0)
+        self.cargo.fill(0)
+        slot = np.nonzero(env.unit_alive[0])[0]
+        relative_team = (env.unit_team[0, slot] != self.team).astype(np.int64)
+        x, y = env.unit_x[0, slot], env.unit_y[0, slot]
+        np.add.at(self.units, (relative_team, env.unit_type[0, slot], y, x), 1)
+        np.add.at(self.cargo, (relative_team, y, x), env.unit_cargo[0, slot].sum(axis=1))
+
+        turn = int(env.turn[0])
+        self.scalars[:] = [
+            turn,
+            turn % CYCLE_LENGTH,
+            turn % CYCLE_LENGTH >= DAY_LENGTH,
+            env.research_points[0, self.team],
+            env.research_points[0, self.enemy],
+        ]
+        return {
+            "resource_type": env.resource_type[0],
+            "resource_amount": env.resource_amount[0],
+            "road": env.road[0],
+            "city_tile_cooldown": env.city_tile_cooldown[0],
+            "unit_type": env.unit_type[0],
+            "unit_x": env.unit_x[0],
+            "unit_y": env.unit_y[0],
+            "unit_cooldown": env.unit_cooldown[0],
+            "unit_cargo": env.unit_cargo[0],
+            "own_units": self.own_units,
+            "enemy_units": self.enemy_units,
+            "city": self.city,
+            "city_fuel": self.city_fuel,
+            "units": self.units,
+            "cargo": self.cargo,
+            "scalars": self.scalars,
+        }
+
+    def decode(self, action: Dict[str, np.ndarray]) -> List[str]:
+        """
+        Command strings for the action codes of the own units and city tiles, codes of empty slots,
+        enemy units and tiles without an own city tile are ignored
+        """
+        env = self.env
+        commands = []
+        unit_actions = np.asarray(action.get("units", ()))
+        if len(unit_actions) > 0:
+            for slot in np.nonzero(self.own_units & (unit_actions != NONE))[0]:
+                code = unit_actions[slot]
+                wood, coal, uranium = env.unit_cargo[0, slot]
+                unit = Unit(
+                    self.team,
+                    int(env.unit_type[0, slot]),
+                    f"u_{env.unit_number[0, slot]}",
+                    int(env.unit_x[0, slot]),
+                    int(env.unit_y[0, slot]),
+                    float(env.unit_cooldown[0, slot]),
+                    wood,
+                    coal,
+                    uranium,
+                )
+                if code in (MOVE_NORTH, MOVE_EAST, MOVE_SOUTH, MOVE_WEST):
+                    commands.append(unit.move(MOVE_DIRECTIONS[code]))
+                elif code == BUILD_CITY:
+                    commands.append(unit.build_city())
+                elif code == PILLAGE:
+                    commands.append(unit.pillage())
+
+        city_actions = np.asarray(action.get("cities", ()))
+        if city_actions.size > 0:
+            city_index = env.city_index[0]
+            for y, x in zip(*np.nonzero((city_actions != NONE) & (self.city[0] > 0))):
+                city_tile = CityTile(
+                    self.team, f"c_{env.city_number[0, city_index[y, x]]}", int(x), int(y), float(env.city_tile_cooldown[0, y, x])
+                )
+                code = city_actions[y, x]
+                if code == RESEARCH:
+                    commands.append(city_tile.research())
+                elif code == BUILD_WORKER:
+                    commands.append(city_tile.build_worker())
+                elif code == BUILD_CART:
+                    commands.append(city_tile.build_cart())
+        return commands
+
+
+def benchmark(size: int = 32, turns: int = 100) -> None:
+    """
+    Compare the time of one observation with building the `Game` object of the same turn, and play random actions
+    against the scripted agent
+    """
+    env = LuxEnv(size, size, seed=0)
+    observation = env.reset()
+    rng = np.random.default_rng(0)
+    observation_time = 0.0
+    game_time = 0.0
+    played = 0
+    start = time.perf_counter()
+    for _ in range(turns):
+        action = {
+            "units": rng.integers(0, BUILD_CITY + 1, len(observation["own_units"])),
+            "cities": rng.integers(0, CITY_ACTIONS, (size, size)),
+        }
+        observation, _, done, _ = env.step(action)
+        played += 1
+        observation_start = time.perf_counter()
+        env.observation()
+        game_start = time.perf_counter()
+        env.env.game(0, env.team)
+        observation_time += game_start - observation_start
+        game_time += time.perf_counter() - game_start
+        if done:
+            break
+    elapsed = time.perf_counter() - start
+    print(
+        f"{size}x{size}: observation {observation_time / played * 1000:.3f}ms, Game object {game_time / played * 1000:.3f}ms, "
+        f"{played / elapsed:.1f} turns/s against the scripted agent"
+    )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,113 @@
+import time
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from forecast import resource_planes
+from lux.game import Game
+from lux.game_objects import Unit
+
+# influence falls by this factor per tile of manhattan distance
+DECAY = 0.6
+UNIT_WEIGHT = 1.0
+CITY_TILE_WEIGHT = 2.0
+# weight of resource tiles for the team that controls them
+RESOURCE_WEIGHT = 0.5
+# contested influence at which the full penalty applies
+CONTESTED_SCALE = 1.0
+# distances to fully contested tiles are weighted this much more
+CONTESTED_PENALTY = 0.5
+
+
+@lru_cache(maxsize=None)
+def decay_kernel(size: int) -> np.ndarray:
+    """
+    Matrix with DECAY ** |i - j|, multiplying a plane with it on both sides spreads
+    every tile with DECAY ** (manhattan distance) over the whole map
+    """
+    index = np.arange(size)
+    return DECAY ** np.abs(index[:, None] - index[None, :])
+
+
+def spread(plane: np.ndarray) -> np.ndarray:
+    height, width = plane.shape
+    return decay_kernel(height) @ plane @ decay_kernel(width)
+
+
+def team_sources(game_state: Game, team: int) -> np.ndarray:
+    """
+    Weighted units and city tiles of `team`, indexed [y, x]
+    """
+    shape = (game_state.map_height, game_state.map_width)
+    player = game_state.players[team]
+    columns = player.units.columns()
+    cells = columns["y"] * game_state.map_width + columns["x"]
+    sources = UNIT_WEIGHT * np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape).astype(np.float64)
+    for city in player.cities.values():
+        for city_tile in city.citytiles:
+            sources[city_tile.pos.y, city_tile.pos.x] += CITY_TILE_WEIGHT
+    return sources
+
+
+class InfluenceMap:
+    """
+    Smoothed control fields of both teams, all indexed [y, x]
+    """
+
+    def __init__(self, own: np.ndarray, enemy: np.ndarray) -> None:
+        self.own = own
+        self.enemy = enemy
+        # positive where the own team is stronger
+        self.control = own - enemy
+        # high where both teams are strong
+        self.contested = np.minimum(own, enemy)
+        # factor for distances to every tile, between 1 and 1 + CONTESTED_PENALTY
+        self.penalty = 1 + CONTESTED_PENALTY * np.minimum(self.contested / CONTESTED_SCALE, 1)
+
+
+def influence_map(game_state: Game, team: int, resource_types: Optional[np.ndarray] = None) -> InfluenceMap:
+    """
+    Spread the units and city tiles of both teams over the map, then add the resource tiles
+    to the team whose field is stronger there and spread again
+    """
+    if resource_types is None:
+        resource_types, _ = resource_planes(game_state)
+    own = spread(team_sources(game_state, team))
+    enemy = spread(team_sources(game_state, (team + 1) % 2))
+    resources = resource_types > 0
+    own += spread(RESOURCE_WEIGHT * (resources & (own > enemy)))
+    enemy += spread(RESOURCE_WEIGHT * (resources & (enemy > own)))
+    return InfluenceMap(own, enemy)
+
+
+def benchmark(size: int = 32, turns: int = 100) -> None:
+    """
+    Print the mean time of an influence map on a map of `size` with resources, units and cities of both teams
+    """
+    from batch_env import BatchEnv, starting_updates
+
+    env = BatchEnv(1, size, size)
+    env.reset([starting_updates(size, size, np.random.default_rng(0))])
+    game_state = env.game(0, 0)
+    rng = np.random.default_rng(1)
+    for team, player in enumerate(game_state.players):
+        for index in range(20):
+            x, y = (int(value) for value in rng.integers(0, size, 2))
+            player.units.append(Unit(team, 0, f"u_{team}_{index}", x, y, 0, 0, 0, 0))
+    types, _ = resource_planes(game_state)
+    start = time.perf_counter()
+    for _ in range(turns):
+        influence_map(game_state, 0, types)
+    with_planes = time.perf_counter()
+    for _ in range(turns):
+        influence_map(game_state, 0)
+    end = time.perf_counter()
+    print(
+        f"{size}x{size}: {(with_planes - start) / turns * 1000:.2f}ms per map, "
+        f"{(end - with_planes) / turns * 1000:.2f}ms including the resource plane"
+    )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,6 +1,6 @@
 from .constants import Constants
-from .game_map import GameMap
-from .game_objects import Player, Unit, City, CityTile
+from .game_map import GameMap, OccupancyGrid
+from .game_objects import Player, City, CityTile, UnitList, UnitTable
 
 INPUT_CONSTANTS = Constants.INPUT_CONSTANTS
 
@@ -23,10 +23,12 @@ class Game:
         print("D_FINISH")
 
     def _reset_player_states(self):
-        self.players[0].units = []
+        # the units of both players are rows of one table
+        self.units = UnitTable()
+        self.players[0].units = UnitList(self.units, 0)
         self.players[0].cities = {}
         self.players[0].city_tile_count = 0
-        self.players[1].units = []
+        self.players[1].units = UnitList(self.units, 1)
         self.players[1].cities = {}
         self.players[1].city_tile_count = 0
 
@@ -37,6 +39,8 @@ class Game:
         self.map = GameMap(self.map_width, self.map_height)
         self.turn += 1
         self._reset_player_states()
+        # units of each team by tile
+        self.occupancy = [OccupancyGrid(self.map_width, self.map_height) for _ in range(2)]
 
         for update in messages:
             if update == "D_DONE":
@@ -62,7 +66,8 @@ class Game:
                 wood = int(strs[7])
                 coal = int(strs[8])
                 uranium = int(strs[9])
-                self.players[team].units.append(Unit(team, unittype, unitid, x, y, cooldown, wood, coal, uranium))
+                self.occupancy[team].add(x, y, len(self.players[team].units), unittype, cooldown)
+                self.players[team].units.add(unittype, unitid, x, y, cooldown, wood, coal, uranium)
             elif input_identifier == INPUT_CONSTANTS.CITY:
                 team = int(strs[1])
                 cityid = strs[2]
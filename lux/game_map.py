@@ -1,5 +1,5 @@
 import math
-from typing import List
+from typing import Dict, List, Tuple
 
 from .constants import Constants
 
@@ -47,6 +47,98 @@ class GameMap:
         cell.resource = Resource(r_type, amount)
 
 
+_adjacent_tiles = {}
+
+
+def adjacent_tiles(width, height) -> List[List[int]]:
+    """
+    Flat indices (y * width + x) of the up to 4 tiles adjacent to every tile, shared by all grids of the same size
+    """
+    key = (width, height)
+    if key not in _adjacent_tiles:
+        adjacent = []
+        for y in range(height):
+            for x in range(width):
+                adjacent.append(
+                    [(y + dy) * width + x + dx for dx, dy in ((0, -1), (1, 0), (0, 1), (-1, 0))
+                     if 0 <= x + dx < width and 0 <= y + dy < height]
+                )
+        _adjacent_tiles[key] = adjacent
+    return _adjacent_tiles[key]
+
+
+class OccupancyGrid:
+    """
+    Units of one team by tile, with constant time point and neighbourhood queries.
+    Units stacked on a city tile are counted, the unit fields hold the earliest added unit still on the tile.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.count = [0] * (width * height)
+        # index of the unit in the unit list of its player, -1 for empty tiles
+        self.unit = [-1] * (width * height)
+        self.unit_type = [-1] * (width * height)
+        self.cooldown = [0.0] * (width * height)
+        # (index, unit type, cooldown) of every unit on the tiles with more than one unit, in the order they were added
+        self.stacked: Dict[int, List[Tuple[int, int, float]]] = {}
+        self.adjacent = adjacent_tiles(width, height)
+
+    def add(self, x, y, index=-1, unit_type=-1, cooldown=0.0):
+        tile = y * self.width + x
+        if self.count[tile] == 0:
+            self.unit[tile] = index
+            self.unit_type[tile] = unit_type
+            self.cooldown[tile] = cooldown
+        else:
+            if tile not in self.stacked:
+                self.stacked[tile] = [(self.unit[tile], self.unit_type[tile], self.cooldown[tile])]
+            self.stacked[tile].append((index, unit_type, cooldown))
+        self.count[tile] += 1
+
+    def remove(self, x, y, index=-1):
+        """
+        Remove the unit `index` from the tile, the unit fields move on to the next unit if it was the one they hold
+        """
+        tile = y * self.width + x
+        self.count[tile] -= 1
+        if self.count[tile] == 0:
+            self.unit[tile] = -1
+            self.unit_type[tile] = -1
+            self.cooldown[tile] = 0.0
+            self.stacked.pop(tile, None)
+            return
+        units = self.stacked[tile]
+        indices = [unit[0] for unit in units]
+        # without a known index the last added unit leaves
+        units.pop(indices.index(index) if index in indices else -1)
+        self.unit[tile], self.unit_type[tile], self.cooldown[tile] = units[0]
+        if len(units) == 1:
+            del self.stacked[tile]
+
+    def in_bounds(self, x, y) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_occupied(self, x, y) -> bool:
+        """
+        Tiles outside of the map are never occupied
+        """
+        return self.in_bounds(x, y) and self.count[y * self.width + x] > 0
+
+    def unit_at(self, x, y) -> int:
+        return self.unit[y * self.width + x] if self.in_bounds(x, y) else -1
+
+    def adjacent_units(self, x, y) -> List[int]:
+        """
+        Indices of the units on the tiles adjacent to (x, y)
+        """
+        return [self.unit[tile] for tile in self.adjacent[y * self.width + x] if self.count[tile] > 0]
+
+    def count_adjacent(self, x, y) -> int:
+        return sum(self.count[tile] for tile in self.adjacent[y * self.width + x])
+
+
 class Position:
     def __init__(self, x, y):
         self.x = x
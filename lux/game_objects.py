@@ -1,17 +1,23 @@
-from typing import Dict
+from array import array
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
 
 from .constants import Constants
 from .game_map import Position
 from .game_constants import GAME_CONSTANTS
 
+if TYPE_CHECKING:
+    import numpy as np
+
 UNIT_TYPES = Constants.UNIT_TYPES
+# columns of `UnitTable.arrays` stored as integers, the cooldown is the only float column
+INTEGER_COLUMNS = ("team", "type", "x", "y", "wood", "coal", "uranium")
 
 
 class Player:
     def __init__(self, team):
         self.team = team
         self.research_points = 0
-        self.units: list[Unit] = []
+        self.units: UnitList = UnitList(UnitTable(), team)
         self.cities: Dict[str, City] = {}
         self.city_tile_count = 0
     def researched_coal(self) -> bool:
@@ -73,17 +79,204 @@ class Cargo:
         return f"Cargo | Wood: {self.wood}, Coal: {self.coal}, Uranium: {self.uranium}"
 
 
+class UnitTable:
+    """
+    The units of one turn as parallel typed columns, one row per unit line of the updates in the order of the lines.
+    `Unit` objects are views of a row and only made when a row is asked for.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.team = array("q")
+        self.type = array("q")
+        self.x = array("q")
+        self.y = array("q")
+        self.cooldown = array("d")
+        self.wood = array("q")
+        self.coal = array("q")
+        self.uranium = array("q")
+        self._views: List[Optional["Unit"]] = []
+        # integer columns stacked in the order of `INTEGER_COLUMNS` and the cooldowns, made by `arrays`
+        self._integers = None
+        self._cooldowns = None
+
+    def add(self, teamid, u_type, unitid, x, y, cooldown, wood, coal, uranium) -> int:
+        self.ids.append(unitid)
+        self.team.append(teamid)
+        self.type.append(u_type)
+        self.x.append(x)
+        self.y.append(y)
+        self.cooldown.append(cooldown)
+        self.wood.append(wood)
+        self.coal.append(coal)
+        self.uranium.append(uranium)
+        self._views.append(None)
+        self._integers = None
+        return len(self.ids) - 1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def unit(self, row: int) -> "Unit":
+        view = self._views[row]
+        if view is None:
+            view = self._views[row] = Unit.view(self, row)
+        return view
+
+    def arrays(self, rows: Optional[List[int]] = None) -> Dict[str, "np.ndarray"]:
+        """
+        The columns as numpy arrays, of all rows or only of `rows`. The table is converted once.
+        """
+        if self._integers is None:
+            import numpy as np
+
+            # the columns are machine integers already, one copy of their bytes is all the conversion
+            integers = b"".join(getattr(self, name) for name in INTEGER_COLUMNS)
+            self._integers = np.frombuffer(bytearray(integers), dtype=np.int64).reshape(len(INTEGER_COLUMNS), len(self.ids))
+            self._cooldowns = np.frombuffer(bytearray(self.cooldown), dtype=np.float64)
+        integers, cooldowns = self._integers, self._cooldowns
+        if rows is not None:
+            # a single gather for all integer columns
+            integers, cooldowns = integers[:, rows], cooldowns[rows]
+        columns = dict(zip(INTEGER_COLUMNS, integers))
+        columns["cooldown"] = cooldowns
+        return columns
+
+
+class UnitList:
+    """
+    The units of one player, rows of the `UnitTable` of the turn. Indexing and iterating give `Unit` views,
+    the bulk queries give numpy arrays over the units in the same order.
+    """
+
+    def __init__(self, table: UnitTable, team: int):
+        self.table = table
+        self.team = team
+        self.rows: List[int] = []
+        self._columns = None
+
+    def add(self, u_type, unitid, x, y, cooldown, wood, coal, uranium) -> int:
+        """
+        Add a unit of this player as a new row of the table, returns the row
+        """
+        row = self.table.add(self.team, u_type, unitid, x, y, cooldown, wood, coal, uranium)
+        self.rows.append(row)
+        self._columns = None
+        return row
+
+    def append(self, unit: "Unit") -> None:
+        """
+        Add a copy of a unit made elsewhere
+        """
+        self.add(unit.type, unit.id, unit.x, unit.y, unit.cooldown, unit.cargo.wood, unit.cargo.coal, unit.cargo.uranium)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table.unit(row) for row in self.rows[index]]
+        return self.table.unit(self.rows[index])
+
+    def __iter__(self) -> Iterator["Unit"]:
+        table = self.table
+        return (table.unit(row) for row in self.rows)
+
+    def columns(self) -> Dict[str, "np.ndarray"]:
+        """
+        The columns of `UnitTable.arrays` of these units
+        """
+        if self._columns is None:
+            self._columns = self.table.arrays(self.rows)
+        return self._columns
+
+    def is_worker(self) -> "np.ndarray":
+        return self.columns()["type"] == UNIT_TYPES.WORKER
+
+    def can_act(self) -> "np.ndarray":
+        return self.columns()["cooldown"] < 1
+
+    def cargo(self) -> "np.ndarray":
+        columns = self.columns()
+        return columns["wood"] + columns["coal"] + columns["uranium"]
+
+    def cargo_space_left(self) -> "np.ndarray":
+        import numpy as np
+
+        capacity = GAME_CONSTANTS["PARAMETERS"]["RESOURCE_CAPACITY"]
+        return np.where(self.is_worker(), capacity["WORKER"], capacity["CART"]) - self.cargo()
+
+    def select(self, mask) -> List["Unit"]:
+        """
+        The units where `mask` is true, e.g. `units.select(units.is_worker() & units.can_act())`
+        """
+        return [self.table.unit(self.rows[index]) for index in mask.nonzero()[0]]
+
+
 class Unit:
+    """
+    View of a row of a `UnitTable`. Made with the fields of a unit, it is the only row of a table of its own.
+    """
+
     def __init__(self, teamid, u_type, unitid, x, y, cooldown, wood, coal, uranium):
-        self.pos = Position(x, y)
-        self.team = teamid
-        self.id = unitid
-        self.type = u_type
-        self.cooldown = cooldown
-        self.cargo = Cargo()
-        self.cargo.wood = wood
-        self.cargo.coal = coal
-        self.cargo.uranium = uranium
+        table = UnitTable()
+        self.table = table
+        self.row = table.add(teamid, u_type, unitid, x, y, cooldown, wood, coal, uranium)
+        self._pos = None
+        self._cargo = None
+
+    @classmethod
+    def view(cls, table: UnitTable, row: int) -> "Unit":
+        unit = cls.__new__(cls)
+        unit.table = table
+        unit.row = row
+        unit._pos = None
+        unit._cargo = None
+        return unit
+
+    @property
+    def id(self) -> str:
+        return self.table.ids[self.row]
+
+    @property
+    def team(self) -> int:
+        return self.table.team[self.row]
+
+    @property
+    def type(self) -> int:
+        return self.table.type[self.row]
+
+    @property
+    def x(self) -> int:
+        return self.table.x[self.row]
+
+    @property
+    def y(self) -> int:
+        return self.table.y[self.row]
+
+    @property
+    def cooldown(self) -> float:
+        return self.table.cooldown[self.row]
+
+    @property
+    def pos(self) -> Position:
+        if self._pos is None:
+            self._pos = Position(self.table.x[self.row], self.table.y[self.row])
+        return self._pos
+
+    @property
+    def cargo(self) -> Cargo:
+        if self._cargo is None:
+            cargo = self._cargo = Cargo()
+            cargo.wood = self.table.wood[self.row]
+            cargo.coal = self.table.coal[self.row]
+            cargo.uranium = self.table.uranium[self.row]
+        return self._cargo
+
+    def cargo_amount(self) -> int:
+        table = self.table
+        return table.wood[self.row] + table.coal[self.row] + table.uranium[self.row]
+
     def is_worker(self) -> bool:
         return self.type == UNIT_TYPES.WORKER
 
@@ -94,7 +287,7 @@ class Unit:
         """
         get cargo space left in this unit
         """
-        spaceused = self.cargo.wood + self.cargo.coal + self.cargo.uranium
+        spaceused = self.cargo_amount()
         if self.type == UNIT_TYPES.WORKER:
             return GAME_CONSTANTS["PARAMETERS"]["RESOURCE_CAPACITY"]["WORKER"] - spaceused
         else:
@@ -105,7 +298,7 @@ class Unit:
         whether or not the unit can build where it is right now
         """
         cell = game_map.get_cell_by_pos(self.pos)
-        if not cell.has_resource() and self.can_act() and (self.cargo.wood + self.cargo.coal + self.cargo.uranium) >= GAME_CONSTANTS["PARAMETERS"]["CITY_BUILD_COST"]:
+        if not cell.has_resource() and self.can_act() and self.cargo_amount() >= GAME_CONSTANTS["PARAMETERS"]["CITY_BUILD_COST"]:
             return True
         return False
 
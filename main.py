@@ -1,8 +1,24 @@
-from typing import Dict
-import sys
+import os
+from contextlib import nullcontext
+from classes import Observation
 from agent import agent
 if __name__ == "__main__":
-    
+    # the capture and the profilers are only imported when their environment variable is set
+    capture = None
+    memory_turn = sampling_turn = lambda step: nullcontext()
+    if os.environ.get("LUX_CAPTURE"):
+        import capture
+    if os.environ.get("LUX_MEMORY_PROFILE"):
+        import memory_profile
+
+        memory_profile.enable_from_environment()
+        memory_turn = memory_profile.turn
+    if os.environ.get("LUX_SAMPLE_PROFILE"):
+        import sampling_profile
+
+        sampling_profile.enable_from_environment()
+        sampling_turn = sampling_profile.turn
+
     def read_input():
         """
         Reads input from stdin
@@ -12,11 +28,6 @@ if __name__ == "__main__":
         except EOFError as eof:
             raise SystemExit(eof)
     step = 0
-    class Observation(Dict[str, any]):
-        def __init__(self, player=0) -> None:
-            self.player = player
-            # self.updates = []
-            # self.step = 0
     observation = Observation()
     observation["updates"] = []
     observation["step"] = 0
@@ -29,7 +40,10 @@ if __name__ == "__main__":
             player_id = int(observation["updates"][0])
             observation.player = player_id
         if inputs == "D_DONE":
-            actions = agent(observation, None)
+            if capture is not None:
+                capture.capture(step, player_id, observation["updates"])
+            with memory_turn(step), sampling_turn(step):
+                actions = agent(observation, None)
             observation["updates"] = []
             step += 1
             observation["step"] = step
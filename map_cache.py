@@ -0,0 +1,355 @@
+import hashlib
+import io
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lux.constants import Constants
+
+INPUT_CONSTANTS = Constants.INPUT_CONSTANTS
+# directory of the disk cache, the analysis is only kept in memory when this is not set
+ENVIRONMENT_VARIABLE = "LUX_MAP_CACHE"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# analyses kept in memory per process
+MEMORY_ENTRIES = 32
+# part of the fingerprint, bump when the analysis changes so old entries are never read
+FORMAT_VERSION = 1
+
+RESOURCE_NAMES = [Constants.RESOURCE_TYPES.WOOD, Constants.RESOURCE_TYPES.COAL, Constants.RESOURCE_TYPES.URANIUM]
+# the lines of the first turn that make up the map, the research points and roads are the same on every map
+MAP_LINES = {INPUT_CONSTANTS.RESOURCES, INPUT_CONSTANTS.UNITS, INPUT_CONSTANTS.CITY, INPUT_CONSTANTS.CITY_TILES}
+NEIGHBOURS = [(0, -1, Constants.DIRECTIONS.NORTH), (1, 0, Constants.DIRECTIONS.EAST), (0, 1, Constants.DIRECTIONS.SOUTH), (-1, 0, Constants.DIRECTIONS.WEST)]
+
+
+def map_lines(updates: Sequence[str]) -> Tuple[int, int, List[str]]:
+    """
+    Map size and the sorted resource, unit and city lines of the updates of the first turn
+    """
+    width, height = (int(value) for value in updates[1].split(" "))
+    lines = sorted(update for update in updates[2:] if update.split(" ")[0] in MAP_LINES)
+    return width, height, lines
+
+
+def fingerprint(updates: Sequence[str]) -> str:
+    """
+    Hash of the map of the first turn, the same for both players
+    """
+    width, height, lines = map_lines(updates)
+    content = "\n".join([str(FORMAT_VERSION), f"{width} {height}", *lines])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class MapAnalysis:
+    """
+    Everything about a map that only depends on its starting layout, all planes are indexed [y, x]
+
+    - `resource_type` (0 none, then wood, coal and uranium) and `resource_amount` at the start
+    - `cluster_index`, the cluster of every resource tile or -1, and `clusters` with the type, tiles, amount and centre of each
+    - `distances`, the manhattan distance of every tile to the closest wood, coal and uranium tile
+    - `opening`, per team the start of its worker, the closest wood tile, the moves there and the tile to build the next city
+    """
+
+    def __init__(
+        self,
+        resource_type: np.ndarray,
+        resource_amount: np.ndarray,
+        cluster_index: np.ndarray,
+        clusters: List[Dict],
+        distances: np.ndarray,
+        opening: Dict[int, Dict],
+    ) -> None:
+        self.resource_type = resource_type
+        self.resource_amount = resource_amount
+        self.cluster_index = cluster_index
+        self.clusters = clusters
+        self.distances = distances
+        self.opening = opening
+
+    @property
+    def height(self) -> int:
+        return self.resource_type.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self.resource_type.shape[1]
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            resource_type=self.resource_type,
+            resource_amount=self.resource_amount,
+            cluster_index=self.cluster_index,
+            distances=self.distances,
+            metadata=np.array(json.dumps({"clusters": self.clusters, "opening": self.opening})),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MapAnalysis":
+        with np.load(io.BytesIO(data)) as arrays:
+            metadata = json.loads(str(arrays["metadata"]))
+            return cls(
+                arrays["resource_type"],
+                arrays["resource_amount"],
+                arrays["cluster_index"],
+                metadata["clusters"],
+                arrays["distances"],
+                {int(team): plan for team, plan in metadata["opening"].items()},
+            )
+
+
+def find_clusters(resource_type: np.ndarray, resource_amount: np.ndarray) -> Tuple[np.ndarray, List[Dict]]:
+    """
+    Group resource tiles of the same type that are orthogonally connected
+    """
+    height, width = resource_type.shape
+    cluster_index = np.full((height, width), -1, dtype=np.int32)
+    clusters = []
+    for y, x in zip(*np.nonzero(resource_type)):
+        if cluster_index[y, x] >= 0:
+            continue
+        code = resource_type[y, x]
+        cluster_index[y, x] = len(clusters)
+        tiles = []
+        queue = deque([(int(x), int(y))])
+        while queue:
+            tile_x, tile_y = queue.popleft()
+            tiles.append([tile_x, tile_y])
+            for dx, dy, _ in NEIGHBOURS:
+                nx, ny = tile_x + dx, tile_y + dy
+                if 0 <= nx < width and 0 <= ny < height and resource_type[ny, nx] == code and cluster_index[ny, nx] < 0:
+                    cluster_index[ny, nx] = len(clusters)
+                    queue.append((nx, ny))
+        positions = np.array(tiles)
+        clusters.append(
+            {
+                "type": RESOURCE_NAMES[code - 1],
+                "tiles": tiles,
+                "amount": float(sum(resource_amount[tile_y, tile_x] for tile_x, tile_y in tiles)),
+                "centre": positions.mean(axis=0).tolist(),
+            }
+        )
+    return cluster_index, clusters
+
+
+def distance_tables(resource_type: np.ndarray) -> np.ndarray:
+    """
+    Manhattan distance of every tile to the closest tile of every resource type, width + height if there is none
+    """
+    height, width = resource_type.shape
+    ys, xs = np.mgrid[0:height, 0:width]
+    distances = np.full((len(RESOURCE_NAMES), height, width), width + height, dtype=np.int32)
+    for code in range(1, len(RESOURCE_NAMES) + 1):
+        tile_y, tile_x = np.nonzero(resource_type == code)
+        if len(tile_x) > 0:
+            distance = np.abs(xs[..., None] - tile_x) + np.abs(ys[..., None] - tile_y)
+            distances[code - 1] = distance.min(axis=2)
+    return distances
+
+
+def plan_opening(
+    start: Tuple[int, int], city: Tuple[int, int], resource_type: np.ndarray, blocked: np.ndarray
+) -> Dict:
+    """
+    Moves of the starting worker to the closest wood tile, and the free tile next to its city closest to that wood
+    """
+    height, width = resource_type.shape
+    wood_y, wood_x = np.nonzero(resource_type == 1)
+    if len(wood_x) == 0:
+        return {"start": list(start), "wood": None, "moves": [], "build": None}
+    distance = np.abs(wood_x - start[0]) + np.abs(wood_y - start[1])
+    closest = int(distance.argmin())
+    wood = (int(wood_x[closest]), int(wood_y[closest]))
+    # shortest path around enemy cities, found breadth first
+    previous = {start: None}
+    queue = deque([start])
+    while queue and wood not in previous:
+        x, y = queue.popleft()
+        for dx, dy, direction in NEIGHBOURS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and not blocked[ny, nx] and (nx, ny) not in previous:
+                previous[(nx, ny)] = (x, y, direction)
+                queue.append((nx, ny))
+    moves = []
+    position = wood
+    while previous.get(position) is not None:
+        x, y, direction = previous[position]
+        moves.append(direction)
+        position = (x, y)
+    build = None
+    best = width + height
+    for dx, dy, _ in NEIGHBOURS:
+        nx, ny = city[0] + dx, city[1] + dy
+        if 0 <= nx < width and 0 <= ny < height and resource_type[ny, nx] == 0 and not blocked[ny, nx]:
+            to_wood = abs(nx - wood[0]) + abs(ny - wood[1])
+            if to_wood < best:
+                best = to_wood
+                build = [nx, ny]
+    return {"start": list(start), "wood": list(wood), "moves": moves[::-1], "build": build}
+
+
+def analyse_map(updates: Sequence[str]) -> MapAnalysis:
+    """
+    Analyse the map of the updates of the first turn
+    """
+    width, height, lines = map_lines(updates)
+    resource_type = np.zeros((height, width), dtype=np.int8)
+    resource_amount = np.zeros((height, width), dtype=np.float64)
+    city_tiles: Dict[int, List[Tuple[int, int]]] = {0: [], 1: []}
+    workers: Dict[int, List[Tuple[int, int]]] = {0: [], 1: []}
+    for line in lines:
+        strs = line.split(" ")
+        if strs[0] == INPUT_CONSTANTS.RESOURCES:
+            x, y = int(strs[2]), int(strs[3])
+            resource_type[y, x] = RESOURCE_NAMES.index(strs[1]) + 1
+            resource_amount[y, x] = float(strs[4])
+        elif strs[0] == INPUT_CONSTANTS.CITY_TILES:
+            city_tiles[int(strs[1])].append((int(strs[3]), int(strs[4])))
+        elif strs[0] == INPUT_CONSTANTS.UNITS:
+            workers[int(strs[2])].append((int(strs[4]), int(strs[5])))
+
+    cluster_index, clusters = find_clusters(resource_type, resource_amount)
+    opening = {}
+    for team in range(2):
+        if len(workers[team]) == 0 or len(city_tiles[team]) == 0:
+            continue
+        blocked = np.zeros((height, width), dtype=bool)
+        for x, y in city_tiles[(team + 1) % 2]:
+            blocked[y, x] = True
+        opening[team] = plan_opening(workers[team][0], city_tiles[team][0], resource_type, blocked)
+    return MapAnalysis(resource_type, resource_amount, cluster_index, clusters, distance_tables(resource_type), opening)
+
+
+class MapCache:
+    """
+    Map analyses by fingerprint, the most recently used in memory and, with a directory, all of them on disk
+    up to `max_bytes`. Reading an entry marks it as used, the least recently used entries are removed first.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory: "OrderedDict[str, MapAnalysis]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key: str) -> Optional[MapAnalysis]:
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(key), "rb") as f:
+                analysis = MapAnalysis.from_bytes(f.read())
+            os.utime(self.path(key))
+        except (OSError, ValueError, KeyError):
+            return None
+        self.remember(key, analysis)
+        return analysis
+
+    def put(self, key: str, analysis: MapAnalysis) -> None:
+        self.remember(key, analysis)
+        if self.directory is None:
+            return
+        # written under a temporary name first, so other processes never read half of an entry
+        temporary = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(analysis.to_bytes())
+        os.replace(temporary, self.path(key))
+        self.evict()
+
+    def remember(self, key: str, analysis: MapAnalysis) -> None:
+        self.memory[key] = analysis
+        self.memory.move_to_end(key)
+        while len(self.memory) > MEMORY_ENTRIES:
+            self.memory.popitem(last=False)
+
+    def evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def analysis(self, updates: Sequence[str]) -> MapAnalysis:
+        """
+        The analysis of the map of the updates of the first turn, from the cache if it was analysed before
+        """
+        key = fingerprint(updates)
+        analysis = self.get(key)
+        if analysis is None:
+            self.misses += 1
+            analysis = analyse_map(updates)
+            self.put(key, analysis)
+        else:
+            self.hits += 1
+        return analysis
+
+
+_cache: Optional[MapCache] = None
+
+
+def default_cache() -> MapCache:
+    """
+    The cache of this process, on disk in the directory of `LUX_MAP_CACHE` if it is set
+    """
+    global _cache
+    if _cache is None:
+        _cache = MapCache(os.environ.get(ENVIRONMENT_VARIABLE))
+    return _cache
+
+
+def benchmark(size: int = 32, maps: int = 20) -> None:
+    """
+    Time of analysing a map and of reading the analysis from memory and from disk
+    """
+    import tempfile
+
+    from batch_env import starting_updates
+
+    rng = np.random.default_rng(0)
+    games = [[str(0), f"{size} {size}", *starting_updates(size, size, rng)] for _ in range(maps)]
+    with tempfile.TemporaryDirectory() as directory:
+        timings = {}
+        cache = MapCache(directory)
+        start = time.perf_counter()
+        for updates in games:
+            cache.analysis(updates)
+        timings["analysis"] = time.perf_counter() - start
+        start = time.perf_counter()
+        for updates in games:
+            cache.analysis(updates)
+        timings["memory"] = time.perf_counter() - start
+        cache = MapCache(directory)
+        start = time.perf_counter()
+        for updates in games:
+            cache.analysis(updates)
+        timings["disk"] = time.perf_counter() - start
+    print(f"{size}x{size}: " + ", ".join(f"{name} {elapsed / maps * 1000:.2f}ms" for name, elapsed in timings.items()))
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,212 @@
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from lux.constants import Constants
+from lux.game import Game
+
+INPUT_CONSTANTS = Constants.INPUT_CONSTANTS
+RESOURCE_TYPES = Constants.RESOURCE_TYPES
+
+MIN_SIZE = 12
+MAX_SIZE = 32
+# the sizes of the official maps
+SIZES = (12, 16, 24, 32)
+# mirrored left to right or top to bottom
+HORIZONTAL = "horizontal"
+VERTICAL = "vertical"
+SYMMETRIES = (HORIZONTAL, VERTICAL)
+
+# per resource type: tiles of the half map per cluster, smallest and largest cluster, amount range of a tile
+CLUSTERS = [
+    (RESOURCE_TYPES.WOOD, 70, 4, 9, (300, 400)),
+    (RESOURCE_TYPES.COAL, 160, 3, 6, (300, 400)),
+    (RESOURCE_TYPES.URANIUM, 220, 2, 5, (250, 350)),
+]
+# the starting city tile is this far from the nearest wood tile
+START_WOOD_DISTANCE = (1, 3)
+STEPS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+SYMBOLS = {RESOURCE_TYPES.WOOD: "w", RESOURCE_TYPES.COAL: "c", RESOURCE_TYPES.URANIUM: "u"}
+
+
+class GeneratedMap:
+    """
+    Resource tiles and starting positions of a generated map, only the half of team 0 is stored
+    """
+
+    def __init__(self, width: int, height: int, symmetry: str) -> None:
+        self.width = width
+        self.height = height
+        self.symmetry = symmetry
+        # resource type name, or "" for no resource, indexed [y, x]
+        self.resources = np.full((height, width), "", dtype=object)
+        self.amounts = np.zeros((height, width), dtype=np.int64)
+        self.start: Tuple[int, int] = (0, 0)
+
+    def mirror(self, x: int, y: int) -> Tuple[int, int]:
+        if self.symmetry == HORIZONTAL:
+            return self.width - 1 - x, y
+        return x, self.height - 1 - y
+
+    def in_half(self, x: int, y: int) -> bool:
+        """
+        Tiles of team 0, a middle row or column of an odd size belongs to nobody and stays empty
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        return x < self.width // 2 if self.symmetry == HORIZONTAL else y < self.height // 2
+
+    def updates(self) -> List[str]:
+        """
+        The updates of the first turn without the player id and map size lines, like `batch_env.starting_updates`
+        """
+        lines = ["rp 0 0", "rp 1 0"]
+        for y, x in zip(*np.nonzero(self.amounts)):
+            lines.append(f"r {self.resources[y, x]} {x} {y} {self.amounts[y, x]}")
+        for team, (x, y) in enumerate((self.start, self.mirror(*self.start))):
+            lines += [f"u 0 {team} u_{team + 1} {x} {y} 0 0 0 0", f"c {team} c_{team + 1} 0 23", f"ct {team} c_{team + 1} {x} {y} 0"]
+        return lines + [INPUT_CONSTANTS.DONE]
+
+    def render(self) -> str:
+        rows = []
+        starts = {self.start, self.mirror(*self.start)}
+        for y in range(self.height):
+            rows.append(
+                "".join("C" if (x, y) in starts else SYMBOLS.get(self.resources[y, x], ".") for x in range(self.width))
+            )
+        return "\n".join(rows)
+
+
+def _grow_cluster(generated: GeneratedMap, rng: np.random.Generator, r_type: str, size: int, amounts: Tuple[int, int]) -> None:
+    """
+    Grow a cluster of up to `size` tiles from a random free tile of the half map, one random neighbour at a time
+    """
+    half_width = generated.width // 2 if generated.symmetry == HORIZONTAL else generated.width
+    half_height = generated.height if generated.symmetry == HORIZONTAL else generated.height // 2
+    x, y = int(rng.integers(0, half_width)), int(rng.integers(0, half_height))
+    if generated.amounts[y, x] > 0:
+        return
+    cluster = [(x, y)]
+    frontier = set()
+    while True:
+        generated.resources[y, x] = r_type
+        generated.amounts[y, x] = int(rng.integers(amounts[0], amounts[1] + 1))
+        for dx, dy in STEPS:
+            if generated.in_half(x + dx, y + dy) and generated.amounts[y + dy, x + dx] == 0:
+                frontier.add((x + dx, y + dy))
+        frontier -= set(cluster)
+        if len(cluster) >= size or len(frontier) == 0:
+            return
+        # sorted, so the choice only depends on the seed
+        x, y = sorted(frontier)[int(rng.integers(0, len(frontier)))]
+        cluster.append((x, y))
+
+
+def _place_start(generated: GeneratedMap, rng: np.random.Generator) -> None:
+    """
+    A free tile of the half map close to wood, off the border and away from the mirror line. When the resources
+    cover all of these tiles, the resource of one of them is removed for the city tile.
+    """
+    ys, xs = np.mgrid[0 : generated.height, 0 : generated.width]
+    wood_y, wood_x = np.nonzero(generated.resources == RESOURCE_TYPES.WOOD)
+    wood_distance = np.full((generated.height, generated.width), generated.width + generated.height)
+    if len(wood_x) > 0:
+        wood_distance = (np.abs(xs[..., None] - wood_x) + np.abs(ys[..., None] - wood_y)).min(axis=2)
+    half = (xs < generated.width // 2 - 1) if generated.symmetry == HORIZONTAL else (ys < generated.height // 2 - 1)
+    inner = (xs > 0) & (ys > 0) & (xs < generated.width - 1) & (ys < generated.height - 1)
+    free = half & inner & (generated.amounts == 0)
+    if not free.any():
+        candidates = np.argwhere(half & inner)
+        y, x = candidates[int(rng.integers(0, len(candidates)))]
+        generated.resources[y, x] = ""
+        generated.amounts[y, x] = 0
+        generated.start = (int(x), int(y))
+        return
+    near = free & (wood_distance >= START_WOOD_DISTANCE[0]) & (wood_distance <= START_WOOD_DISTANCE[1])
+    candidates = np.argwhere(near if near.any() else free & (wood_distance == wood_distance[free].min()))
+    y, x = candidates[int(rng.integers(0, len(candidates)))]
+    generated.start = (int(x), int(y))
+
+
+def generate_map(width: int, height: Optional[int] = None, seed: int = 0, symmetry: Optional[str] = None) -> GeneratedMap:
+    """
+    A mirrored map with clusters of wood, coal and uranium and one city tile with a worker per team, close to wood.
+    The same arguments always give the same map.
+    """
+    height = width if height is None else height
+    if not (MIN_SIZE <= width <= MAX_SIZE and MIN_SIZE <= height <= MAX_SIZE):
+        raise ValueError(f"Map sizes have to be between {MIN_SIZE} and {MAX_SIZE}, got {width}x{height}")
+    rng = np.random.default_rng(seed)
+    if symmetry is None:
+        symmetry = SYMMETRIES[int(rng.integers(0, len(SYMMETRIES)))]
+    generated = GeneratedMap(width, height, symmetry)
+    half_tiles = width * height // 2
+    for r_type, tiles_per_cluster, smallest, largest, amounts in CLUSTERS:
+        clusters = max(1, round(half_tiles / tiles_per_cluster + rng.uniform(-0.5, 0.5)))
+        for _ in range(clusters):
+            _grow_cluster(generated, rng, r_type, int(rng.integers(smallest, largest + 1)), amounts)
+    _place_start(generated, rng)
+    # mirror the half of team 0
+    for y, x in zip(*np.nonzero(generated.amounts)):
+        mirrored_x, mirrored_y = generated.mirror(int(x), int(y))
+        generated.resources[mirrored_y, mirrored_x] = generated.resources[y, x]
+        generated.amounts[mirrored_y, mirrored_x] = generated.amounts[y, x]
+    return generated
+
+
+def generated_updates(width: int, height: Optional[int] = None, seed: int = 0, symmetry: Optional[str] = None) -> List[str]:
+    """
+    The first updates of a generated map, for `BatchEnv.reset` like `batch_env.starting_updates`
+    """
+    return generate_map(width, height, seed, symmetry).updates()
+
+
+def observation_updates(updates: List[str], player: int, width: int, height: int) -> List[str]:
+    """
+    The updates of the first observation of `player`, with the player id and map size lines in front
+    """
+    return [str(player), f"{width} {height}", *updates]
+
+
+def generate_game(width: int, height: Optional[int] = None, seed: int = 0, player: int = 0) -> Game:
+    """
+    The `Game` of `player` on the first turn of a generated map
+    """
+    height = width if height is None else height
+    messages = observation_updates(generated_updates(width, height, seed), player, width, height)
+    game_state = Game()
+    game_state._initialize(messages)
+    game_state._update(messages[2:])
+    game_state.id = player
+    return game_state
+
+
+def benchmark(maps: int = 1000) -> None:
+    for size in SIZES:
+        start = time.perf_counter()
+        for seed in range(maps):
+            generate_map(size, seed=seed)
+        print(f"{size}x{size}: {maps / (time.perf_counter() - start):8.1f} maps/s")
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print a generated map or benchmark the generator")
+    parser.add_argument("--size", type=int, default=24, help="width and height of the map")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--symmetry", choices=SYMMETRIES, default=None)
+    parser.add_argument("--benchmark", action="store_true", help="maps per second of the official sizes")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        return
+    generated = generate_map(args.size, seed=args.seed, symmetry=args.symmetry)
+    print(f"{args.size}x{args.size} seed {args.seed}, {generated.symmetry} symmetry")
+    print(generated.render())
+
+
+if __name__ == "__main__":
+    main()
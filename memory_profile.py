@@ -0,0 +1,153 @@
+import atexit
+import os
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Tuple
+
+# set to a file path to profile allocations of every turn, the report is written when the game ends
+ENVIRONMENT_VARIABLE = "LUX_MEMORY_PROFILE"
+TOP_SITES = 3
+REPORT_SITES = 10
+
+
+def short(site: str) -> str:
+    filename, lineno = site.rsplit(":", 1)
+    return f"{os.path.basename(filename)}:{lineno}"
+
+
+class PhaseRecord:
+    def __init__(self, turn: int, phase: str, peak: int, blocks: int, size: int, sites: List[Tuple[str, int, int]]):
+        self.turn = turn
+        self.phase = phase
+        # peak traced memory above the start of the phase, in bytes
+        self.peak = peak
+        # net memory blocks and bytes still allocated at the end of the phase
+        self.blocks = blocks
+        self.size = size
+        # bytes allocated and freed again within the phase, at least: the peak above what is still allocated at the end
+        self.transient = max(peak - max(size, 0), 0)
+        # (site, bytes, blocks) of the largest allocation sites of the phase
+        self.sites = sites
+
+
+class MemoryProfiler:
+    """
+    Records peak memory, the temporaries freed within the phase, net allocated blocks and the top allocation sites
+    of every phase of every turn with tracemalloc. The net numbers of the snapshots miss the temporaries, the peak
+    does not.
+    """
+
+    def __init__(self, path: str) -> None:
+        # imported here and in phase(), so agents only pay for tracemalloc when profiling is enabled
+        import tracemalloc
+
+        self.path = path
+        # leave out the snapshots the profiler takes itself
+        self.filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        self.turn = 0
+        self.records: List[PhaseRecord] = []
+        self.site_totals: Dict[str, List[int]] = {}
+        tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name: str):
+        import tracemalloc
+
+        before = tracemalloc.take_snapshot()
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot().filter_traces(self.filters)
+            self._record(name, peak - start, after.compare_to(before.filter_traces(self.filters), "lineno"))
+
+    def _record(self, name: str, peak: int, differences: List["tracemalloc.StatisticDiff"]) -> None:
+        blocks = sum(difference.count_diff for difference in differences)
+        size = sum(difference.size_diff for difference in differences)
+        sites = []
+        for difference in differences:
+            if difference.size_diff <= 0:
+                continue
+            frame = difference.traceback[0]
+            site = f"{frame.filename}:{frame.lineno}"
+            totals = self.site_totals.setdefault(site, [0, 0])
+            totals[0] += difference.size_diff
+            totals[1] += difference.count_diff
+            if len(sites) < TOP_SITES:
+                sites.append((site, difference.size_diff, difference.count_diff))
+        self.records.append(PhaseRecord(self.turn, name, peak, blocks, size, sites))
+
+    @contextmanager
+    def turn_scope(self, turn: int):
+        self.turn = turn
+        yield
+
+    def report(self) -> str:
+        import linecache
+
+        phases: Dict[str, List[PhaseRecord]] = {}
+        turns: Dict[int, List[PhaseRecord]] = {}
+        for record in self.records:
+            phases.setdefault(record.phase, []).append(record)
+            turns.setdefault(record.turn, []).append(record)
+
+        # one line per turn, peak KiB, transient KiB and net blocks of every phase followed by the largest site of the turn
+        lines = ["turn  " + "  ".join(f"{name[:10]:>10s} peak/transient KiB/blocks" for name in phases) + "  top site"]
+        for turn, records in turns.items():
+            by_phase = {record.phase: record for record in records}
+            columns = []
+            for name in phases:
+                record = by_phase.get(name)
+                columns.append(
+                    f"{record.peak / 1024:10.1f} {record.transient / 1024:10.1f} {record.blocks:15d}" if record else " " * 37
+                )
+            sites = [site for record in records for site in record.sites]
+            top = max(sites, key=lambda site: site[1], default=None)
+            top_site = f"{short(top[0])} {top[1] / 1024:.0f}K/{top[2]}" if top else ""
+            lines.append(f"{turn:4d}  " + "  ".join(columns) + f"  {top_site}")
+        lines += ["", "phase       turns  mean peak KiB  max peak KiB  mean transient KiB  mean net blocks"]
+        for name, records in phases.items():
+            lines.append(
+                f"{name:10s} {len(records):6d} {sum(r.peak for r in records) / len(records) / 1024:14.1f} "
+                f"{max(r.peak for r in records) / 1024:13.1f} {sum(r.transient for r in records) / len(records) / 1024:19.1f} "
+                f"{sum(r.blocks for r in records) / len(records):16.1f}"
+            )
+        lines += ["", "top allocation sites over the game (KiB, blocks)"]
+        totals = sorted(self.site_totals.items(), key=lambda item: item[1][0], reverse=True)[:REPORT_SITES]
+        for site, (size, blocks) in totals:
+            filename, lineno = site.rsplit(":", 1)
+            source = linecache.getline(filename, int(lineno)).strip() if os.path.exists(filename) else ""
+            lines.append(f"{size / 1024:10.1f} {blocks:8d}  {short(site)}  {source}")
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> None:
+        with open(self.path, "w") as f:
+            f.write(self.report())
+
+
+_profiler: Optional[MemoryProfiler] = None
+
+
+def enable(path: str) -> MemoryProfiler:
+    global _profiler
+    if _profiler is None:
+        _profiler = MemoryProfiler(path)
+        atexit.register(_profiler.write)
+    return _profiler
+
+
+def enable_from_environment() -> Optional[MemoryProfiler]:
+    path = os.environ.get(ENVIRONMENT_VARIABLE)
+    return enable(path) if path else None
+
+
+def phase(name: str):
+    """
+    Context manager recording the allocations of `name` this turn, does nothing unless profiling is enabled
+    """
+    return _profiler.phase(name) if _profiler is not None else nullcontext()
+
+
+def turn(step: int):
+    return _profiler.turn_scope(step) if _profiler is not None else nullcontext()
@@ -0,0 +1,353 @@
+import argparse
+import csv
+import glob
+import json
+import os
+from collections import Counter
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from batch_env import BatchEnv
+from capture import CaptureReader
+from tables import DIRECTION_DELTAS, IS_NIGHT, MAX_DAYS
+
+# number of arguments (including the command) of every game command
+COMMAND_LENGTHS = {"m": 3, "t": 5, "bcity": 2, "bw": 3, "bc": 3, "r": 3, "p": 2}
+ANNOTATIONS = {"dc", "dx", "dl", "dt", "dst"}
+# a unit that could act but did neither act nor mine for this many day turns in a row is idle,
+# units are expected to wait out the night so night turns do not end a stretch
+IDLE_TURNS = 10
+# moving A -> B -> A -> B within this many turns without any change of cargo is oscillating,
+# shuttles that pick up or drop off resources are mining trips
+OSCILLATION_TURNS = 8
+
+# the state columns are None for replays without a capture of their first turn
+COLUMNS = [
+    "idle units",
+    "idle turns",
+    "dark city tiles",
+    "rejected commands",
+    "malformed commands",
+    "oscillating units",
+    "oscillations",
+    "commands",
+]
+
+
+def is_valid_command(strs: List[str]) -> bool:
+    kind = strs[0]
+    if kind in ANNOTATIONS:
+        return True
+    if COMMAND_LENGTHS.get(kind) != len(strs):
+        return False
+    if kind == "m":
+        return strs[2] in DIRECTION_DELTAS
+    if kind in ("bw", "bc", "r"):
+        return strs[1].lstrip("-").isdigit() and strs[2].lstrip("-").isdigit()
+    return True
+
+
+def capture_path(replay_path: str) -> str:
+    """
+    Replays hold the seed but not the map, the map is read from a capture (written with LUX_CAPTURE)
+    of the same game next to the replay, `game.json` -> `game.capture`
+    """
+    return os.path.splitext(replay_path)[0] + ".capture"
+
+
+def initial_updates(replay_path: str) -> Optional[List[str]]:
+    path = capture_path(replay_path)
+    if not os.path.exists(path + ".idx"):
+        return None
+    reader = CaptureReader(path)
+    return reader.updates(0) if 0 in reader.entries else None
+
+
+class Snapshot:
+    """
+    The parts of the state of game 0 of `env` needed to tell which commands of a turn were carried out
+    """
+
+    def __init__(self, env: BatchEnv) -> None:
+        self.unit_alive = env.unit_alive[0].copy()
+        self.unit_team = env.unit_team[0].copy()
+        self.unit_x = env.unit_x[0].copy()
+        self.unit_y = env.unit_y[0].copy()
+        self.unit_cooldown = env.unit_cooldown[0].copy()
+        self.unit_cargo = env.unit_cargo[0].sum(axis=1)
+        self.city_index = env.city_index[0].copy()
+        self.city_tile_team = np.where(self.city_index >= 0, env.city_team[0][np.maximum(self.city_index, 0)], -1)
+        self.city_tile_cooldown = env.city_tile_cooldown[0].copy()
+        # unit id -> slot of every living unit
+        self.slots = {f"u_{env.unit_number[0, slot]}": int(slot) for slot in np.nonzero(self.unit_alive)[0]}
+
+
+class TeamReplay:
+    """
+    What one team did during a replay. The commands are replayed on `BatchEnv` from the map of the first
+    turn, so units that never get a command and commands the engine does not carry out are seen too.
+    `BatchEnv` simplifies a few rules of the engine (roads, resource collection order), so the state may
+    drift from the real game in long games and a few commands may count as rejected that the engine accepted.
+    """
+
+    def __init__(self, team: int) -> None:
+        self.team = team
+        self.commands = 0
+        self.malformed: Counter = Counter()
+        self.rejected: Counter = Counter()
+        # unit id -> idle day turns in a row so far / lengths of the finished idle stretches
+        self.idle_run: Dict[str, int] = {}
+        self.idle_stretches: Dict[str, List[int]] = {}
+        # unit id -> turns, positions the unit moved from and the cargo it had on them
+        self.origins: Dict[str, List[Tuple[int, Tuple[int, int], float]]] = {}
+        self.dark_tiles = 0
+        self.rebuilt = False
+
+    def parse(self, commands: List[str]) -> List[str]:
+        """
+        Count the commands of a turn and return the well formed game commands, without annotations
+        """
+        game_commands = []
+        for command in commands:
+            self.commands += 1
+            strs = command.split(" ")
+            if not is_valid_command(strs):
+                self.malformed[strs[0]] += 1
+            elif strs[0] not in ANNOTATIONS:
+                game_commands.append(command)
+        return game_commands
+
+    def add_turn(self, turn: int, before: Snapshot, env: BatchEnv, commands: List[str]) -> None:
+        """
+        Compare the state before and after `turn` for the game commands the team sent in it
+        """
+        self.rebuilt = True
+        acted: Set[int] = set()
+        handled: Set[Tuple] = set()
+        built = [
+            (env.unit_x[0, slot], env.unit_y[0, slot])
+            for slot in np.nonzero(env.unit_alive[0] & (env.unit_team[0] == self.team))[0]
+            if f"u_{env.unit_number[0, slot]}" not in before.slots
+        ]
+        for command in commands:
+            strs = command.split(" ")
+            kind = strs[0]
+            if kind in ("r", "bw", "bc"):
+                x, y = int(strs[1]), int(strs[2])
+                key = ("city", x, y)
+                inside = 0 <= x < env.width and 0 <= y < env.height
+                # research always counts once the tile may act, a worker or cart is built if there is room for it
+                accepted = (
+                    key not in handled
+                    and inside
+                    and before.city_tile_team[y, x] == self.team
+                    and before.city_tile_cooldown[y, x] < 1
+                    and (kind == "r" or (x, y) in built)
+                )
+                if accepted and kind != "r":
+                    built.remove((x, y))
+            else:
+                slot = before.slots.get(strs[1])
+                key = ("unit", slot)
+                if kind == "m" and strs[2] == "c" and slot is not None:
+                    # staying put is no action, the engine takes another command of the unit after it
+                    continue
+                accepted = (
+                    slot is not None
+                    and key not in handled
+                    and before.unit_team[slot] == self.team
+                    and before.unit_cooldown[slot] < 1
+                )
+                if accepted and kind == "m":
+                    origin = (int(before.unit_x[slot]), int(before.unit_y[slot]))
+                    accepted = origin != (env.unit_x[0, slot], env.unit_y[0, slot])
+                    if accepted:
+                        self.origins.setdefault(strs[1], []).append((turn, origin, float(before.unit_cargo[slot])))
+                elif accepted:
+                    # building a city tile, transferring and pillaging leave the unit with its cooldown
+                    accepted = env.unit_cooldown[0, slot] >= 1
+                if accepted:
+                    acted.add(slot)
+            handled.add(key)
+            if not accepted:
+                self.rejected[kind] += 1
+
+        for unit_id, slot in before.slots.items():
+            if before.unit_team[slot] != self.team or before.unit_cooldown[slot] >= 1 or IS_NIGHT[min(turn, MAX_DAYS)]:
+                continue
+            mined = env.unit_cargo[0, slot].sum() > before.unit_cargo[slot]
+            if slot in acted or mined:
+                self._end_idle(unit_id)
+            else:
+                self.idle_run[unit_id] = self.idle_run.get(unit_id, 0) + 1
+
+        # only the night takes city tiles away, together with every other tile of the city
+        team_tiles = before.city_tile_team == self.team
+        self.dark_tiles += int((team_tiles & (env.city_index[0] < 0)).sum())
+
+    def _end_idle(self, unit_id: str) -> None:
+        turns = self.idle_run.pop(unit_id, 0)
+        if turns >= IDLE_TURNS:
+            self.idle_stretches.setdefault(unit_id, []).append(turns)
+
+    def idle_units(self) -> Tuple[int, int]:
+        """
+        Number of units with at least one idle stretch and the total day turns of all idle stretches
+        """
+        for unit_id in list(self.idle_run):
+            self._end_idle(unit_id)
+        return len(self.idle_stretches), sum(sum(stretches) for stretches in self.idle_stretches.values())
+
+    def oscillations(self) -> Tuple[int, int]:
+        """
+        Number of units that moved back and forth between two tiles and the number of times they did
+        """
+        units = 0
+        total = 0
+        for moves in self.origins.values():
+            turns = [turn for turn, _, _ in moves]
+            origins = [origin for _, origin, _ in moves]
+            cargo = [cargo for _, _, cargo in moves]
+            count = sum(
+                1
+                for index in range(len(origins) - 3)
+                if origins[index] == origins[index + 2]
+                and origins[index + 1] == origins[index + 3]
+                and origins[index] != origins[index + 1]
+                and turns[index + 3] - turns[index] <= OSCILLATION_TURNS
+                and len(set(cargo[index : index + 4])) == 1
+            )
+            units += count > 0
+            total += count
+        return units, total
+
+    def row(self) -> List[Optional[int]]:
+        if not self.rebuilt:
+            return [None, None, None, None, sum(self.malformed.values()), None, None, self.commands]
+        idle_units, idle_turns = self.idle_units()
+        oscillating_units, oscillations = self.oscillations()
+        return [
+            idle_units,
+            idle_turns,
+            self.dark_tiles,
+            sum(self.rejected.values()),
+            sum(self.malformed.values()),
+            oscillating_units,
+            oscillations,
+            self.commands,
+        ]
+
+
+def analyse_replay(path: str) -> Dict:
+    """
+    Metrics of both teams of the replay at `path`. Without a capture of the first turn next to the replay
+    only the commands themselves are counted, the state columns are None.
+    """
+    with open(path) as f:
+        replay = json.load(f)
+    teams = [TeamReplay(0), TeamReplay(1)]
+    updates = initial_updates(path)
+    env = None
+    if updates is not None:
+        env = BatchEnv(1, replay["width"], replay["height"])
+        env.reset([updates])
+    for turn, commands in enumerate(replay["allCommands"]):
+        game_commands = [
+            team_replay.parse([command["command"] for command in commands if command["agentID"] == team])
+            for team, team_replay in enumerate(teams)
+        ]
+        if env is None or env.done[0]:
+            continue
+        before = Snapshot(env)
+        env.step([tuple(game_commands)])
+        for team, team_replay in enumerate(teams):
+            team_replay.add_turn(turn, before, env, game_commands[team])
+    ranks = replay.get("results", {}).get("ranks", [])
+    winner = next((rank["agentID"] for rank in ranks if rank["rank"] == 1), None)
+    return {
+        "replay": os.path.basename(path),
+        "seed": replay.get("seed"),
+        "size": f'{replay.get("width")}x{replay.get("height")}',
+        "winner": winner,
+        "teams": [team_replay.row() for team_replay in teams],
+        "malformed": [dict(team_replay.malformed) for team_replay in teams],
+        "rejected": [dict(team_replay.rejected) for team_replay in teams],
+    }
+
+
+def analyse(paths: List[str], workers: int) -> List[Dict]:
+    with Pool(workers) as pool:
+        return sorted(pool.imap_unordered(analyse_replay, paths), key=lambda result: result["replay"])
+
+
+def format_value(value: Optional[float], spec: str) -> str:
+    return f"{'-':>17s}" if value is None else f"{value:{spec}}"
+
+
+def format_table(results: List[Dict], per_replay: bool) -> str:
+    lines = []
+    header = f"{'':24s} team " + " ".join(f"{column:>17s}" for column in COLUMNS)
+    if per_replay:
+        lines.append(header)
+        for result in results:
+            for team, row in enumerate(result["teams"]):
+                name = result["replay"][:24] if team == 0 else ""
+                lines.append(f"{name:24s} {team:4d} " + " ".join(format_value(value, "17d") for value in row))
+        lines.append("")
+    rebuilt = sum(result["teams"][0][0] is not None for result in results)
+    lines.append(f"{len(results)} replays, {rebuilt} with a capture of the map, mean per game of the replays with the column")
+    lines.append(header)
+    for team in range(2):
+        means = []
+        for column in range(len(COLUMNS)):
+            values = [result["teams"][team][column] for result in results if result["teams"][team][column] is not None]
+            means.append(sum(values) / len(values) if len(values) > 0 else None)
+        lines.append(f"{'':24s} {team:4d} " + " ".join(format_value(mean, "17.2f") for mean in means))
+    wins = Counter(result["winner"] for result in results)
+    lines.append(f"wins: team 0 {wins[0]}, team 1 {wins[1]}")
+    for key in ("rejected", "malformed"):
+        counts = [Counter(), Counter()]
+        for result in results:
+            for team in range(2):
+                counts[team].update(result[key][team])
+        for team in range(2):
+            if counts[team]:
+                kinds = ", ".join(f"'{kind}' {count}" for kind, count in counts[team].most_common())
+                lines.append(f"{key} commands of team {team}: {kinds}")
+    return "\n".join(lines)
+
+
+def write_csv(results: List[Dict], path: str) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["replay", "seed", "size", "winner", "team", *COLUMNS])
+        for result in results:
+            for team, row in enumerate(result["teams"]):
+                row = ["" if value is None else value for value in row]
+                writer.writerow([result["replay"], result["seed"], result["size"], result["winner"], team, *row])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Find idle units, dark cities, rejected commands and oscillating moves in replays. The game state "
+        "is rebuilt from a capture of the first turn next to every replay (game.json -> game.capture)"
+    )
+    parser.add_argument("replays", nargs="+", help="replay files or directories of replay files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of processes")
+    parser.add_argument("--per-replay", action="store_true", help="also print one row per replay and team")
+    parser.add_argument("--csv", default=None, help="write one row per replay and team to this file")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.replays:
+        paths += sorted(glob.glob(os.path.join(path, "*.json"))) if os.path.isdir(path) else [path]
+    results = analyse(paths, args.workers)
+    print(format_table(results, args.per_replay))
+    if args.csv is not None:
+        write_csv(results, args.csv)
+
+
+if __name__ == "__main__":
+    main()
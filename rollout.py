@@ -0,0 +1,514 @@
+import math
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lux.game import Game
+from lux.game_constants import GAME_CONSTANTS
+from lux.game_objects import Unit
+from shared_state import MAX_UNITS, RESOURCE_NAMES, UNIT_ID, GameArrays, SharedGameState, attach, to_arrays, unit_count
+from tables import night_turns_between
+
+PARAMETERS = GAME_CONSTANTS["PARAMETERS"]
+
+MINE = "mine"
+DELIVER = "deliver"
+BUILD = "build"
+MACRO_ACTIONS = [MINE, DELIVER, BUILD]
+
+MAX_DAYS = PARAMETERS["MAX_DAYS"]
+WORKER_CAPACITY = PARAMETERS["RESOURCE_CAPACITY"]["WORKER"]
+WORKER_COOLDOWN = PARAMETERS["UNIT_ACTION_COOLDOWN"]["WORKER"]
+WORKER_UPKEEP = PARAMETERS["LIGHT_UPKEEP"]["WORKER"]
+CITY_UPKEEP = PARAMETERS["LIGHT_UPKEEP"]["CITY"]
+CITY_BUILD_COST = PARAMETERS["CITY_BUILD_COST"]
+# collection and fuel rate of every resource code
+COLLECTION_RATE = np.array([0] + [PARAMETERS["WORKER_COLLECTION_RATE"][name.upper()] for name in RESOURCE_NAMES[1:]])
+FUEL_RATE = np.array([0] + [PARAMETERS["RESOURCE_TO_FUEL_RATE"][name.upper()] for name in RESOURCE_NAMES[1:]])
+
+# rollout values are measured in fuel
+CITY_TILE_VALUE = 300
+UNIT_LOSS_VALUE = 200
+# chance that a step gets blocked by another unit
+BLOCKED_CHANCE = 0.1
+EXPLORATION = 1.4
+# how much of the statistics of the previous turn are kept when the tree is reused
+REUSE_DECAY = 0.5
+# reused nodes with fewer (decayed) visits are dropped, keeps the trees from growing every turn
+MIN_VISITS = 0.05
+
+
+def nearest(width: int, height: int, targets: List[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Manhattan distance from every tile to the closest target and the index of that target, both indexed [y, x]
+    """
+    if len(targets) == 0:
+        return np.full((height, width), np.inf), np.full((height, width), -1, dtype=np.int64)
+    ys, xs = np.mgrid[0:height, 0:width]
+    target = np.array(targets)
+    distances = np.abs(xs[..., None] - target[:, 0]) + np.abs(ys[..., None] - target[:, 1])
+    index = distances.argmin(axis=2)
+    return np.take_along_axis(distances, index[..., None], axis=2)[..., 0].astype(np.float64), index
+
+
+class ForwardModel:
+    """
+    Cheap model of the current turn, the map is reduced to the nearest resource, city and empty tile of every tile
+    """
+
+    def __init__(self, arrays: GameArrays, team: int) -> None:
+        self.turn = arrays.turn
+        height, width = arrays.resource_type.shape
+        resource_type = arrays.resource_type
+        mineable = arrays.researched(team)[resource_type]
+        ys, xs = np.nonzero(mineable)
+        codes = resource_type[ys, xs]
+        resources = list(zip(xs.tolist(), ys.tolist()))
+        self.resource_rate = COLLECTION_RATE[codes].tolist()
+        self.resource_fuel = FUEL_RATE[codes].tolist()
+        ys, xs = np.nonzero((resource_type == 0) & (arrays.city_tile_team < 0))
+        empty = list(zip(xs.tolist(), ys.tolist()))
+
+        self.cities: List[int] = []
+        self.city_deficit: List[float] = []
+        nights = night_turns_between(self.turn, MAX_DAYS)
+        # row of the city table -> index of the city in this model
+        city_index = {}
+        for row, (city_id, city_team, fuel, upkeep) in enumerate(arrays.city_rows().tolist()):
+            if city_team == team:
+                city_index[row] = len(self.cities)
+                self.cities.append(int(city_id))
+                self.city_deficit.append(max(upkeep * nights - fuel, 0))
+        city_tiles = []
+        city_of_tile = []
+        for row, x, y, _ in arrays.city_tile_rows().tolist():
+            if int(row) in city_index:
+                city_tiles.append((int(x), int(y)))
+                city_of_tile.append(city_index[int(row)])
+
+        self.resources = resources
+        self.city_tiles = city_tiles
+        self.city_of_tile = city_of_tile
+        self.empty = empty
+        self.resource_distance, self.resource_index = nearest(width, height, resources)
+        self.city_distance, self.city_index = nearest(width, height, city_tiles)
+        self.empty_distance, self.empty_index = nearest(width, height, empty)
+        city_plane = np.zeros((height, width), dtype=bool)
+        for x, y in city_tiles:
+            city_plane[y, x] = True
+        self.city_plane = city_plane
+
+    def legal_actions(self, cargo: int) -> List[str]:
+        legal = []
+        if cargo < WORKER_CAPACITY and len(self.resources) > 0:
+            legal.append(MINE)
+        if cargo > 0 and len(self.city_tiles) > 0:
+            legal.append(DELIVER)
+        if cargo >= CITY_BUILD_COST and len(self.empty) > 0:
+            legal.append(BUILD)
+        return legal
+
+
+class RolloutState:
+    def __init__(self, x: int, y: int, cargo: int, fuel_rate: int, turn: int, deficit: List[float]) -> None:
+        self.x = x
+        self.y = y
+        self.cargo = cargo
+        self.fuel_rate = fuel_rate
+        self.turn = turn
+        self.deficit = deficit
+        self.value = 0.0
+        self.dead = False
+
+    def travel(self, model: ForwardModel, distance: float, end: int, rng: random.Random) -> None:
+        """
+        Walk `distance` tiles, paying night upkeep from the cargo when outside of a city
+        """
+        turns = 0
+        for _ in range(int(distance)):
+            turns += WORKER_COOLDOWN
+            while rng.random() < BLOCKED_CHANCE:
+                turns += 1
+        self.pass_turns(model, turns, end, in_city=False)
+
+    def pass_turns(self, model: ForwardModel, turns: int, end: int, in_city: bool) -> None:
+        start = self.turn
+        self.turn = min(self.turn + turns, end)
+        if in_city:
+            return
+        upkeep = WORKER_UPKEEP * night_turns_between(start, self.turn)
+        fuel = self.cargo * self.fuel_rate
+        if upkeep > fuel:
+            self.dead = True
+            self.value -= UNIT_LOSS_VALUE
+        else:
+            self.cargo = int(self.cargo - math.ceil(upkeep / max(self.fuel_rate, 1)))
+
+
+class Node:
+    def __init__(self) -> None:
+        self.visits = 0.0
+        self.value = 0.0
+        self.children: Dict[str, "Node"] = {}
+
+    def decay(self, factor: float) -> None:
+        self.visits *= factor
+        self.value *= factor
+        for action, child in list(self.children.items()):
+            child.decay(factor)
+            if child.visits < MIN_VISITS:
+                del self.children[action]
+
+    def select(self, legal: List[str], scale: float) -> str:
+        for action in legal:
+            if action not in self.children or self.children[action].visits == 0:
+                return action
+        log_visits = math.log(self.visits + 1)
+
+        def ucb(action: str) -> float:
+            child = self.children[action]
+            return child.value / child.visits / scale + EXPLORATION * math.sqrt(log_visits / child.visits)
+
+        return max(legal, key=ucb)
+
+
+class RolloutPlanner:
+    """
+    Anytime Monte Carlo planner choosing the next macro action (mine, deliver, build) of every worker.
+
+    Every worker has its own search tree over sequences of macro actions, simulated for `horizon` turns
+    with `ForwardModel`. `plan` searches for a number of rollouts, the deadline is only a safety cap checked
+    within every rollout, and the trees are kept for the next turn.
+    """
+
+    def __init__(self, horizon: int = 40, seed: int = 0) -> None:
+        self.horizon = horizon
+        self.seed = seed
+        self.reset()
+
+    def reset(self) -> None:
+        self.rng = random.Random(self.seed)
+        self.trees: Dict[str, Node] = {}
+        self.last_actions: Dict[str, str] = {}
+        self.last_cargo: Dict[str, int] = {}
+        self.rollouts = 0
+        self.elapsed = 0.0
+        self.max_depth = 0
+        self.scale = 1.0
+
+    def _forget_gone(self, game_state: Game, team: int) -> None:
+        """
+        Drop the trees and last actions of units that are no longer in the game, units that were not planned this
+        turn (e.g. on cooldown) keep theirs
+        """
+        alive = {unit.id for unit in game_state.players[team].units}
+        for per_unit in (self.trees, self.last_actions, self.last_cargo):
+            for unit_id in [unit_id for unit_id in per_unit if unit_id not in alive]:
+                del per_unit[unit_id]
+
+    def _reuse(self, unit: Unit) -> Node:
+        """
+        Keep the tree of the unit, moving to the subtree of its last action once that action is finished
+        """
+        root = self.trees.get(unit.id)
+        if root is None:
+            return Node()
+        cargo = self._cargo(unit)
+        last_action = self.last_actions.get(unit.id)
+        finished = (
+            (last_action == MINE and cargo >= WORKER_CAPACITY)
+            or (last_action == DELIVER and cargo == 0)
+            or (last_action == BUILD and cargo < self.last_cargo.get(unit.id, 0) - CITY_BUILD_COST // 2)
+        )
+        if finished:
+            root = root.children.get(last_action, Node())
+        root.decay(REUSE_DECAY)
+        return root
+
+    def rollout(self, model: ForwardModel, root: Node, unit: Unit, deadline: float = math.inf) -> Optional[int]:
+        """
+        One rollout from `root`, returns its depth. A rollout that reaches `deadline` is dropped before its value
+        is added to the tree and returns None.
+        """
+        cargo = self._cargo(unit)
+        fuel_rate = self._fuel(unit) / cargo if cargo > 0 else 1
+        state = RolloutState(unit.pos.x, unit.pos.y, cargo, fuel_rate, model.turn, list(model.city_deficit))
+        end = min(model.turn + self.horizon, MAX_DAYS)
+        path = [root]
+        node = root
+        depth = 0
+        expanding = True
+        while state.turn < end and not state.dead:
+            if time.perf_counter() >= deadline:
+                # an expanded child stays unvisited, `select` tries it first and `decide` skips it
+                return None
+            legal = model.legal_actions(state.cargo)
+            if len(legal) == 0:
+                break
+            if expanding:
+                action = node.select(legal, self.scale)
+                if action not in node.children:
+                    node.children[action] = Node()
+                    expanding = False
+                node = node.children[action]
+                path.append(node)
+            else:
+                action = self.rng.choice(legal)
+            self.simulate(model, state, action, end)
+            depth += 1
+        self.scale = max(self.scale, abs(state.value))
+        for node in path:
+            node.visits += 1
+            node.value += state.value
+        return depth
+
+    def simulate(self, model: ForwardModel, state: RolloutState, action: str, end: int) -> None:
+        if action == MINE:
+            index = model.resource_index[state.y, state.x]
+            state.travel(model, max(model.resource_distance[state.y, state.x] - 1, 0), end, self.rng)
+            state.x, state.y = model.resources[index]
+            state.fuel_rate = model.resource_fuel[index]
+            rate = model.resource_rate[index] * self.rng.uniform(0.5, 1)
+            state.pass_turns(model, math.ceil((WORKER_CAPACITY - state.cargo) / rate), end, in_city=False)
+            if not state.dead:
+                state.cargo = WORKER_CAPACITY
+        elif action == DELIVER:
+            index = model.city_index[state.y, state.x]
+            state.travel(model, model.city_distance[state.y, state.x], end, self.rng)
+            if state.dead or state.turn >= end:
+                return
+            state.x, state.y = model.city_tiles[index]
+            city = model.city_of_tile[index]
+            fuel = state.cargo * state.fuel_rate
+            state.value += min(fuel, state.deficit[city])
+            state.deficit[city] = max(state.deficit[city] - fuel, 0)
+            state.cargo = 0
+            state.pass_turns(model, 1, end, in_city=True)
+        elif action == BUILD:
+            index = model.empty_index[state.y, state.x]
+            state.travel(model, model.empty_distance[state.y, state.x], end, self.rng)
+            if state.dead or state.turn >= end or state.cargo < CITY_BUILD_COST:
+                return
+            state.x, state.y = model.empty[index]
+            state.cargo -= CITY_BUILD_COST
+            state.value += CITY_TILE_VALUE - CITY_UPKEEP * night_turns_between(state.turn, end)
+            state.pass_turns(model, WORKER_COOLDOWN, end, in_city=True)
+
+    def plan(
+        self, game_state: Game, team: int, units: List[Unit], deadline: float, max_rollouts: Optional[int] = None
+    ) -> Dict[str, str]:
+        """
+        Search for `max_rollouts` rollouts or until `deadline` (a `time.perf_counter` timestamp) and return the best
+        macro action of every unit. As long as the rollouts are done before the deadline the result does not depend
+        on timing.
+        """
+        start = time.perf_counter()
+        model = ForwardModel(to_arrays(game_state), team)
+        self._forget_gone(game_state, team)
+        for unit in units:
+            self.trees[unit.id] = self._reuse(unit)
+        self.rollouts = 0
+        self.max_depth = 0
+        self.search(model, [self.trees[unit.id] for unit in units], units, deadline, max_rollouts)
+        self.elapsed = time.perf_counter() - start
+        return self.decide(model, units)
+
+    def search(self, model: ForwardModel, trees: List[Node], units: List[Unit], deadline: float, max_rollouts: Optional[int]) -> None:
+        """
+        Rollouts from the tree of every unit in turn, for the units with a choice. Stops within a rollout at `deadline`.
+        """
+        candidates = [index for index, unit in enumerate(units) if len(model.legal_actions(self._cargo(unit))) > 1]
+        while len(candidates) > 0 and (max_rollouts is None or self.rollouts < max_rollouts):
+            index = candidates[self.rollouts % len(candidates)]
+            depth = self.rollout(model, trees[index], units[index], deadline)
+            if depth is None:
+                break
+            self.max_depth = max(self.max_depth, depth)
+            self.rollouts += 1
+
+    def decide(self, model: ForwardModel, units: List[Unit]) -> Dict[str, str]:
+        """
+        The macro action with the best mean value in the tree of every unit
+        """
+        decisions = {}
+        for unit in units:
+            legal = model.legal_actions(self._cargo(unit))
+            if len(legal) == 0:
+                continue
+            root = self.trees[unit.id]
+            visited = [action for action in legal if action in root.children and root.children[action].visits > 0]
+            if len(visited) == 0:
+                continue
+            decisions[unit.id] = max(visited, key=lambda action: root.children[action].value / root.children[action].visits)
+            self.last_actions[unit.id] = decisions[unit.id]
+            self.last_cargo[unit.id] = self._cargo(unit)
+        return decisions
+
+    @staticmethod
+    def _cargo(unit: Unit) -> int:
+        return unit.cargo.wood + unit.cargo.coal + unit.cargo.uranium
+
+    @staticmethod
+    def _fuel(unit: Unit) -> int:
+        fuel_rate = PARAMETERS["RESOURCE_TO_FUEL_RATE"]
+        return unit.cargo.wood * fuel_rate["WOOD"] + unit.cargo.coal * fuel_rate["COAL"] + unit.cargo.uranium * fuel_rate["URANIUM"]
+
+    def rollouts_per_second(self) -> float:
+        return self.rollouts / self.elapsed if self.elapsed > 0 else 0.0
+
+    def report(self) -> str:
+        return (
+            f"{self.rollouts} rollouts in {self.elapsed * 1000:.1f}ms "
+            f"({self.rollouts_per_second():.0f}/s), max depth {self.max_depth}"
+        )
+
+
+def search_shared(task: Tuple) -> Tuple[np.ndarray, int, int]:
+    """
+    Search of one worker process on the published game state, with fresh trees for the units in the given rows of
+    the unit table. Returns the visits and value of every macro action of every unit, the rollouts and max depth.
+    """
+    handle, version, team, rows, seconds, max_rollouts, horizon, seed = task
+    deadline = time.perf_counter() + seconds
+    arrays = attach(handle)
+    if arrays.version != version:
+        raise RuntimeError(f"Shared game state is at version {arrays.version} instead of {version}")
+    planner = RolloutPlanner(horizon, seed)
+    units = [arrays.unit(row) for row in rows]
+    trees = [Node() for _ in units]
+    planner.search(ForwardModel(arrays, team), trees, units, deadline, max_rollouts)
+    statistics = np.zeros((len(units), len(MACRO_ACTIONS), 2))
+    for index, tree in enumerate(trees):
+        for action_index, action in enumerate(MACRO_ACTIONS):
+            if action in tree.children:
+                statistics[index, action_index] = tree.children[action].visits, tree.children[action].value
+    return statistics, planner.rollouts, planner.max_depth
+
+
+class ParallelRolloutPlanner(RolloutPlanner):
+    """
+    `RolloutPlanner` searching in `workers` processes. The game state is published once per turn in shared memory,
+    every worker searches its own trees with its own seed and only the statistics of the first macro action of
+    every unit come back and are added up. Trees are not kept between turns. Call `close` when done.
+    """
+
+    def __init__(self, workers: Optional[int] = None, horizon: int = 40, seed: int = 0) -> None:
+        import os
+
+        self.workers = workers or os.cpu_count()
+        self.pool = None
+        self.shared: Optional[SharedGameState] = None
+        super().__init__(horizon, seed)
+
+    def plan(
+        self, game_state: Game, team: int, units: List[Unit], deadline: float, max_rollouts: Optional[int] = None
+    ) -> Dict[str, str]:
+        from multiprocessing import Pool
+
+        start = time.perf_counter()
+        if self.shared is None or not self.shared.fits(game_state):
+            if self.shared is not None:
+                self.shared.close()
+            # a new block twice the size when the game outgrows the unit table, the workers attach it by its name
+            max_units = max(MAX_UNITS, 2 * unit_count(game_state))
+            self.shared = SharedGameState(game_state.map_width, game_state.map_height, max_units)
+        if self.pool is None:
+            # started after the first shared memory, so the workers share the resource tracker of this process
+            # and do not unlink the memory when they exit
+            self.pool = Pool(self.workers)
+        version = self.shared.publish(game_state)
+        arrays = self.shared.arrays
+        row_of_unit = {f"u_{int(unit_id)}": row for row, unit_id in enumerate(arrays.unit_rows()[:, UNIT_ID].tolist())}
+        rows = [row_of_unit[unit.id] for unit in units]
+        seconds = max(deadline - time.perf_counter(), 0.0)
+        per_worker = None if max_rollouts is None else math.ceil(max_rollouts / self.workers)
+        tasks = [
+            (self.shared.handle, version, team, rows, seconds, per_worker, self.horizon, self.seed + version * self.workers + worker)
+            for worker in range(self.workers)
+        ]
+        statistics = np.zeros((len(units), len(MACRO_ACTIONS), 2))
+        self.rollouts = 0
+        self.max_depth = 0
+        for worker_statistics, rollouts, max_depth in self.pool.map(search_shared, tasks):
+            statistics += worker_statistics
+            self.rollouts += rollouts
+            self.max_depth = max(self.max_depth, max_depth)
+        self._forget_gone(game_state, team)
+        for unit, unit_statistics in zip(units, statistics):
+            root = self.trees[unit.id] = Node()
+            for action, (visits, value) in zip(MACRO_ACTIONS, unit_statistics.tolist()):
+                if visits > 0:
+                    child = root.children[action] = Node()
+                    child.visits = visits
+                    child.value = value
+        self.elapsed = time.perf_counter() - start
+        return self.decide(ForwardModel(arrays, team), units)
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+
+def benchmark(size: int = 32, turn: int = 150, seconds: float = 0.5) -> None:
+    """
+    Cost of sending the game state of a mid game turn to a worker, pickled and through shared memory,
+    and the rollouts per second of the serial and the parallel planner
+    """
+    import os
+    import pickle
+
+    from batch_env import BatchEnv, starting_updates
+    from agent2 import Agent
+
+    env = BatchEnv(1, size, size)
+    updates = [starting_updates(size, size, np.random.default_rng(0))]
+    env.reset(updates)
+    agents = (Agent(), Agent())
+    for agent in agents:
+        agent.reset()
+    _play_turns(env, agents, turn)
+    game_state = env.game(0, 0)
+    units = game_state.players[0].units
+
+    start = time.perf_counter()
+    pickled = pickle.dumps(game_state)
+    pickle.loads(pickled)
+    pickle_time = time.perf_counter() - start
+    shared = SharedGameState(size, size)
+    start = time.perf_counter()
+    shared.publish(game_state)
+    publish_time = time.perf_counter() - start
+    print(f"{len(units)} units: pickled game {len(pickled)} bytes in {pickle_time * 1000:.2f}ms, "
+          f"shared state {shared.layout.size} bytes published in {publish_time * 1000:.2f}ms")
+    shared.close()
+
+    for planner in (RolloutPlanner(), ParallelRolloutPlanner(os.cpu_count())):
+        # the first plan starts the worker processes
+        planner.plan(game_state, 0, units, time.perf_counter() + 0.1)
+        planner.plan(game_state, 0, units, time.perf_counter() + seconds)
+        print(f"{type(planner).__name__}: {planner.report()}")
+        if isinstance(planner, ParallelRolloutPlanner):
+            planner.close()
+
+
+def _play_turns(env, agents, turns: int) -> None:
+    from classes import Observation
+
+    for _ in range(turns):
+        actions = ([], [])
+        for team, agent in enumerate(agents):
+            observation = Observation(team)
+            observation["step"] = int(env.turn[0])
+            observation["updates"] = env.updates(0, team)
+            actions[team].extend(agent.step(observation))
+        env.step([actions])
+
+
+if __name__ == "__main__":
+    benchmark()
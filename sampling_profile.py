@@ -0,0 +1,199 @@
+import atexit
+import os
+import signal
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Optional, Tuple
+
+# set to a directory to sample the stacks of every turn, one collapsed stack file is written per game
+ENVIRONMENT_VARIABLE = "LUX_SAMPLE_PROFILE"
+# seconds of cpu time between two samples
+INTERVAL_VARIABLE = "LUX_SAMPLE_INTERVAL"
+DEFAULT_INTERVAL = 0.001
+# samples are grouped in ranges of this many turns, one day and night
+TURNS_PER_RANGE = 40
+REPORT_FUNCTIONS = 15
+
+
+def frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def range_name(turn: int) -> str:
+    first = turn // TURNS_PER_RANGE * TURNS_PER_RANGE
+    return f"turns {first}-{first + TURNS_PER_RANGE - 1}"
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the main thread every `interval` seconds of cpu time while a turn is played, with a
+    profiling timer signal so nothing runs in between. Every game is written to `directory` as collapsed stacks
+    (`frame;frame;frame count` per line, the root frame is the turn range), the format flame graph tools read.
+    """
+
+    def __init__(self, directory: str, interval: float = DEFAULT_INTERVAL) -> None:
+        if not hasattr(signal, "setitimer"):
+            raise RuntimeError("Sampling needs signal.setitimer, which this platform does not have")
+        self.directory = directory
+        self.interval = interval
+        self.turn: Optional[int] = None
+        self.game_name: Optional[str] = None
+        self.games = 0
+        # (turn range, code objects from the root to the leaf) -> samples
+        self.samples: Counter = Counter()
+        os.makedirs(directory, exist_ok=True)
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, interval, interval)
+
+    def _sample(self, signum, frame) -> None:
+        if self.turn is None:
+            return
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        self.samples[(self.turn // TURNS_PER_RANGE, tuple(reversed(codes)))] += 1
+
+    @contextmanager
+    def turn_scope(self, turn: int):
+        self.turn = turn
+        try:
+            yield
+        finally:
+            self.turn = None
+
+    @contextmanager
+    def game_scope(self, name: Optional[str] = None):
+        """
+        Samples of the turns played in this scope are written as one game
+        """
+        self.write()
+        self.game_name = name
+        try:
+            yield
+        finally:
+            self.write()
+
+    def collapsed(self) -> Dict[str, int]:
+        stacks: Dict[str, int] = {}
+        for (turn_range, codes), count in self.samples.items():
+            stack = ";".join([range_name(turn_range * TURNS_PER_RANGE), *(frame_name(code) for code in codes)])
+            stacks[stack] = stacks.get(stack, 0) + count
+        return stacks
+
+    def write(self) -> None:
+        """
+        Write the samples of the current game and start a new one
+        """
+        if len(self.samples) == 0:
+            return
+        self.games += 1
+        name = self.game_name or f"{os.getpid()}-{self.games}"
+        write_collapsed(self.collapsed(), os.path.join(self.directory, f"{name}.collapsed"))
+        self.samples.clear()
+        self.game_name = None
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        self.write()
+
+
+def write_collapsed(stacks: Dict[str, int], path: str) -> None:
+    with open(path, "w") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+
+
+def read_collapsed(path: str) -> Dict[str, int]:
+    stacks: Dict[str, int] = {}
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                stacks[stack] = stacks.get(stack, 0) + int(count)
+    return stacks
+
+
+def merge(paths: Iterable[str], keep_ranges: bool = False) -> Dict[str, int]:
+    """
+    Add up the collapsed stacks of many games, without the turn range root frame unless `keep_ranges`
+    """
+    merged: Dict[str, int] = {}
+    for path in paths:
+        for stack, count in read_collapsed(path).items():
+            if not keep_ranges:
+                stack = stack.split(";", 1)[1] if ";" in stack else stack
+            merged[stack] = merged.get(stack, 0) + count
+    return merged
+
+
+def top_functions(stacks: Dict[str, int]) -> Tuple[int, Counter, Counter]:
+    """
+    Total samples and the samples every function was running in (inclusive) and on top of the stack (self)
+    """
+    total = 0
+    inclusive: Counter = Counter()
+    exclusive: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        total += count
+        exclusive[frames[-1]] += count
+        for frame in set(frames):
+            inclusive[frame] += count
+    return total, inclusive, exclusive
+
+
+_profiler: Optional[SamplingProfiler] = None
+
+
+def enable(directory: str, interval: float = DEFAULT_INTERVAL) -> SamplingProfiler:
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler(directory, interval)
+        atexit.register(_profiler.stop)
+    return _profiler
+
+
+def enable_from_environment() -> Optional[SamplingProfiler]:
+    directory = os.environ.get(ENVIRONMENT_VARIABLE)
+    if not directory:
+        return None
+    return enable(directory, float(os.environ.get(INTERVAL_VARIABLE, DEFAULT_INTERVAL)))
+
+
+def turn(step: int):
+    """
+    Context manager sampling the stacks of turn `step`, does nothing unless profiling is enabled
+    """
+    return _profiler.turn_scope(step) if _profiler is not None else nullcontext()
+
+
+def game(name: Optional[str] = None):
+    return _profiler.game_scope(name) if _profiler is not None else nullcontext()
+
+
+def main() -> None:
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Merge the collapsed stacks of many games")
+    parser.add_argument("profiles", nargs="+", help="collapsed stack files or directories of them")
+    parser.add_argument("--out", default=None, help="write the merged collapsed stacks to this file")
+    parser.add_argument("--keep-ranges", action="store_true", help="keep the turn ranges as root frames")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.profiles:
+        paths += sorted(glob.glob(os.path.join(path, "*.collapsed"))) if os.path.isdir(path) else [path]
+    stacks = merge(paths, args.keep_ranges)
+    if args.out is not None:
+        write_collapsed(stacks, args.out)
+    total, inclusive, exclusive = top_functions(merge(paths))
+    print(f"{len(paths)} games, {total} samples")
+    print("   total    self  function")
+    for frame, count in inclusive.most_common(REPORT_FUNCTIONS):
+        print(f"{count / max(total, 1) * 100:7.1f}% {exclusive[frame] / max(total, 1) * 100:6.1f}%  {frame}")
+
+
+if __name__ == "__main__":
+    main()
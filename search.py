@@ -0,0 +1,211 @@
+import argparse
+import importlib
+import json
+import os
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import sampling_profile
+
+# attribute of the agent -> values to try, the defaults of the agent are always a candidate as well
+SPACES = {
+    "agent": {
+        "hard_unit_limit": [6, 8, 10, 14, 20],
+        "first_wood_turn": [29, 39, 49, 69],
+        "second_wood_turn": [99, 119, 139],
+        "coal_turn": [139, 159, 179],
+        "first_wood_divisor": [2, 3, 4],
+        "far_divisor": [2, 3],
+        "fuel_level_weight": [25, 50, 100, 200, 400],
+        "distance_weight": [25, 50, 100, 200, 400],
+        "night_penalty": [1000, 3000, 10000, 30000],
+        "hard_city_limit": [16, 24, 32, 40, 60],
+        "enemy_avoidance": [None, 0.3, 0.6],
+    },
+    "agent2": {
+        "hard_city_limit": [16, 24, 32, 40, 60],
+        "hard_unit_limit": [6, 8, 10, 14, 20],
+        "first_wood_turn": [29, 39, 49, 69],
+        "second_wood_turn": [99, 119, 139],
+        "coal_turn": [139, 159, 179],
+        "first_wood_divisor": [2, 3, 4],
+        "far_divisor": [2, 3],
+        "enemy_avoidance": [None, 0.3, 0.6],
+    },
+}
+# maps the games are played on, see `map_updates`
+MAPS = ("generated", "scattered")
+# scores of a won, tied and lost game
+WIN = 1.0
+TIE = 0.5
+LOSS = 0.0
+
+
+def make_agent(module: str, config: Dict, planner_rollouts: Optional[int] = None):
+    agent = importlib.import_module(module).Agent()
+    if planner_rollouts is not None and hasattr(agent, "planner_rollouts"):
+        agent.planner_rollouts = planner_rollouts
+    for name, value in config.items():
+        if not hasattr(agent, name):
+            raise AttributeError(f"{module}.Agent has no parameter {name}")
+        setattr(agent, name, value)
+    return agent
+
+
+def config_key(config: Dict) -> str:
+    return json.dumps(config, sort_keys=True)
+
+
+def map_updates(maps: str, size: int, seed: int) -> List[str]:
+    """
+    First updates of the map of a seed: clustered maps of `mapgen` or the scattered ones of `batch_env`
+    """
+    if maps == "generated":
+        from mapgen import generated_updates
+
+        return generated_updates(size, seed=seed)
+    from batch_env import starting_updates
+
+    return starting_updates(size, size, np.random.default_rng(seed))
+
+
+def play_game(task: Tuple[str, Dict, int, int, Optional[int], str]) -> Tuple[str, int, float, int]:
+    """
+    One game of the configuration against the default agent, the candidate plays team 0 on even seeds.
+    Returns the key of the configuration, the seed, the score of the candidate and its city tile lead.
+    """
+    from batch_env import BatchEnv, play
+
+    module, config, seed, size, planner_rollouts, maps = task
+    candidate = make_agent(module, config, planner_rollouts)
+    baseline = make_agent(module, {}, planner_rollouts)
+    team = seed % 2
+    pair = (candidate, baseline) if team == 0 else (baseline, candidate)
+    env = BatchEnv(1, size, size)
+    winner = play(env, [pair], [map_updates(maps, size, seed)])[0]
+    city_tiles = env.city_tile_count()[0]
+    score = TIE if winner < 0 else (WIN if winner == team else LOSS)
+    return config_key(config), seed, score, int(city_tiles[team] - city_tiles[1 - team])
+
+
+class ResultStore:
+    """
+    Game results appended to a JSON lines file as they come in, so an interrupted search resumes
+    without playing any finished game again
+    """
+
+    def __init__(self, path: str, module: str, size: int, maps: str = MAPS[0]) -> None:
+        self.path = path
+        self.module = module
+        self.size = size
+        self.maps = maps
+        # configuration key -> seed -> score and city tile lead
+        self.results: Dict[str, Dict[int, Tuple[float, int]]] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    # results from before the map generator were played on scattered maps
+                    if record["agent"] == module and record["size"] == size and record.get("maps", "scattered") == maps:
+                        self.results.setdefault(record["config"], {})[record["seed"]] = (record["score"], record["lead"])
+
+    def has(self, key: str, seed: int) -> bool:
+        return seed in self.results.get(key, {})
+
+    def add(self, key: str, seed: int, score: float, lead: int) -> None:
+        self.results.setdefault(key, {})[seed] = (score, lead)
+        with open(self.path, "a") as f:
+            record = {"agent": self.module, "size": self.size, "maps": self.maps, "config": key, "seed": seed, "score": score, "lead": lead}
+            f.write(json.dumps(record) + "\n")
+
+    def rating(self, key: str, seeds: int) -> Tuple[float, float]:
+        """
+        Mean score and city tile lead over the first `seeds` games
+        """
+        games = [self.results[key][seed] for seed in range(seeds)]
+        return float(np.mean([score for score, _ in games])), float(np.mean([lead for _, lead in games]))
+
+
+def sample_configs(space: Dict[str, List], count: int, rng: np.random.Generator) -> List[Dict]:
+    """
+    The default configuration and up to `count - 1` distinct random ones
+    """
+    configs = [{}]
+    keys = {config_key({})}
+    for _ in range(count * 20):
+        if len(configs) >= count:
+            break
+        config = {name: values[int(rng.integers(0, len(values)))] for name, values in space.items()}
+        key = config_key(config)
+        if key not in keys:
+            keys.add(key)
+            configs.append(config)
+    return configs
+
+
+def successive_halving(
+    module: str,
+    configs: List[Dict],
+    store: ResultStore,
+    pool,
+    games: int,
+    eta: int,
+    planner_rollouts: Optional[int],
+) -> List[Tuple[Dict, float, float, int]]:
+    """
+    Play `games` games for every configuration, keep the best `1 / eta` of them and play `eta` times as many games
+    for those, until the next round would have a single configuration. All configurations play the same seeds,
+    so they are compared on the same maps.
+    Returns the configurations of the last round with their score, city tile lead and number of games, best first.
+    """
+    alive = configs
+    while True:
+        tasks = [
+            (module, config, seed, store.size, planner_rollouts, store.maps)
+            for seed in range(games)
+            for config in alive
+            if not store.has(config_key(config), seed)
+        ]
+        for index, (key, seed, score, lead) in enumerate(pool.imap_unordered(play_game, tasks)):
+            store.add(key, seed, score, lead)
+            if (index + 1) % 10 == 0 or index + 1 == len(tasks):
+                print(f"{len(alive)} configurations, {games} games each: {index + 1}/{len(tasks)} played", flush=True)
+        ranked = sorted(alive, key=lambda config: store.rating(config_key(config), games), reverse=True)
+        if len(ranked) // eta <= 1:
+            break
+        alive = ranked[: len(ranked) // eta]
+        games *= eta
+    return [(config, *store.rating(config_key(config), games), games) for config in ranked]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search the parameters of an agent with successive halving in parallel self-play")
+    parser.add_argument("--agent", default="agent", choices=list(SPACES), help="module of the agent to tune")
+    parser.add_argument("--configs", type=int, default=64, help="number of configurations in the first round")
+    parser.add_argument("--games", type=int, default=2, help="games per configuration in the first round")
+    parser.add_argument("--eta", type=int, default=2, help="keep 1 / eta of the configurations per round")
+    parser.add_argument("--size", type=int, default=16, help="map size")
+    parser.add_argument("--maps", default=MAPS[0], choices=MAPS, help="clustered generated maps or scattered resources")
+    parser.add_argument(
+        "--planner-rollouts", type=int, default=None, help="planner rollouts per worker of all agents, a fixed budget keeps the games reproducible"
+    )
+    parser.add_argument("--store", default="search.jsonl", help="results of all games, an existing file is resumed")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the sampled configurations")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of processes")
+    args = parser.parse_args()
+
+    configs = sample_configs(SPACES[args.agent], args.configs, np.random.default_rng(args.seed))
+    store = ResultStore(args.store, args.agent, args.size, args.maps)
+    # every worker starts its profiler once, with LUX_SAMPLE_PROFILE set
+    with Pool(args.workers, initializer=sampling_profile.enable_from_environment) as pool:
+        ranked = successive_halving(args.agent, configs, store, pool, args.games, args.eta, args.planner_rollouts)
+    for config, score, lead, games in ranked:
+        print(f"score {score:.3f} lead {lead:+.2f} over {games} games: {config_key(config)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import math
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from lux.constants import Constants
+from lux.game import Game
+from lux.game_constants import GAME_CONSTANTS
+from lux.game_objects import Unit
+
+RESEARCH_REQUIREMENTS = GAME_CONSTANTS["PARAMETERS"]["RESEARCH_REQUIREMENTS"]
+
+# resource type codes of the resource plane, 0 means no resource
+RESOURCE_NAMES = ["", Constants.RESOURCE_TYPES.WOOD, Constants.RESOURCE_TYPES.COAL, Constants.RESOURCE_TYPES.URANIUM]
+RESOURCE_CODES = {name: code for code, name in enumerate(RESOURCE_NAMES) if name}
+# rows of the unit table of a layout unless the game needs more
+MAX_UNITS = 512
+
+# header entries
+VERSION = 0
+TURN = 1
+WIDTH = 2
+HEIGHT = 3
+UNIT_COUNT = 4
+CITY_COUNT = 5
+CITY_TILE_COUNT = 6
+RESEARCH_POINTS = 7  # one entry per team
+HEADER_SIZE = 9
+
+# columns of the unit table, ids are the number of `u_<number>`
+UNIT_ID, UNIT_TEAM, UNIT_TYPE, UNIT_X, UNIT_Y, UNIT_COOLDOWN, UNIT_WOOD, UNIT_COAL, UNIT_URANIUM = range(9)
+UNIT_COLUMNS = 9
+# columns of the city table, ids are the number of `c_<number>`
+CITY_ID, CITY_TEAM, CITY_FUEL, CITY_UPKEEP = range(4)
+CITY_COLUMNS = 4
+# columns of the city tile table, tiles of a city follow each other in the order of the city table
+CITY_TILE_CITY, CITY_TILE_X, CITY_TILE_Y, CITY_TILE_COOLDOWN = range(4)
+CITY_TILE_COLUMNS = 4
+
+
+class GameArrays:
+    """
+    Views of the arrays of one game state in a flat buffer. Maps are indexed [y, x], the tables have a row per
+    unit, city and city tile in the order of the players (team 0 first), the rest of their rows is unused.
+    """
+
+    def __init__(self, layout: "StateLayout", buffer) -> None:
+        self.layout = layout
+        for name, (offset, dtype, shape) in layout.sections.items():
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset))
+
+    @property
+    def version(self) -> int:
+        return int(self.header[VERSION])
+
+    @property
+    def turn(self) -> int:
+        return int(self.header[TURN])
+
+    def research_points(self, team: int) -> int:
+        return int(self.header[RESEARCH_POINTS + team])
+
+    def researched(self, team: int) -> np.ndarray:
+        """
+        For every resource code whether `team` can mine it
+        """
+        points = self.research_points(team)
+        return np.array([False, True, points >= RESEARCH_REQUIREMENTS["COAL"], points >= RESEARCH_REQUIREMENTS["URANIUM"]])
+
+    def unit_rows(self) -> np.ndarray:
+        return self.units[: self.header[UNIT_COUNT]]
+
+    def city_rows(self) -> np.ndarray:
+        return self.cities[: self.header[CITY_COUNT]]
+
+    def city_tile_rows(self) -> np.ndarray:
+        return self.city_tiles[: self.header[CITY_TILE_COUNT]]
+
+    def unit(self, row: int) -> Unit:
+        """
+        A `Unit` of the row of the unit table, for code written against the game objects
+        """
+        unit_id, team, unit_type, x, y, cooldown, wood, coal, uranium = self.units[row].tolist()
+        return Unit(int(team), int(unit_type), f"u_{int(unit_id)}", int(x), int(y), cooldown, int(wood), int(coal), int(uranium))
+
+
+class StateLayout:
+    """
+    Offsets of the arrays of a game state of a map size in one flat buffer, the same for the writer and all readers
+    """
+
+    def __init__(self, width: int, height: int, max_units: int = MAX_UNITS) -> None:
+        self.width = width
+        self.height = height
+        self.max_units = max_units
+        tiles = width * height
+        self.sections: Dict[str, Tuple[int, np.dtype, Tuple[int, ...]]] = {}
+        offset = 0
+        for name, dtype, shape in [
+            ("header", np.int64, (HEADER_SIZE,)),
+            ("resource_type", np.int8, (height, width)),
+            ("resource_amount", np.int32, (height, width)),
+            ("road", np.float32, (height, width)),
+            ("city_tile_team", np.int8, (height, width)),
+            ("units", np.float64, (max_units, UNIT_COLUMNS)),
+            ("cities", np.float64, (tiles, CITY_COLUMNS)),
+            ("city_tiles", np.float64, (tiles, CITY_TILE_COLUMNS)),
+        ]:
+            dtype = np.dtype(dtype)
+            self.sections[name] = (offset, dtype, shape)
+            # every section starts 8 byte aligned
+            offset += (dtype.itemsize * math.prod(shape) + 7) // 8 * 8
+        self.size = offset
+
+    def key(self) -> Tuple[int, int, int]:
+        return self.width, self.height, self.max_units
+
+    def views(self, buffer) -> GameArrays:
+        return GameArrays(self, buffer)
+
+    def allocate(self) -> GameArrays:
+        """
+        Arrays in a private buffer, for a single process
+        """
+        return self.views(bytearray(self.size))
+
+
+def unit_count(game_state: Game) -> int:
+    return sum(len(player.units) for player in game_state.players)
+
+
+def encode(game_state: Game, arrays: GameArrays) -> GameArrays:
+    """
+    Write the state of `game_state` into `arrays`, the version entry is left to the caller. Raises `ValueError` when
+    the game has more units than the unit table has rows.
+    """
+    count = unit_count(game_state)
+    if count > arrays.layout.max_units:
+        raise ValueError(f"Game has {count} units, the layout only has rows for {arrays.layout.max_units}")
+    game_map = game_state.map
+    arrays.resource_type[:] = 0
+    arrays.resource_amount[:] = 0
+    arrays.city_tile_team[:] = -1
+    for y in range(game_map.height):
+        for x in range(game_map.width):
+            cell = game_map.get_cell(x, y)
+            if cell.has_resource():
+                arrays.resource_type[y, x] = RESOURCE_CODES[cell.resource.type]
+                arrays.resource_amount[y, x] = cell.resource.amount
+            arrays.road[y, x] = cell.road
+    units = 0
+    cities = 0
+    city_tiles = 0
+    for player in game_state.players:
+        arrays.header[RESEARCH_POINTS + player.team] = player.research_points
+        player_units = player.units
+        count = len(player_units)
+        if count > 0:
+            columns = player_units.columns()
+            table = arrays.units[units : units + count]
+            table[:, UNIT_ID] = [int(player_units.table.ids[row][2:]) for row in player_units.rows]
+            for column, name in (
+                (UNIT_TEAM, "team"), (UNIT_TYPE, "type"), (UNIT_X, "x"), (UNIT_Y, "y"), (UNIT_COOLDOWN, "cooldown"),
+                (UNIT_WOOD, "wood"), (UNIT_COAL, "coal"), (UNIT_URANIUM, "uranium"),
+            ):
+                table[:, column] = columns[name]
+            units += count
+        for city in player.cities.values():
+            arrays.cities[cities] = (int(city.cityid[2:]), city.team, city.fuel, city.get_light_upkeep())
+            for city_tile in city.citytiles:
+                arrays.city_tiles[city_tiles] = (cities, city_tile.pos.x, city_tile.pos.y, city_tile.cooldown)
+                arrays.city_tile_team[city_tile.pos.y, city_tile.pos.x] = city.team
+                city_tiles += 1
+            cities += 1
+    arrays.header[TURN] = game_state.turn
+    arrays.header[WIDTH] = game_map.width
+    arrays.header[HEIGHT] = game_map.height
+    arrays.header[UNIT_COUNT] = units
+    arrays.header[CITY_COUNT] = cities
+    arrays.header[CITY_TILE_COUNT] = city_tiles
+    return arrays
+
+
+def to_arrays(game_state: Game) -> GameArrays:
+    layout = StateLayout(game_state.map_width, game_state.map_height, max(MAX_UNITS, unit_count(game_state)))
+    return encode(game_state, layout.allocate())
+
+
+class SharedGameState:
+    """
+    The game state of a map size in one block of shared memory. The owner `publish`es a state once per turn, worker
+    processes `attach` the block by its handle and read it in place, nothing is pickled but the handle.
+    """
+
+    def __init__(self, width: int, height: int, max_units: int = MAX_UNITS) -> None:
+        self.layout = StateLayout(width, height, max_units)
+        self.memory = shared_memory.SharedMemory(create=True, size=self.layout.size)
+        self.arrays: Optional[GameArrays] = self.layout.views(self.memory.buf)
+        self.version = 0
+
+    @property
+    def handle(self) -> Tuple[str, Tuple[int, int, int]]:
+        return self.memory.name, self.layout.key()
+
+    def fits(self, game_state: Game) -> bool:
+        """
+        Whether `game_state` has the map size of the layout and no more units than the unit table has rows
+        """
+        layout = self.layout
+        return (layout.width, layout.height) == (game_state.map_width, game_state.map_height) and unit_count(
+            game_state
+        ) <= layout.max_units
+
+    def publish(self, game_state: Game) -> int:
+        """
+        Write the state for the readers and return its version. Readers must be done with the previous version,
+        the game must `fit` the layout.
+        """
+        self.version += 1
+        encode(game_state, self.arrays)
+        self.arrays.header[VERSION] = self.version
+        return self.version
+
+    def close(self) -> None:
+        if self.arrays is None:
+            return
+        # the views have to be gone before the memory can be closed
+        self.arrays = None
+        self.memory.close()
+        self.memory.unlink()
+
+
+# shared memory name -> memory and views attached by this process
+_attached: Dict[str, Tuple[shared_memory.SharedMemory, GameArrays]] = {}
+
+
+def attach(handle: Tuple[str, Tuple[int, int, int]]) -> GameArrays:
+    """
+    Views of a `SharedGameState` published by another process, the block stays attached for later turns
+    """
+    name, key = handle
+    if name not in _attached:
+        memory = shared_memory.SharedMemory(name=name)
+        _attached[name] = (memory, StateLayout(*key).views(memory.buf))
+    return _attached[name][1]
@@ -0,0 +1,128 @@
+import os
+
+# set to 1 to skip the pause before the first turn, used by the startup optimized submission
+ENVIRONMENT_VARIABLE = "LUX_FAST_START"
+FAST_START = os.environ.get(ENVIRONMENT_VARIABLE) == "1"
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CONSTANTS_JSON = os.path.join(ROOT, "lux", "game_constants.json")
+CONSTANTS_MODULE = os.path.join(ROOT, "lux", "game_constants.py")
+CONSTANTS_HEADER = """# the contents of game_constants.json as a python literal, so importing needs no file access or json parsing.
+# regenerate with `python startup.py --constants` after changing the json file
+"""
+
+
+def constants_source() -> str:
+    """
+    Source of `lux/game_constants.py` generated from `lux/game_constants.json`
+    """
+    import json
+
+    with open(CONSTANTS_JSON) as f:
+        constants = json.load(f)
+    return CONSTANTS_HEADER + "GAME_CONSTANTS = " + json.dumps(constants, indent=4) + "\n"
+
+
+def constants_up_to_date() -> bool:
+    import json
+
+    from lux.game_constants import GAME_CONSTANTS
+
+    with open(CONSTANTS_JSON) as f:
+        return json.load(f) == GAME_CONSTANTS
+
+
+def import_times(module: str = "main"):
+    """
+    Import `module` in a fresh interpreter with `-X importtime`,
+    returns the total time and the (cumulative seconds, name) of every module imported directly by it
+    """
+    import subprocess
+    import sys
+
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    total = 0.0
+    children = []
+    pending = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        # children are printed before their parent, so collect them until the parent shows up
+        if depth == 0:
+            if name.strip() == module:
+                total = int(cumulative) / 1e6
+                children = pending
+            pending = []
+        elif depth == 1:
+            pending.append((int(cumulative) / 1e6, name.strip()))
+    return total, sorted(children, reverse=True)
+
+
+def first_action_time(main: str = "main.py", size: int = 12) -> float:
+    """
+    Start `main` like the engine does, send the first turn and return the seconds until its actions arrive
+    """
+    import subprocess
+    import sys
+    import time
+
+    import numpy as np
+
+    from batch_env import BatchEnv, starting_updates
+
+    env = BatchEnv(1, size, size)
+    env.reset([starting_updates(size, size, np.random.default_rng(0))])
+    first_turn = "\n".join(env.updates(0, 0)) + "\n"
+    environment = dict(os.environ, **{ENVIRONMENT_VARIABLE: "1"})
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, main],
+        cwd=os.path.dirname(os.path.abspath(main)),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        env=environment,
+    )
+    process.stdin.write(first_turn)
+    process.stdin.flush()
+    while process.stdout.readline().strip() != "D_FINISH":
+        pass
+    elapsed = time.perf_counter() - start
+    process.kill()
+    process.wait()
+    return elapsed
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure the startup of the agents")
+    parser.add_argument("--constants", action="store_true", help="regenerate lux/game_constants.py from the json file")
+    parser.add_argument("--main", default="main.py", help="driver to measure the first action of")
+    parser.add_argument("--top", type=int, default=8, help="number of imports to list")
+    args = parser.parse_args()
+
+    if args.constants:
+        with open(CONSTANTS_MODULE, "w") as f:
+            f.write(constants_source())
+    if not constants_up_to_date():
+        print("lux/game_constants.py is out of date, run with --constants")
+
+    module = os.path.splitext(os.path.basename(args.main))[0]
+    total, children = import_times(module)
+    print(f"import {module}: {total * 1000:.1f}ms")
+    for cumulative, name in children[: args.top]:
+        print(f"  {cumulative * 1000:8.1f}ms  {name}")
+    print(f"first action of {args.main}: {first_action_time(args.main) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import math
+import os
+from contextlib import nullcontext
+from typing import List, Optional
+
+from actions import ActionBuffer
+from classes import GameBoard, Pawn, Tile
+from debug_log import DebugLog
+from enemy_tracker import EnemyTracker
+from lux import annotate
+from lux.constants import Constants
+from lux.game import Game
+from lux.game_constants import GAME_CONSTANTS
+from lux.game_map import RESOURCE_TYPES, Position, Resource
+from lux.game_objects import Player
+from tables import DIRECTION_DELTAS, ROTATED_DIRECTION
+from world import World, has_access_to_resource, update_game_state
+
+DIRECTIONS = Constants.DIRECTIONS
+WORKER_CAPACITY = GAME_CONSTANTS["PARAMETERS"]["RESOURCE_CAPACITY"]["WORKER"]
+
+# only imported when memory profiling is enabled (see main.py), the phases are no-ops otherwise
+memory_profile = None
+if os.environ.get("LUX_MEMORY_PROFILE"):
+    import memory_profile
+
+
+def profile_phase(name: str):
+    return memory_profile.phase(name) if memory_profile is not None else nullcontext()
+
+
+def rotate_dir(direction: DIRECTIONS) -> DIRECTIONS:
+    return ROTATED_DIRECTION.get(direction, DIRECTIONS.CENTER)
+
+
+def update_move(pawn: Pawn, tile: Tile) -> None:
+    """
+    Update the `next_move` property of the pawn. Needed for collision checks
+    """
+    end_position = Position.translate(pawn.pos, pawn.pos.direction_to(tile.pos), 1)
+    pawn.next_move = end_position
+
+
+class Strategy:
+    """
+    Holds the state of one game, `step` is called with the observation of every turn.
+    Call `reset` (or pass the first observation of a new game) to play another game with the same object.
+
+    Subclasses implement `decide`, which returns the actions of one turn from the shared `World` of that turn.
+    Several strategies can `play` the same world, call `World.reset_moves` in between.
+    """
+
+    # `can_move_to` claims the tile it checked, otherwise only the moves that are made claim their tile
+    claim_on_check = False
+    # set by every strategy, so each writes its own log file
+    log: DebugLog
+    # turns in which the first pawn heads to far away wood, to far away wood again and to coal
+    first_wood_turn = 39
+    second_wood_turn = 119
+    coal_turn = 159
+    # the explorer only heads to resource tiles further away than the map width divided by these
+    first_wood_divisor = 3
+    far_divisor = 2
+    # moves onto tiles where at least this many enemy units are expected next turn are refused, None ignores them
+    enemy_avoidance: Optional[float] = None
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.game_state: Optional[Game] = None
+        self.world: Optional[World] = None
+        self.actions = ActionBuffer()
+        self.move_count = 0
+        self.wood_position: Optional[Position] = None
+        self.coal_position: Optional[Position] = None
+        # updates of the first turn, `map_analysis` is made from them when it is first read
+        self.first_updates: Optional[List[str]] = None
+        self._map_analysis = None
+        # set once the starting worker stops following the opening, it never resumes it
+        self.opening_over = False
+        self.enemy_tracker = EnemyTracker()
+
+    @property
+    def gameboard(self) -> GameBoard:
+        return self.world.gameboard
+
+    @property
+    def map_analysis(self):
+        """
+        Analysis of the starting map (`map_cache.MapAnalysis`) from the cache of this process, None before the first turn
+        """
+        if self._map_analysis is None and self.first_updates is not None:
+            from map_cache import default_cache
+
+            self._map_analysis = default_cache().analysis(self.first_updates)
+        return self._map_analysis
+
+    def step(self, observation) -> List[str]:
+        if observation["step"] == 0 and self.move_count > 0:
+            # a new game in the same process
+            self.reset()
+
+        ### Do not edit ###
+        with profile_phase("update"):
+            self.game_state = update_game_state(self.game_state, observation)
+
+        with profile_phase("gameboard"):
+            if observation["step"] == 0:
+                self.first_updates = observation["updates"]
+            if self.enemy_avoidance is not None:
+                # every turn, the predictions need the moves of the turns before
+                self.enemy_tracker.update(self.game_state, (observation.player + 1) % 2)
+            world = World(self.game_state, observation.player, self.move_count)
+
+        with profile_phase("decisions"):
+            actions = self.play(world)
+
+        self.move_count += 1
+        return actions
+
+    def play(self, world: World) -> List[str]:
+        """
+        Actions of this strategy for the turn of `world`
+        """
+        self.world = world
+        self.actions = ActionBuffer()
+        self.decide(world)
+        return self.actions.serialize(world.game_state, world.player_id)
+
+    def decide(self, world: World) -> None:
+        raise NotImplementedError
+
+    def can_move_to(self, own_pawn: Pawn, direction: DIRECTIONS) -> bool:
+        """
+        Check if the unit `ownUnit` can move in direction `dir` 1 step.
+        """
+
+        if direction == DIRECTIONS.CENTER:  # can always stay put
+            return True
+        end_position = Position.translate(own_pawn.pos, direction, 1)
+        tile = self.gameboard.get_tile_by_pos(end_position)
+        own_city = tile.has_city() and tile.team == own_pawn.team
+        if tile.has_city() and not own_city:
+            return False
+        # units can only share own city tiles
+        if self.gameboard.planned.is_occupied(end_position.x, end_position.y) and not own_city:
+            return False
+        if (
+            self.enemy_avoidance is not None
+            and not own_city
+            and self.enemy_tracker.turn == self.world.game_state.turn
+            and self.enemy_tracker.occupancy()[end_position.y, end_position.x] >= self.enemy_avoidance
+        ):
+            return False
+        self.actions.annotate_move(
+            own_pawn.unit, direction, annotate.line(own_pawn.pos.x, own_pawn.pos.y, end_position.x, end_position.y)
+        )
+        if self.claim_on_check:
+            own_pawn.next_move = end_position
+        return True
+
+    def commit_move(self, pawn: Pawn, tile: Tile) -> None:
+        """
+        Move the pawn one step towards `tile`
+        """
+        if not self.claim_on_check:
+            update_move(pawn, tile)
+        self.actions.move(pawn.unit, pawn.pos.direction_to(tile.pos))
+
+    def move_to_position(self, pawn: Pawn, position: Position, excludeDir: List[DIRECTIONS] = None) -> Optional[Tile]:
+        if excludeDir is None:
+            excludeDir = []
+        if self.can_move_to(pawn, pawn.pos.direction_to(position)):
+            return self.gameboard.get_tile_by_pos(pawn.pos.translate(pawn.pos.direction_to(position), 1))
+        else:
+            direction = pawn.pos.direction_to(position)
+            if self.world.in_range_pos(pawn.pos.translate(rotate_dir(direction), 1)):
+                return self.gameboard.get_tile_by_pos(pawn.pos.translate(rotate_dir(direction), 1))
+        return None
+
+    def opening_tile(self, pawn: Pawn) -> Optional[Tile]:
+        """
+        Next tile of the starting worker on its path to the closest wood, planned once per map by `map_analysis`.
+        The opening is over for good once the worker carries anything, left the path or is blocked, or the team
+        has more than one unit.
+        """
+        if self.opening_over:
+            return None
+        analysis = self.map_analysis
+        plan = analysis.opening.get(pawn.team) if analysis is not None else None
+        if plan is not None and len(self.gameboard.own_pawns) == 1 and pawn.get_cargo_space_left() == WORKER_CAPACITY:
+            x, y = plan["start"]
+            for direction in plan["moves"]:
+                if (x, y) == (pawn.pos.x, pawn.pos.y):
+                    if self.can_move_to(pawn, direction):
+                        return self.gameboard.get_tile_by_pos(pawn.pos.translate(direction, 1))
+                    break
+                dx, dy = DIRECTION_DELTAS[direction]
+                x, y = x + dx, y + dy
+        self.opening_over = True
+        return None
+
+    def exploration_weight(self, tile: Tile) -> float:
+        """
+        Factor for the distance to a resource tile the explorer might head to
+        """
+        return 1
+
+    def find_tile(self, pawn: Pawn, radius: int, resource_type: RESOURCE_TYPES) -> Optional[Position]:
+        closest_dist = math.inf
+        closest_resource_tile = None
+        for resource_tile in self.gameboard.resource_tiles:
+            if resource_tile.resource.type != resource_type:
+                continue
+            dist = resource_tile.pos.distance_to(pawn.pos)
+            weighted_dist = dist * self.exploration_weight(resource_tile)
+            if weighted_dist < closest_dist and dist > radius:
+                closest_dist = weighted_dist
+                closest_resource_tile = resource_tile
+        return closest_resource_tile.pos if closest_resource_tile is not None else None
+
+    def find_wood_tile(self, pawn: Pawn, radius: int):
+        self.wood_position = self.find_tile(pawn, radius, Constants.RESOURCE_TYPES.WOOD)
+
+    def find_coal_tile(self, pawn: Pawn, radius: int):
+        self.coal_position = self.find_tile(pawn, radius, Constants.RESOURCE_TYPES.COAL)
+
+    def exploring(self) -> bool:
+        """Check if the first pawn is on its way to a far away resource tile"""
+        return self.wood_position is not None or self.coal_position is not None
+
+    def start_exploring(self, player: Player, explorer: Pawn) -> None:
+        """
+        Send the first pawn to far away wood after the first and the third day, and to coal once it is researched
+        """
+        if self.move_count == self.first_wood_turn and len(self.gameboard.own_pawns) >= 2:
+            self.find_wood_tile(explorer, self.gameboard.width // self.first_wood_divisor)
+            self.log.info(f"Unit {explorer.pawn_id} moving to position {self.wood_position.x} {self.wood_position.y}")
+        elif self.move_count == self.second_wood_turn and len(self.gameboard.own_pawns) >= 2 and self.wood_position is not None:
+            self.find_wood_tile(explorer, self.gameboard.width // self.far_divisor)
+            self.log.info(f"Unit {explorer.pawn_id} moving to position {self.wood_position.x} {self.wood_position.y}")
+        elif (
+            self.move_count == self.coal_turn
+            and len(self.gameboard.own_pawns) >= 2
+            and has_access_to_resource(Resource(Constants.RESOURCE_TYPES.COAL, 1), player)
+        ):
+            self.find_coal_tile(explorer, self.gameboard.width // self.far_divisor)
+            self.log.info(f"Unit {explorer.pawn_id} moving to position {self.coal_position.x} {self.coal_position.y}")
+
+    def explore(self, pawn: Pawn) -> None:
+        """
+        Move the first pawn towards the wood or coal tile it is exploring
+        """
+        if self.wood_position is not None:
+            wood_tile = self.move_to_position(pawn, self.wood_position)
+            if wood_tile is not None:
+                self.commit_move(pawn, wood_tile)
+                if self.wood_position.distance_to(pawn.pos) <= 1:
+                    self.wood_position = None
+            else:
+                self.log.info(f"Unit {pawn.pawn_id} tried to move to wood tile, in move {self.move_count}, but couldnt!")
+        elif self.coal_position is not None:
+            coal_tile = self.move_to_position(pawn, self.coal_position)
+            if coal_tile is not None:
+                self.commit_move(pawn, coal_tile)
+                if self.coal_position.distance_to(pawn.pos) <= 1:
+                    self.coal_position = None
+            else:
+                self.log.info(f"Unit {pawn.pawn_id} tried to move to coal tile, in move {self.move_count}, but couldnt!")
+
+    def reaches_in_time(self, tile: Tile, distance: int) -> bool:
+        """
+        Whether the resource tile still has resources when a pawn `distance` tiles away gets there
+        """
+        return True
+
+    def find_closest_resource_tile(self, player: Player, pawn: Pawn, exclude_dir: List[DIRECTIONS] = None) -> Optional[Tile]:
+        # TODO check if it can reach resource tile
+        if exclude_dir is None:
+            exclude_dir = []
+        closest_dist = math.inf
+        closest_resource_tile = None
+        for resource_tile in self.gameboard.resource_tiles:
+            if not has_access_to_resource(resource_tile.resource, player):
+                continue
+            dist = resource_tile.pos.distance_to(pawn.pos)
+            if not self.reaches_in_time(resource_tile, dist):
+                continue
+            if dist < closest_dist and pawn.pos.direction_to(resource_tile.pos) not in exclude_dir:
+                closest_dist = dist
+                closest_resource_tile = resource_tile
+        if closest_resource_tile is not None and self.can_move_to(pawn, pawn.pos.direction_to(closest_resource_tile.pos)):
+            return closest_resource_tile
+        elif closest_resource_tile is not None:
+            return self.find_closest_resource_tile(
+                player, pawn, [*exclude_dir, pawn.pos.direction_to(closest_resource_tile.pos)]
+            )
+        return None
+
+    def build_workers(self, player: Player, unit_limit: int, research_done: bool) -> None:
+        """
+        Build a worker on every city tile that can act while there are more city tiles than units, research otherwise
+        """
+        cart_count = int((~player.units.is_worker()).sum())
+        worker_count = len(player.units) - cart_count
+        for _, city in player.cities.items():
+            for tile in city.citytiles:
+                if tile.can_act() and player.city_tile_count > cart_count + worker_count and worker_count < unit_limit:
+                    self.actions.build_worker(tile)
+                    worker_count += 1
+                elif tile.can_act() and not research_done:
+                    self.actions.research(tile)
@@ -0,0 +1,63 @@
+from typing import Dict, Tuple
+
+from lux.constants import Constants
+from lux.game_constants import GAME_CONSTANTS
+
+PARAMETERS = GAME_CONSTANTS["PARAMETERS"]
+DIRECTIONS = Constants.DIRECTIONS
+
+DAY_LENGTH = PARAMETERS["DAY_LENGTH"]
+CYCLE_LENGTH = PARAMETERS["DAY_LENGTH"] + PARAMETERS["NIGHT_LENGTH"]
+MAX_DAYS = PARAMETERS["MAX_DAYS"]
+
+
+def day_night_schedule() -> Tuple[Tuple[bool, ...], Tuple[int, ...]]:
+    """
+    Whether every turn up to and including `MAX_DAYS` is a night turn,
+    and the number of night turns before every turn
+    """
+    is_night = tuple(turn % CYCLE_LENGTH >= DAY_LENGTH for turn in range(MAX_DAYS + 1))
+    nights_before = [0]
+    for turn in range(MAX_DAYS):
+        nights_before.append(nights_before[-1] + is_night[turn])
+    return is_night, tuple(nights_before)
+
+
+IS_NIGHT, NIGHTS_BEFORE = day_night_schedule()
+# clockwise rotation, used to step around blocked tiles
+ROTATED_DIRECTION: Dict[str, str] = {
+    DIRECTIONS.EAST: DIRECTIONS.SOUTH,
+    DIRECTIONS.SOUTH: DIRECTIONS.WEST,
+    DIRECTIONS.WEST: DIRECTIONS.NORTH,
+    DIRECTIONS.NORTH: DIRECTIONS.EAST,
+    DIRECTIONS.CENTER: DIRECTIONS.CENTER,
+}
+DIRECTION_DELTAS: Dict[str, Tuple[int, int]] = {
+    DIRECTIONS.NORTH: (0, -1),
+    DIRECTIONS.EAST: (1, 0),
+    DIRECTIONS.SOUTH: (0, 1),
+    DIRECTIONS.WEST: (-1, 0),
+    DIRECTIONS.CENTER: (0, 0),
+}
+FROZEN_NAMES = ["MAX_DAYS", "IS_NIGHT", "NIGHTS_BEFORE", "ROTATED_DIRECTION", "DIRECTION_DELTAS"]
+
+
+def night_turns_between(start: int, end: int) -> int:
+    """
+    Number of night turns in [start, end), turns after the end of the game are not counted
+    """
+    start = min(max(start, 0), MAX_DAYS)
+    end = min(max(end, start), MAX_DAYS)
+    return NIGHTS_BEFORE[end] - NIGHTS_BEFORE[start]
+
+
+def frozen_source() -> str:
+    """
+    Source of this module with every table written out as a literal, the bundle ships it instead of this file
+    """
+    import inspect
+
+    lines = ["# generated by bundle.py from tables.py, do not edit", ""]
+    lines += [f"{name} = {globals()[name]!r}" for name in FROZEN_NAMES]
+    lines += ["", "", inspect.getsource(night_turns_between)]
+    return "\n".join(lines)
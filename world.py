@@ -0,0 +1,210 @@
+import math
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
+
+from classes import GameBoard, Observation, Tile
+from lux.constants import Constants
+from lux.game import Game
+from lux.game_map import Position, Resource
+from lux.game_constants import GAME_CONSTANTS
+from lux.game_objects import City, CityTile, Player
+from tables import IS_NIGHT
+
+DIRECTIONS = Constants.DIRECTIONS
+NIGHT_LENGTH = GAME_CONSTANTS["PARAMETERS"]["NIGHT_LENGTH"]
+# turns the resources are forecast ahead for `World.resource_depletion`
+FORECAST_TURNS = 30
+
+
+def has_access_to_resource(resource: Resource, player: Player) -> bool:
+    if resource.type == Constants.RESOURCE_TYPES.COAL and not player.researched_coal():
+        return False
+    if resource.type == Constants.RESOURCE_TYPES.URANIUM and not player.researched_uranium():
+        return False
+    return True
+
+
+def relu(value: int):
+    return 0 if value < 0 else value
+
+
+def update_game_state(game_state: Optional[Game], observation) -> Game:
+    """
+    Parse the updates of this turn into `game_state`, a new game is started on the first turn
+    """
+    if observation["step"] == 0:
+        game_state = Game()
+        game_state._initialize(observation["updates"])
+        game_state._update(observation["updates"][2:])
+        game_state.id = observation.player
+    else:
+        game_state._update(observation["updates"])
+    return game_state
+
+
+class CityMetrics:
+    """
+    Fuel and upkeep of one own city for the turn
+    """
+
+    def __init__(self, city: City, night_moves_left: int) -> None:
+        self.city_id = city.cityid
+        self.fuel = city.fuel
+        self.upkeep = city.get_light_upkeep()
+        self.tile_count = len(city.citytiles)
+        self.tile_positions = [(city_tile.pos.x, city_tile.pos.y) for city_tile in city.citytiles]
+        # upkeep of all nights left in the game
+        self.upkeep_left = self.upkeep * night_moves_left
+        # fuel left at the end of the game, negative when the city goes dark before
+        self.surplus = self.fuel - self.upkeep_left
+        self.enough_fuel = self.upkeep_left < self.fuel
+        # night turns the city survives on its fuel
+        self.nights_of_survival = int(self.fuel // self.upkeep)
+        # less fuel than one night needs
+        self.short_for_night = self.upkeep * NIGHT_LENGTH > self.fuel
+        # fuel in hundreds of night turns, the targets of deliveries are weighted with it
+        self.fuel_weight = self.fuel / (100 * self.upkeep)
+
+
+class World:
+    """
+    Facts about one turn derived from the game state. Everything beyond the game board is computed
+    the first time a strategy asks for it and then reused, by all strategies that play this turn.
+    """
+
+    def __init__(self, game_state: Game, player_id: int, move_count: int) -> None:
+        self.game_state = game_state
+        self.player_id = player_id
+        self.move_count = move_count
+        self.player = game_state.players[player_id]
+        self.gameboard = GameBoard(game_state, Observation(player_id))
+        self._fuel_windows: Dict[Tuple[int, int], Tuple[float, float, float, float, float]] = {}
+
+    def reset_moves(self) -> None:
+        """
+        Forget the moves a strategy planned, so the next strategy starts from the same board
+        """
+        for pawn in self.gameboard.pawns:
+            pawn.next_move = Position(pawn.pos.x, pawn.pos.y)
+
+    def in_range(self, x: int, y: int):
+        return x >= 0 and y >= 0 and x < self.gameboard.width and y < self.gameboard.height
+
+    def in_range_pos(self, pos: Position):
+        return self.in_range(pos.x, pos.y)
+
+    @cached_property
+    def is_night(self) -> bool:
+        return IS_NIGHT[self.move_count]
+
+    @cached_property
+    def night_moves_left(self) -> int:
+        # TODO not quite right
+        return relu((360 - self.move_count) % 40 - 30) + ((360 - self.move_count) // 40) * 10
+
+    @cached_property
+    def city_metrics(self) -> Dict[str, CityMetrics]:
+        """
+        `CityMetrics` of every own city by city id
+        """
+        return {city_id: CityMetrics(city, self.night_moves_left) for city_id, city in self.gameboard.own_cities.items()}
+
+    def too_much_fuel(self, city_tile: CityTile) -> bool:
+        """Check if city has enough fuel for the rest of the game"""
+        return self.city_metrics[city_tile.cityid].enough_fuel
+
+    @cached_property
+    def empty_tiles(self) -> List[Tile]:
+        return [tile for tile in self.gameboard.tiles if not tile.has_resource() and not tile.has_city()]
+
+    @cached_property
+    def refuel_city_tiles(self) -> List[Tile]:
+        """
+        Own city tiles whose city does not have enough fuel for the rest of the game yet
+        """
+        return [tile for tile in self.gameboard.own_city_tiles if not self.too_much_fuel(tile.citytile)]
+
+    def neighbouring_city(self, tile: Tile, team: int) -> bool:
+        for x in [tile.pos.x - 1, tile.pos.x + 1]:
+            for y in [tile.pos.y - 1, tile.pos.y + 1]:
+                if self.in_range(x, y) and self.gameboard.get_tile(x, y).has_own_city(team):
+                    return True
+        return False
+
+    def neighbouring_resource(self, tile: Tile) -> bool:
+        for x in [tile.pos.x - 1, tile.pos.x + 1]:
+            for y in [tile.pos.y - 1, tile.pos.y + 1]:
+                if self.in_range(x, y) and self.gameboard.get_tile(x, y).has_resource():
+                    return True
+        return False
+
+    def fuel_window(self, pos: Position) -> Tuple[float, float, float, float, float]:
+        """
+        Sums over the square of radius width // 4 around `pos`: city fuel, city upkeep weighted by
+        closeness, accessible resources, all resources and the upkeep of the cities for the rest of the game
+        """
+        key = (pos.x, pos.y)
+        if key not in self._fuel_windows:
+            radius = self.gameboard.width // 4
+            city_fuel = 0
+            near_upkeep = 0
+            accessible_resources = 0
+            all_resources = 0
+            upkeep_left = 0
+            for x in range(pos.x - radius, pos.x + radius + 1):
+                for y in range(pos.y - radius, pos.y + radius + 1):
+                    if not self.in_range(x, y):
+                        continue
+                    tile = self.gameboard.get_tile(x, y)
+                    if tile.has_resource():
+                        if has_access_to_resource(tile.resource, self.player):
+                            accessible_resources += tile.resource.amount
+                        all_resources += tile.resource.amount
+                    if tile.has_city():
+                        city = self.city_metrics.get(tile.citytile.cityid)
+                        if city is not None:
+                            near_upkeep += city.upkeep * 5 / (1 + pos.distance_to(Position(x, y)))
+                            city_fuel += city.fuel
+                            upkeep_left += city.upkeep_left
+            self._fuel_windows[key] = (city_fuel, near_upkeep, accessible_resources, all_resources, upkeep_left)
+        return self._fuel_windows[key]
+
+    def distance_to_nearest_city(self, pos: Position) -> int:
+        """
+        Distance to the nearest own city tile that still needs fuel
+        """
+        closest_dist = 10000
+        for tile in self.refuel_city_tiles:
+            dist = tile.pos.distance_to(pos)
+            if dist < closest_dist:
+                closest_dist = dist
+        return int(closest_dist)
+
+    def distance_to_nearest_empty_tile(self, pos: Position) -> int:
+        closest_dist = math.inf
+        for tile in self.empty_tiles:
+            dist = tile.pos.distance_to(pos)
+            if dist < closest_dist:
+                closest_dist = dist
+        return int(closest_dist)
+
+    @cached_property
+    def resource_depletion(self):
+        """
+        Turns until every resource tile is mined empty, see `forecast.turns_until_depleted`
+        """
+        from forecast import forecast_resources, turns_until_depleted
+
+        return turns_until_depleted(forecast_resources(self.game_state, FORECAST_TURNS))
+
+    @cached_property
+    def influence(self):
+        from influence import influence_map
+
+        return influence_map(self.game_state, self.player_id)
+
+    @cached_property
+    def build_summary(self):
+        from build_score import BoardSummary
+
+        return BoardSummary(self.gameboard, self.player, self.night_moves_left, self.is_night)